@@ -4,10 +4,13 @@ from flask_migrate import Migrate
 from config import Config
 import os
 from extensions import db, jwt
+from services.sqlite import configure_sqlite
 
-def create_app():
+def create_app(config_overrides=None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    if config_overrides:
+        app.config.update(config_overrides)
 
     # Most permissive CORS for debugging
     CORS(app, origins=["http://localhost:3000"], supports_credentials=True, allow_headers="*")
@@ -15,9 +18,10 @@ def create_app():
     db.init_app(app)
     jwt.init_app(app)
     migrate = Migrate(app, db)
+    configure_sqlite(app)
 
     # Import models so they are registered with SQLAlchemy
-    from models import User, LogFile, LogEntry, Anomaly, AnalysisResult
+    from models import User, LogFile, UploadSession, LogEntry, Anomaly, AnalysisResult
 
     # Register blueprints
     from routes.auth import auth_bp
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Measure peak Python memory of an analysis run and of the dashboard on a generated log,
+against loading the same entries as ORM entities as both used to.
+
+Usage: python bench_analysis.py [num_lines]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from app import create_app
+from extensions import db
+from models import LogEntry
+from bench_ingest import write_synthetic_log
+
+def measured(fn):
+    """(seconds, peak traced MiB) of one call"""
+    db.session.expire_all()
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+def run(num_lines):
+    workdir = tempfile.mkdtemp()
+    log_path = os.path.join(workdir, 'bench.log')
+    write_synthetic_log(log_path, num_lines)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+    })
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        with open(log_path, 'rb') as f:
+            data = {'file': (io.BytesIO(f.read()), 'bench.log')}
+        file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+        elapsed, peak = measured(lambda: LogEntry.query.filter_by(logfile_id=file_id).all())
+        print(f"ORM entities alone: {peak:,.0f} MiB peak, {elapsed:.2f} s")
+        elapsed, peak = measured(lambda: client.post('/log-analyzer/api/analysis/run', json={'file_id': file_id, 'use_llm': False}))
+        print(f"/run: {peak:,.0f} MiB peak, {elapsed:.2f} s")
+        elapsed, peak = measured(lambda: client.get(f'/log-analyzer/api/analysis/dashboard/{file_id}'))
+        print(f"/dashboard: {peak:,.0f} MiB peak, {elapsed:.2f} s")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
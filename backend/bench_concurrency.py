@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent SQLite writes the way gunicorn workers issue them: several processes,
+each with a few request threads, committing analysis results and entry batches at once.
+
+Three profiles run against a fresh database each:
+  rollback  - the previous defaults: rollback journal, each request commits its own writes
+  wal       - WAL and the tuned pragmas, each request still commits its own writes
+  writer    - WAL plus the grouped-transaction writer in every process
+
+Lock wait is the time spent acquiring the write lock: BEGIN IMMEDIATE for requests that
+commit their own writes, the lock file and BEGIN IMMEDIATE for the writer.
+
+Usage: python bench_concurrency.py [processes] [writes_per_thread] [threads]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from threading import Lock, Thread
+from app import create_app
+from config import Config
+from extensions import db
+from models import LogFile, AnalysisResult
+from services.ingest import iter_offset_lines, iter_rows, new_stats, write_batch
+from services.sqlite import current_writer
+from bench_ingest import write_synthetic_log
+
+PROFILES = {
+    'rollback': ({'journal_mode': 'DELETE', 'busy_timeout': 5000}, False),
+    'wal': (Config.SQLITE_PRAGMAS, False),
+    'writer': (Config.SQLITE_PRAGMAS, True),
+}
+# Every tenth write is an upload batch of this many entries, the rest are analysis results
+BATCH_ROWS = 1000
+BATCH_EVERY = 10
+
+def load_batch(log_path, logfile_id):
+    with open(log_path, 'rb') as f:
+        return list(iter_rows(iter_offset_lines(f), logfile_id, new_stats('space'), 'space'))
+
+def result_job(file_id):
+    def job(session):
+        result = AnalysisResult(file_id=file_id, created_at=datetime.utcnow(),
+                                results={'file_id': file_id, 'summary_report': 'x' * 2000})
+        session.add(result)
+        session.flush()
+        return result.id
+    return job
+
+def batch_job(batch):
+    return lambda session: write_batch(session, batch)
+
+def request_thread(app, jobs, totals, mutex):
+    """Commit each job from a request context, as a worker thread would"""
+    with app.app_context():
+        writer = current_writer()
+        for job in jobs:
+            started = time.perf_counter()
+            waited = 0.0
+            try:
+                if writer:
+                    writer.run(job)
+                else:
+                    db.session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+                    waited = time.perf_counter() - started
+                    job(db.session)
+                    db.session.commit()
+                error = None
+            except Exception as e:
+                db.session.rollback()
+                error = str(e).splitlines()[0]
+            with mutex:
+                totals['lock_wait'] += waited
+                totals['max_lock_wait'] = max(totals['max_lock_wait'], waited)
+                if error:
+                    totals['errors'] += 1
+                    totals['last_error'] = error
+                else:
+                    totals['writes'] += 1
+
+def worker_process(overrides, log_path, logfile_id, writes, threads, barrier, results):
+    app = create_app(overrides)
+    batch = load_batch(log_path, logfile_id)
+    totals = {'writes': 0, 'errors': 0, 'lock_wait': 0.0, 'max_lock_wait': 0.0, 'last_error': None}
+    jobs = [batch_job(batch) if i % BATCH_EVERY == 0 else result_job(logfile_id) for i in range(writes)]
+    barrier.wait()
+    mutex = Lock()
+    pool = [Thread(target=request_thread, args=(app, jobs, totals, mutex)) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    with app.app_context():
+        writer = current_writer()
+        if writer:
+            totals['lock_wait'] = writer.stats['lock_wait_seconds']
+            totals['max_lock_wait'] = writer.stats['max_lock_wait_seconds']
+            totals['transactions'] = writer.stats['transactions']
+    results.put(totals)
+
+def run_profile(name, processes, writes, threads, log_path):
+    pragmas, use_writer = PROFILES[name]
+    workdir = tempfile.mkdtemp()
+    overrides = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'SQLITE_PRAGMAS': pragmas,
+        'SQLITE_WRITER': use_writer,
+    }
+    app = create_app(overrides)
+    with app.app_context():
+        db.create_all()
+        logfile = LogFile(filename='bench.log', user_id=1)
+        db.session.add(logfile)
+        db.session.commit()
+        logfile_id = logfile.id
+    barrier = multiprocessing.Barrier(processes + 1)
+    results = multiprocessing.Queue()
+    pool = [multiprocessing.Process(target=worker_process,
+                                    args=(overrides, log_path, logfile_id, writes, threads, barrier, results))
+            for _ in range(processes)]
+    for process in pool:
+        process.start()
+    barrier.wait()
+    started = time.perf_counter()
+    totals = [results.get() for _ in pool]
+    elapsed = time.perf_counter() - started
+    for process in pool:
+        process.join()
+    done = sum(t['writes'] for t in totals)
+    errors = sum(t['errors'] for t in totals)
+    lock_wait = sum(t['lock_wait'] for t in totals)
+    max_wait = max(t['max_lock_wait'] for t in totals)
+    transactions = sum(t.get('transactions', t['writes']) for t in totals)
+    print(f"{name:>8}: {done} writes in {transactions} transactions, {elapsed:.2f}s -> {done / elapsed:,.0f} writes/s, "
+          f"{errors} failed, lock wait {lock_wait:.2f}s total / {max_wait * 1000:.0f}ms max")
+    for t in totals:
+        if t['last_error']:
+            print(f"          e.g. {t['last_error']}")
+            break
+
+def run(processes, writes, threads):
+    log_path = os.path.join(tempfile.mkdtemp(), 'bench.log')
+    write_synthetic_log(log_path, BATCH_ROWS)
+    print(f"{processes} processes x {threads} threads x {writes} writes "
+          f"(every {BATCH_EVERY}th a {BATCH_ROWS}-entry batch)")
+    for name in PROFILES:
+        run_profile(name, processes, writes, threads, log_path)
+
+if __name__ == "__main__":
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    run(processes, writes, threads)
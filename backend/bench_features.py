@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Compare building the analysis feature matrix with a per-entry Python loop over
+hydrated rows against FeatureBuilder's batched float32 fill from database-computed
+columns: time and peak traced memory.
+
+Usage: python bench_features.py [num_lines ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from sqlalchemy import select
+from app import create_app
+from extensions import db
+from models import LogFile, LogEntry
+from services.dimensions import DIMENSION_ID_COLUMNS, load_dimension_values, hydrate
+from services.features import FEATURE_COLUMNS, FeatureBuilder, weighted_mean_std, with_features
+from services.ingest import ingest_file
+from services.queries import file_entries
+from bench_ingest import write_synthetic_log
+
+BATCH = 5000
+
+def measured(fn):
+    """(seconds, peak traced MiB) of fn, timed in a run without tracing as tracing slows it down"""
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+def loop_features(file_id):
+    """The previous builder: hydrate every row, append a list per entry, then np.array and byte stats"""
+    values = load_dimension_values(db.session, file_id)
+    rows = db.session.execute(file_entries(select(
+        LogEntry.parsed_data, *DIMENSION_ID_COLUMNS, LogEntry.status_code, LogEntry.bytes_sent,
+        LogEntry.bytes_received, LogEntry.action, LogEntry.method, LogEntry.occurrences,
+    ), file_id).order_by(LogEntry.id).execution_options(yield_per=BATCH))
+    features, weights, typed_bytes = [], [], []
+    for entry in rows:
+        pdata = hydrate(entry.parsed_data, (entry.domain_id, entry.user_agent_id, entry.src_ip_id), values)
+        features.append([
+            entry.status_code or 0, entry.bytes_sent or 0, entry.bytes_received or 0,
+            len(pdata.get('domain', '')), len(pdata.get('user_agent', '')),
+            1 if entry.action == 'Blocked' else 0, 1 if entry.method == 'POST' else 0,
+        ])
+        weights.append(entry.occurrences or 1)
+        if entry.bytes_sent is not None:
+            typed_bytes.append((entry.bytes_sent, entry.bytes_received or 0, weights[-1]))
+    X = np.array(features)
+    byte_weights = [w for _, _, w in typed_bytes]
+    weighted_mean_std([s for s, _, _ in typed_bytes], byte_weights)
+    weighted_mean_std([r for _, r, _ in typed_bytes], byte_weights)
+    return X
+
+def builder_features(file_id, num_entries):
+    builder = FeatureBuilder(num_entries)
+    rows = db.session.execute(file_entries(with_features(select(*FEATURE_COLUMNS)), file_id)
+                              .order_by(LogEntry.id).execution_options(yield_per=BATCH))
+    for batch in rows.partitions():
+        builder.add(batch)
+    X, _ = builder.finish()
+    builder.byte_stats()
+    return X
+
+def run(num_lines):
+    workdir = tempfile.mkdtemp()
+    log_path = os.path.join(workdir, 'bench.log')
+    write_synthetic_log(log_path, num_lines)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}"})
+    with app.app_context():
+        db.create_all()
+        logfile = LogFile(filename='bench.log', user_id=1)
+        db.session.add(logfile)
+        db.session.commit()
+        stats = ingest_file(log_path, logfile.id, batch_size=app.config['INGEST_BATCH_SIZE'])
+        db.session.commit()
+        num_entries = db.session.execute(file_entries(select(db.func.count()).select_from(LogEntry), logfile.id)).scalar()
+        assert np.array_equal(loop_features(logfile.id).astype(np.float32), builder_features(logfile.id, num_entries))
+        print(f"{stats['num_logs']:,} lines, {num_entries:,} entries")
+        for label, fn in (('per-entry loop', lambda: loop_features(logfile.id)),
+                          ('FeatureBuilder', lambda: builder_features(logfile.id, num_entries))):
+            elapsed, peak = measured(fn)
+            print(f"{label:>15}: {elapsed:.2f} s, {peak:,.1f} MiB peak")
+
+if __name__ == "__main__":
+    for num_lines in (int(arg) for arg in sys.argv[1:] or ('100000', '1000000')):
+        run(num_lines)
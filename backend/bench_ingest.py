@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark for log ingest throughput: per-row ORM objects vs. batched Core inserts
+
+Usage: python bench_ingest.py [num_lines] [database_url]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from app import create_app
+from extensions import db
+from models import LogFile, LogEntry
+from services.ingest import ingest_file, iter_rows, iter_text_lines
+from services.partitions import ensure_partitions
+
+def write_synthetic_log(path, num_lines):
+    """Write num_lines of space-delimited log lines in the upload format"""
+    user_agents = ["Mozilla/5.0", "Chrome/91.0", "Safari/13.1", "curl/7.68.0"]
+    domains = ["google.com", "github.com", "amazon.com", "stackoverflow.com", "g00gle-login.xyz"]
+    start = datetime(2025, 7, 9, 16, 0, 0)
+    with open(path, 'w') as f:
+        for i in range(num_lines):
+            ts = (start + timedelta(seconds=i // 10)).strftime("%Y-%m-%d %H:%M:%S")
+            f.write(
+                f"{ts} 192.168.1.{random.randint(1, 254)} 93.{random.randint(0, 255)}.{random.randint(0, 255)}.7 "
+                f"{random.choice(domains)} {random.choice(['Allowed', 'Blocked'])} {random.choice(['GET', 'POST'])} "
+                f"{random.choice([200, 301, 403])} {random.choice(user_agents)} "
+                f"{random.randint(0, 5000)} {random.randint(0, 10000)}\n"
+            )
+
+def ingest_orm(path, logfile_id, period):
+    """The original upload path: one LogEntry object per line, one commit at the end"""
+    stats = {'parse_errors': 0}
+    count = 0
+    with open(path, 'r') as f:
+        for logfile_id, timestamp, raw_line, parsed_data, *_ in iter_rows(iter_text_lines(f), logfile_id, stats):
+            db.session.add(LogEntry(logfile_id=logfile_id, period=period, timestamp=timestamp,
+                                    raw_line=raw_line, parsed_data=parsed_data))
+            count += 1
+    return count
+
+def run(num_lines, database_url):
+    workdir = tempfile.mkdtemp()
+    log_path = os.path.join(workdir, 'bench.log')
+    write_synthetic_log(log_path, num_lines)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"})
+    with app.app_context():
+        db.create_all()
+        for label in ('orm', 'bulk'):
+            logfile = LogFile(filename=f'bench-{label}.log', user_id=1)
+            db.session.add(logfile)
+            db.session.commit()
+            started = time.perf_counter()
+            if label == 'orm':
+                ensure_partitions(db.session, logfile.period)
+                count = ingest_orm(log_path, logfile.id, logfile.period)
+            else:
+                count = ingest_file(log_path, logfile.id, batch_size=app.config['INGEST_BATCH_SIZE'])['num_logs']
+            db.session.commit()
+            elapsed = time.perf_counter() - started
+            print(f"{label:>5}: {count} lines in {elapsed:.2f}s -> {count / elapsed:,.0f} lines/s")
+
+if __name__ == "__main__":
+    num_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    database_url = sys.argv[2] if len(sys.argv) > 2 else None
+    run(num_lines, database_url)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Benchmark parse scaling across processes on a generated multi-million-line log
+
+Only parsing and the ordered merge are timed; database writes are excluded so
+the numbers show how the parser itself scales with cores.
+
+Usage: python bench_parallel.py [num_lines] [max_workers] [chunk_mb]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from bench_ingest import write_synthetic_log
+from services.ingest import iter_offset_lines, iter_parallel_rows, iter_rows, new_stats
+
+def run(num_lines, max_workers, chunk_bytes):
+    log_path = os.path.join(tempfile.mkdtemp(), 'bench.log')
+    write_synthetic_log(log_path, num_lines)
+    print(f"{num_lines} lines, {os.path.getsize(log_path) / 1e6:.0f} MB, {chunk_bytes // (1024 * 1024)} MB ranges")
+    baseline = None
+    for workers in range(1, max_workers + 1):
+        stats = new_stats('space')
+        started = time.perf_counter()
+        if workers == 1:
+            with open(log_path, 'rb') as f:
+                count = sum(1 for _ in iter_rows(iter_offset_lines(f), 1, stats, 'space'))
+        else:
+            count = sum(1 for _ in iter_parallel_rows(log_path, 1, 'space', stats, workers, chunk_bytes))
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(f"  {workers} worker(s): {count / elapsed:>12,.0f} lines/s ({baseline / elapsed:.2f}x)")
+
+if __name__ == "__main__":
+    num_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    chunk_mb = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    run(num_lines, max_workers, chunk_mb * 1024 * 1024)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the registered log format parsers
+
+Usage: python bench_parsers.py [num_lines]
+"""
+
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from services.parsers import PARSERS, detect_format
+
+USER_AGENTS = ["Mozilla/5.0", "Chrome/91.0", "curl/7.68.0", "Mozilla/5.0 (X11; Linux x86_64) Firefox/118.0"]
+DOMAINS = ["google.com", "github.com", "amazon.com", "g00gle-login.xyz"]
+
+def synthetic_records(num_lines):
+    start = datetime(2025, 7, 9, 16, 0, 0)
+    for i in range(num_lines):
+        yield {
+            'when': start + timedelta(seconds=i // 10),
+            'src_ip': f"192.168.1.{random.randint(1, 254)}",
+            'dest_ip': f"93.184.{random.randint(0, 255)}.7",
+            'domain': random.choice(DOMAINS),
+            'action': random.choice(['Allowed', 'Blocked']),
+            'method': random.choice(['GET', 'POST']),
+            'status_code': random.choice(['200', '301', '403']),
+            'user_agent': random.choice(USER_AGENTS),
+            'bytes_sent': random.randint(0, 5000),
+            'bytes_received': random.randint(0, 10000),
+        }
+
+def format_line(log_format, r):
+    ts = r['when'].strftime('%Y-%m-%d %H:%M:%S')
+    if log_format == 'space':
+        return (f"{ts} {r['src_ip']} {r['dest_ip']} {r['domain']} {r['action']} {r['method']} "
+                f"{r['status_code']} {r['user_agent']} {r['bytes_sent']} {r['bytes_received']}")
+    if log_format == 'combined':
+        return (f"{r['src_ip']} - - [{r['when'].strftime('%d/%b/%Y:%H:%M:%S')} +0000] "
+                f"\"{r['method']} http://{r['domain']}/ HTTP/1.1\" {r['status_code']} {r['bytes_received']} "
+                f"\"-\" \"{r['user_agent']}\"")
+    if log_format == 'jsonl':
+        return json.dumps(dict({k: v for k, v in r.items() if k != 'when'}, timestamp=ts))
+    if log_format == 'csv':
+        return (f"{ts},{r['src_ip']},{r['dest_ip']},{r['domain']},{r['action']},{r['method']},"
+                f"{r['status_code']},\"{r['user_agent']}\",{r['bytes_sent']},{r['bytes_received']}")
+    raise ValueError(log_format)
+
+def time_parser(parse, lines):
+    started = time.perf_counter()
+    failures = sum(1 for line in lines if parse(line) is None)
+    return time.perf_counter() - started, failures
+
+def run(num_lines):
+    records = list(synthetic_records(num_lines))
+    print(f"{num_lines} lines per format")
+    for log_format, parse in PARSERS.items():
+        lines = [format_line(log_format, r) for r in records]
+        elapsed, failures = time_parser(parse, lines)
+        detect_elapsed, _ = time_parser(lambda line: PARSERS[detect_format(line)](line), lines[:10000])
+        print(f"{log_format:>9}: {num_lines / elapsed:>12,.0f} lines/s  "
+              f"(failures={failures}, per-line auto-detect: {min(num_lines, 10000) / detect_elapsed:,.0f} lines/s)")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
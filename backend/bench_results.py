@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Compare stored analysis documents as plain JSON text against zstd-compressed JSON:
+bytes on disk, time to read every anomaly document of an analysis, and decode time.
+
+Usage: python bench_results.py [num_lines]
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from sqlalchemy import text
+from app import create_app
+from extensions import db
+from services.compression import decode_document
+from bench_ingest import write_synthetic_log
+
+def timed(fn, repeat=5):
+    """Best of repeat runs, in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+def run(num_lines):
+    workdir = tempfile.mkdtemp()
+    log_path = os.path.join(workdir, 'bench.log')
+    write_synthetic_log(log_path, num_lines)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+    })
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        with open(log_path, 'rb') as f:
+            data = {'file': (io.BytesIO(f.read()), 'bench.log')}
+        file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+        client.post('/log-analyzer/api/analysis/run', json={'file_id': file_id, 'use_llm': False})
+        with db.engine.begin() as conn:
+            # The previous format, for comparison: the same documents as JSON text
+            conn.execute(text("CREATE TABLE plain_document (id INTEGER PRIMARY KEY, kind TEXT, document TEXT)"))
+            for kind, table, column in (('results', 'analysis_result', 'results'), ('details', 'anomaly', 'details')):
+                stored = conn.execute(text(f"SELECT {column} FROM {table}")).scalars().all()
+                conn.execute(text("INSERT INTO plain_document (kind, document) VALUES (:kind, :document)"),
+                             [{'kind': kind, 'document': json.dumps(decode_document(value))} for value in stored])
+        with db.engine.connect() as conn:
+            for kind, table, column in (('results', 'analysis_result', 'results'), ('details', 'anomaly', 'details')):
+                count, plain = conn.execute(text(
+                    "SELECT count(*), sum(length(CAST(document AS BLOB))) FROM plain_document WHERE kind = :kind"
+                ), {'kind': kind}).one()
+                compressed = conn.execute(text(f"SELECT sum(length({column})) FROM {table}")).scalar()
+                print(f"{table}.{column}: {count} documents, {plain:,} bytes as JSON, {compressed:,} compressed "
+                      f"({plain / compressed:.1f}x smaller)")
+            plain_rows = conn.execute(text("SELECT document FROM plain_document WHERE kind = 'details'")).scalars().all()
+            stored_rows = conn.execute(text("SELECT details FROM anomaly")).scalars().all()
+            read_plain = timed(lambda: [json.loads(v) for v in conn.execute(
+                text("SELECT document FROM plain_document WHERE kind = 'details'")).scalars()])
+            read_stored = timed(lambda: [decode_document(v) for v in conn.execute(
+                text("SELECT details FROM anomaly")).scalars()])
+        decode_plain = timed(lambda: [json.loads(v) for v in plain_rows])
+        decode_stored = timed(lambda: [decode_document(v) for v in stored_rows])
+        print(f"read + decode all anomaly documents: {read_plain:.1f} ms as JSON, {read_stored:.1f} ms compressed")
+        print(f"decode only: {decode_plain:.1f} ms as JSON, {decode_stored:.1f} ms compressed")
+        started = time.perf_counter()
+        client.get(f'/log-analyzer/api/analysis/result/{file_id}?limit=500')
+        print(f"/result (500 anomalies): {(time.perf_counter() - started) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark first-page latency of the entry search index on a generated log
+
+Usage: python bench_search.py [num_lines] [database_url]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from app import create_app
+from extensions import db
+from models import LogFile
+from services.ingest import ingest_file
+from services.search import file_id_range, search_entries
+from bench_ingest import write_synthetic_log
+
+# (label, query, filter by file, time window)
+QUERIES = [
+    ('rare domain', 'g00gle-login', False, None),
+    ('common domain', 'github.com', False, None),
+    ('ip fragment', '192.168.1.25', False, None),
+    ('user agent', 'curl/7.68', True, None),
+    ('no match', 'nothing-matches-this', True, None),
+    ('time window', 'stackoverflow', True, (datetime(2025, 7, 9, 18), datetime(2025, 7, 9, 18, 5))),
+]
+
+def run(num_lines, database_url):
+    workdir = tempfile.mkdtemp()
+    log_path = os.path.join(workdir, 'bench.log')
+    write_synthetic_log(log_path, num_lines)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"})
+    with app.app_context():
+        db.create_all()
+        logfile = LogFile(filename='bench.log', user_id=1)
+        db.session.add(logfile)
+        db.session.commit()
+        stats = ingest_file(log_path, logfile.id, batch_size=app.config['INGEST_BATCH_SIZE'])
+        db.session.commit()
+        print(f"indexed {stats['num_logs']} lines at {stats['lines_per_second']:,} lines/s")
+        dialect = db.engine.dialect.name
+        for label, query, by_file, window in QUERIES:
+            start, end = window or (None, None)
+            best = None
+            for _ in range(5):
+                started = time.perf_counter()
+                # Timed with the id range lookup, as the endpoint runs it
+                id_range = file_id_range(db.session, logfile.id, start, end) if by_file else None
+                stmt = search_entries(dialect, query, 50, 0, logfile.id if by_file else None,
+                                      id_range, start, end, logfile.period if by_file else None)
+                rows = db.session.execute(stmt).all()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{label:>13}: {len(rows):>2} rows in {best * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    num_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    database_url = sys.argv[2] if len(sys.argv) > 2 else None
+    run(num_lines, database_url)
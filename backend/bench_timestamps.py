@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Benchmark timestamp decoding: datetime.strptime vs. the cached and vectorized decoders
+
+Usage: python bench_timestamps.py [num_lines]
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+from services.timestamps import LOG_TIMESTAMP_FORMAT, TimestampDecoder, decode_timestamps
+
+def run(num_lines):
+    start = datetime(2025, 7, 9, 16, 0, 0)
+    # Roughly ten lines per second of log time, as in busy firewall exports
+    texts = [(start + timedelta(seconds=i // 10)).strftime(LOG_TIMESTAMP_FORMAT) for i in range(num_lines)]
+
+    started = time.perf_counter()
+    expected = [datetime.strptime(t, LOG_TIMESTAMP_FORMAT) for t in texts]
+    baseline = time.perf_counter() - started
+
+    decode = TimestampDecoder()
+    started = time.perf_counter()
+    cached = [decode(t) for t in texts]
+    cached_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vectorized = decode_timestamps(texts)
+    vectorized_elapsed = time.perf_counter() - started
+
+    assert cached == expected
+    assert vectorized.astype(datetime).tolist() == expected
+    print(f"{num_lines} timestamps")
+    print(f"  strptime:   {num_lines / baseline:>12,.0f} lines/s")
+    print(f"  cached:     {num_lines / cached_elapsed:>12,.0f} lines/s ({baseline / cached_elapsed:.1f}x)")
+    print(f"  vectorized: {num_lines / vectorized_elapsed:>12,.0f} lines/s ({baseline / vectorized_elapsed:.1f}x)")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
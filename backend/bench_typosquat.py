@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Time typosquat checks of distinct domains against the brand index and against comparing
+each word with every brand, for the bundled brand list and a larger generated one.
+
+Usage: python bench_typosquat.py [num_domains] [num_brands]
+"""
+
+import random
+import string
+import sys
+import time
+from services.typosquat import HOMOGLYPHS, WORD_SEPARATORS, TyposquatIndex, brand_distance, brand_index
+
+def pairwise_find(brands, domain):
+    """The check without an index: every word of the domain against every brand"""
+    for word in WORD_SEPARATORS.split(domain):
+        if word in brands:
+            continue
+        normalized = word.translate(HOMOGLYPHS)
+        for brand in brands:
+            if brand_distance(normalized, brand) is not None:
+                return brand, word
+    return None
+
+def generated_domains(rng, brands, count):
+    """Mostly unrelated hosts, with one in twenty a brand with one inner letter replaced"""
+    domains = []
+    for i in range(count):
+        if i % 20 == 0:
+            word = list(rng.choice(brands))
+            word[rng.randrange(1, len(word) - 1)] = rng.choice(string.ascii_lowercase)
+            domains.append(f"{''.join(word)}-login.com")
+        else:
+            domains.append(f"{''.join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 12)))}-{i}.example.com")
+    return domains
+
+def timed(label, fn, domains):
+    started = time.perf_counter()
+    flagged = sum(1 for domain in domains if fn(domain))
+    elapsed = time.perf_counter() - started
+    print(f"{label:>26}: {elapsed / len(domains) * 1e6:8.1f} us per domain, {flagged} flagged")
+
+def run(num_domains, num_brands):
+    rng = random.Random(5)
+    generated = brand_index.brands + [
+        ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 14))) for _ in range(num_brands - len(brand_index.brands))
+    ]
+    for label, brands in (('bundled', brand_index.brands), ('generated', generated)):
+        started = time.perf_counter()
+        index = TyposquatIndex(brands)
+        built = time.perf_counter() - started
+        print(f"{label} list: {len(index.brands)} brands, {len(index.deletes):,} deletion keys, built in {built:.2f} s")
+        domains = generated_domains(rng, index.brands, num_domains)
+        timed('index', index.find, domains)
+        # The pairwise check is far slower; a sample is enough
+        timed('pairwise', lambda domain: pairwise_find(index.brands, domain), domains[:max(1, num_domains // 20)])
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000, int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
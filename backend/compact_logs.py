@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Roll raw log entries older than a number of days up into hourly aggregates per
+(src_ip, domain, status, action) and delete the raw rows. The dashboard timeline
+charts compacted hours from the aggregates.
+
+Usage: python compact_logs.py [days]   (defaults to ROLLUP_AFTER_DAYS)
+"""
+
+import sys
+from datetime import datetime
+from app import create_app
+from extensions import db
+from models import LogFile
+from services.rollups import compact_file, compaction_cutoff, files_to_compact
+
+def main(days):
+    app = create_app()
+    with app.app_context():
+        days = days or app.config['ROLLUP_AFTER_DAYS']
+        if days <= 0:
+            print("Compaction is disabled; pass a number of days or set ROLLUP_AFTER_DAYS")
+            return 1
+        cutoff = compaction_cutoff(datetime.utcnow(), days)
+        total = 0
+        for logfile_id in files_to_compact(db.session, cutoff):
+            # One transaction per file keeps locks and undo short
+            removed = compact_file(db.session, db.session.get(LogFile, logfile_id), cutoff)
+            db.session.commit()
+            total += removed
+            print(f"file {logfile_id}: rolled up {removed} entries")
+        print(f"Compacted {total} entries older than {cutoff:%Y-%m-%d %H:%M}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 0))
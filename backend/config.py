@@ -19,5 +19,24 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024))  # bytes per chunked-upload request
+    MMAP_CACHE_SIZE = int(os.getenv('MMAP_CACHE_SIZE', 32))  # stored uploads kept memory-mapped for raw line reads
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 5000))  # rows per bulk insert
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', min(4, os.cpu_count() or 1)))  # parser processes per upload
+    INGEST_CHUNK_BYTES = int(os.getenv('INGEST_CHUNK_BYTES', 8 * 1024 * 1024))  # byte range handed to each parser process
+    INGEST_COLLAPSE_SECONDS = int(os.getenv('INGEST_COLLAPSE_SECONDS', 0))  # merge repeated lines per time bucket; 0 keeps every line
+    RETENTION_MONTHS = int(os.getenv('RETENTION_MONTHS', 0))  # upload months kept by prune_logs.py, including the current one; 0 keeps everything
+    ROLLUP_AFTER_DAYS = int(os.getenv('ROLLUP_AFTER_DAYS', 0))  # compact_logs.py rolls older raw entries up into hourly aggregates; 0 keeps them raw
+    # Applied to every SQLite connection: WAL lets readers run alongside the writer, and NORMAL sync is safe under WAL
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 30000)),
+        'cache_size': -int(os.getenv('SQLITE_CACHE_KB', 64 * 1024)),  # negative sizes are in KiB
+        'mmap_size': int(os.getenv('SQLITE_MMAP_BYTES', 256 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+    SQLITE_WRITER = os.getenv('SQLITE_WRITER', '1') == '1'  # commit uploads and analysis results through one writer thread per worker
+    SQLITE_WRITER_MAX_JOBS = int(os.getenv('SQLITE_WRITER_MAX_JOBS', 64))  # write jobs grouped into one transaction at most
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "dev-secret-key")  # never use weak key in prod
 
@@ -0,0 +1,25 @@
+import pytest
+from app import create_app
+from extensions import db
+from models import User
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+    })
+    with app.app_context():
+        db.create_all()
+        user = User(username='admin')
+        user.set_password('admin123')
+        db.session.add(user)
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
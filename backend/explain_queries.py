@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Print the query plans of the per-file entry queries against the configured database
+and flag any that scan log_entry without an index. Works on SQLite and PostgreSQL.
+
+Usage: python explain_queries.py [file_id]
+"""
+
+import sys
+from datetime import datetime
+from sqlalchemy import text
+from app import create_app
+from extensions import db
+from models import LogEntry
+from services.queries import entries_by_id, entries_by_time, explain, uses_full_scan
+
+def main(file_id):
+    app = create_app()
+    with app.app_context():
+        if db.engine.dialect.name == 'postgresql':
+            # Small tables are cheaper to seq-scan, so a seq scan would not show whether the index is usable
+            db.session.execute(text('SET LOCAL enable_seqscan = off'))
+        queries = {
+            'analysis scan': LogEntry.query.filter_by(logfile_id=file_id).statement,
+            'preview page': entries_by_id(file_id, 20, after_id=1000),
+            'time page': entries_by_time(file_id, 100, start=datetime(2025, 1, 1), end=datetime(2026, 1, 1),
+                                         after=(datetime(2025, 6, 1), 1000)),
+        }
+        failed = False
+        for name, query in queries.items():
+            plan = explain(db.session, query)
+            full_scan = uses_full_scan(plan)
+            failed |= full_scan
+            print(f"{name}: {'FULL SCAN' if full_scan else 'ok'}")
+            for line in plan:
+                print(f"    {line}")
+        db.session.rollback()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1))
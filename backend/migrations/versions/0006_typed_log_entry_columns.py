@@ -0,0 +1,133 @@
+"""typed log entry columns
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 07:40:30.736538
+
+"""
+import ipaddress
+import json
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+ENTRY_ACTIONS = ('Allowed', 'Blocked')
+HTTP_METHODS = ('GET', 'POST', 'PUT', 'DELETE', 'HEAD', 'OPTIONS', 'PATCH', 'CONNECT', 'TRACE')
+BACKFILL_BATCH = 5000
+
+entry_action = sa.Enum(*ENTRY_ACTIONS, name='entry_action')
+http_method = sa.Enum(*HTTP_METHODS, name='http_method')
+
+
+def ip_type():
+    return sa.LargeBinary(length=16).with_variant(postgresql.INET(), 'postgresql')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # add_column does not emit CREATE TYPE for enums
+        entry_action.create(bind, checkfirst=True)
+        http_method.create(bind, checkfirst=True)
+    with op.batch_alter_table('log_entry', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status_code', sa.SmallInteger(), nullable=True))
+        batch_op.add_column(sa.Column('bytes_sent', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('bytes_received', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('action', entry_action, nullable=True))
+        batch_op.add_column(sa.Column('method', http_method, nullable=True))
+        batch_op.add_column(sa.Column('src_ip', ip_type(), nullable=True))
+        batch_op.add_column(sa.Column('dest_ip', ip_type(), nullable=True))
+
+    backfill(bind)
+
+
+def downgrade():
+    with op.batch_alter_table('log_entry', schema=None) as batch_op:
+        batch_op.drop_column('dest_ip')
+        batch_op.drop_column('src_ip')
+        batch_op.drop_column('method')
+        batch_op.drop_column('action')
+        batch_op.drop_column('bytes_received')
+        batch_op.drop_column('bytes_sent')
+        batch_op.drop_column('status_code')
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        http_method.drop(bind, checkfirst=True)
+        entry_action.drop(bind, checkfirst=True)
+
+
+def backfill(bind):
+    """Fill the typed columns from parsed_data, in id order and fixed-size batches"""
+    postgres = bind.dialect.name == 'postgresql'
+    entries = sa.table(
+        'log_entry',
+        sa.column('id', sa.Integer), sa.column('parsed_data', sa.Text),
+        sa.column('status_code'), sa.column('bytes_sent'), sa.column('bytes_received'),
+        sa.column('action'), sa.column('method'), sa.column('src_ip'), sa.column('dest_ip'),
+    )
+    update = entries.update().where(entries.c.id == sa.bindparam('entry_id')).values(
+        status_code=sa.bindparam('status_code'), bytes_sent=sa.bindparam('bytes_sent'),
+        bytes_received=sa.bindparam('bytes_received'), action=sa.bindparam('action'),
+        method=sa.bindparam('method'), src_ip=sa.bindparam('src_ip'), dest_ip=sa.bindparam('dest_ip'),
+    )
+    if postgres:
+        # Bound as text; cast so the enum and inet columns accept them
+        update = update.values(
+            action=sa.cast(sa.bindparam('action'), entry_action),
+            method=sa.cast(sa.bindparam('method'), http_method),
+            src_ip=sa.cast(sa.bindparam('src_ip'), postgresql.INET()),
+            dest_ip=sa.cast(sa.bindparam('dest_ip'), postgresql.INET()),
+        )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(entries.c.id, entries.c.parsed_data)
+            .where(entries.c.id > last_id).order_by(entries.c.id).limit(BACKFILL_BATCH)
+        ).fetchall()
+        if not rows:
+            break
+        params = []
+        for entry_id, parsed_data in rows:
+            data = json.loads(parsed_data) if isinstance(parsed_data, str) else (parsed_data or {})
+            params.append(dict(typed_values(data, postgres), entry_id=entry_id))
+        bind.execute(update, params)
+        last_id = rows[-1][0]
+
+
+def typed_values(data, postgres):
+    status = str(data.get('status_code', ''))
+    try:
+        sent, received = int(data['bytes_sent']), int(data.get('bytes_received', 0))
+    except (KeyError, TypeError, ValueError):
+        # Rows parsed before the typed byte fields only carry 'bytes': "sent received"
+        try:
+            sent, received = map(int, str(data.get('bytes', '')).split())
+        except ValueError:
+            sent = received = None
+    action = str(data.get('action', '')).capitalize()
+    method = str(data.get('method', '')).upper()
+    return {
+        'status_code': int(status) if status.isdigit() and int(status) < 32768 else None,
+        'bytes_sent': sent,
+        'bytes_received': received,
+        'action': action if action in ENTRY_ACTIONS else None,
+        'method': method if method in HTTP_METHODS else None,
+        'src_ip': ip_value(data.get('src_ip'), postgres),
+        'dest_ip': ip_value(data.get('dest_ip'), postgres),
+    }
+
+
+def ip_value(text, postgres):
+    try:
+        address = ipaddress.ip_address(str(text))
+    except ValueError:
+        return None
+    return str(address) if postgres else address.packed
@@ -0,0 +1,148 @@
+"""interned dimension tables
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 07:53:36.709535
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 5000
+
+# parsed_data field -> (dimension table, value column, log_entry id column, longest value stored)
+DIMENSIONS = {
+    'domain': ('domain', 'name', 'domain_id', 255),
+    'user_agent': ('user_agent', 'value', 'user_agent_id', 512),
+    'src_ip': ('source_ip', 'value', 'src_ip_id', 64),
+}
+
+entries = sa.table(
+    'log_entry',
+    sa.column('id', sa.Integer), sa.column('parsed_data', sa.JSON),
+    sa.column('domain_id', sa.Integer), sa.column('user_agent_id', sa.Integer), sa.column('src_ip_id', sa.Integer),
+)
+
+
+def dimension_table(field):
+    name, value_column, _, _ = DIMENSIONS[field]
+    return sa.table(name, sa.column('id', sa.Integer), sa.column(value_column, sa.String))
+
+
+def upgrade():
+    op.create_table('domain',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('source_ip',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.String(length=64), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('value')
+    )
+    op.create_table('user_agent',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.String(length=512), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('value')
+    )
+    with op.batch_alter_table('log_entry', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('domain_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('user_agent_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('src_ip_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_log_entry_user_agent_id', 'user_agent', ['user_agent_id'], ['id'])
+        batch_op.create_foreign_key('fk_log_entry_src_ip_id', 'source_ip', ['src_ip_id'], ['id'])
+        batch_op.create_foreign_key('fk_log_entry_domain_id', 'domain', ['domain_id'], ['id'])
+
+    backfill(op.get_bind())
+
+
+def downgrade():
+    restore(op.get_bind())
+
+    with op.batch_alter_table('log_entry', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_log_entry_domain_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_log_entry_src_ip_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_log_entry_user_agent_id', type_='foreignkey')
+        batch_op.drop_column('src_ip_id')
+        batch_op.drop_column('user_agent_id')
+        batch_op.drop_column('domain_id')
+
+    op.drop_table('user_agent')
+    op.drop_table('source_ip')
+    op.drop_table('domain')
+
+
+def iter_batches(bind, *columns):
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(entries.c.id, *columns).where(entries.c.id > last_id)
+            .order_by(entries.c.id).limit(BACKFILL_BATCH)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def backfill(bind):
+    """Intern domain, user agent and source IP values and strip them from parsed_data"""
+    ids = {field: {} for field in DIMENSIONS}
+    update = entries.update().where(entries.c.id == sa.bindparam('entry_id')).values(
+        parsed_data=sa.bindparam('parsed_data'), domain_id=sa.bindparam('domain_id'),
+        user_agent_id=sa.bindparam('user_agent_id'), src_ip_id=sa.bindparam('src_ip_id'),
+    )
+    for rows in iter_batches(bind, entries.c.parsed_data):
+        for field, (_, value_column, _, max_length) in DIMENSIONS.items():
+            new_values = {
+                (data or {}).get(field) for _, data in rows
+            } - set(ids[field])
+            new_values = [v for v in new_values if type(v) is str and len(v) <= max_length]
+            if new_values:
+                table = dimension_table(field)
+                bind.execute(table.insert(), [{value_column: v} for v in new_values])
+                ids[field].update(bind.execute(
+                    sa.select(table.c[value_column], table.c.id).where(table.c[value_column].in_(new_values))
+                ).all())
+        params = []
+        for entry_id, data in rows:
+            data = dict(data or {})
+            row = {'entry_id': entry_id}
+            for field, (_, _, id_column, _) in DIMENSIONS.items():
+                value = data.get(field)
+                row[id_column] = ids[field].get(value) if type(value) is str else None
+                if row[id_column] is not None:
+                    del data[field]
+            row['parsed_data'] = data
+            params.append(row)
+        bind.execute(update, params)
+
+
+def restore(bind):
+    """Put interned values back into parsed_data before the id columns are dropped"""
+    values = {}
+    for field, (_, value_column, _, _) in DIMENSIONS.items():
+        table = dimension_table(field)
+        values[field] = dict(bind.execute(sa.select(table.c.id, table.c[value_column])).all())
+    update = entries.update().where(entries.c.id == sa.bindparam('entry_id')).values(
+        parsed_data=sa.bindparam('parsed_data'))
+    for rows in iter_batches(bind, entries.c.parsed_data, entries.c.domain_id,
+                             entries.c.user_agent_id, entries.c.src_ip_id):
+        params = []
+        for entry_id, data, *ids in rows:
+            data = dict(data or {})
+            for field, value_id in zip(DIMENSIONS, ids):
+                if value_id is not None:
+                    data[field] = values[field][value_id]
+            params.append({'entry_id': entry_id, 'parsed_data': data})
+        bind.execute(update, params)
@@ -0,0 +1,147 @@
+"""monthly partitions
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 08:06:04.875226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+# Name the baseline's unnamed anomaly -> log_entry foreign key so batch mode can drop it on SQLite
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# Indexes and foreign keys of the tables rebuilt as partitioned tables on PostgreSQL
+PARTITIONED = {
+    'log_entry': {
+        'indexes': {
+            'ix_log_entry_logfile_id': '(logfile_id, id)',
+            'ix_log_entry_logfile_timestamp': '(logfile_id, timestamp, id)',
+        },
+        'foreign_keys': {
+            'log_entry_logfile_id_fkey': 'FOREIGN KEY (logfile_id) REFERENCES log_file (id)',
+            'fk_log_entry_domain_id': 'FOREIGN KEY (domain_id) REFERENCES domain (id)',
+            'fk_log_entry_user_agent_id': 'FOREIGN KEY (user_agent_id) REFERENCES user_agent (id)',
+            'fk_log_entry_src_ip_id': 'FOREIGN KEY (src_ip_id) REFERENCES source_ip (id)',
+        },
+    },
+    'anomaly': {
+        'indexes': {
+            'ix_anomaly_analysis_id': '(analysis_id, id)',
+            'ix_anomaly_analysis_severity': '(analysis_id, severity)',
+            'ix_anomaly_analysis_category': '(analysis_id, category)',
+            'ix_anomaly_analysis_type': '(analysis_id, type)',
+            'ix_anomaly_analysis_src_ip': '(analysis_id, src_ip)',
+        },
+        'foreign_keys': {
+            'fk_anomaly_analysis_id': 'FOREIGN KEY (analysis_id) REFERENCES analysis_result (id)',
+        },
+    },
+}
+
+files = sa.table('log_file', sa.column('id', sa.Integer), sa.column('upload_time', sa.DateTime))
+results = sa.table('analysis_result', sa.column('id', sa.Integer), sa.column('file_id', sa.Integer))
+entries = sa.table('log_entry', sa.column('logfile_id', sa.Integer), sa.column('period', sa.Integer))
+anomalies = sa.table('anomaly', sa.column('analysis_id', sa.Integer), sa.column('period', sa.Integer))
+
+
+def upgrade():
+    bind = op.get_bind()
+    postgresql = bind.dialect.name == 'postgresql'
+
+    with op.batch_alter_table('anomaly', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('period', sa.Integer(), nullable=True))
+    with op.batch_alter_table('log_entry', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('period', sa.Integer(), nullable=True))
+
+    backfill(bind)
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    if postgresql:
+        op.drop_constraint('anomaly_logentry_id_fkey', 'anomaly', type_='foreignkey')
+        op.alter_column('anomaly', 'period', existing_type=sa.Integer(), nullable=False)
+    else:
+        with op.batch_alter_table('anomaly', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.alter_column('period', existing_type=sa.Integer(), nullable=False)
+            batch_op.drop_constraint('fk_anomaly_logentry_id_log_entry', type_='foreignkey')
+
+    with op.batch_alter_table('log_entry', schema=None) as batch_op:
+        batch_op.alter_column('period', existing_type=sa.Integer(), nullable=False)
+
+    # ### end Alembic commands ###
+
+    if postgresql:
+        periods = [row[0] for row in bind.execute(sa.text('SELECT DISTINCT period FROM log_entry'))]
+        for table, spec in PARTITIONED.items():
+            rebuild(table, spec, periods)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, spec in PARTITIONED.items():
+            rebuild(table, spec, None)
+        op.create_foreign_key('anomaly_logentry_id_fkey', 'anomaly', 'log_entry', ['logentry_id'], ['id'])
+        op.drop_column('log_entry', 'period')
+        op.drop_column('anomaly', 'period')
+        return
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('log_entry', schema=None) as batch_op:
+        batch_op.drop_column('period')
+
+    with op.batch_alter_table('anomaly', schema=None) as batch_op:
+        batch_op.create_foreign_key('anomaly_logentry_id_fkey', 'log_entry', ['logentry_id'], ['id'])
+        batch_op.drop_column('period')
+
+    # ### end Alembic commands ###
+
+
+def backfill(bind):
+    """Set each file's entries and anomalies to the month it was uploaded"""
+    now = datetime.utcnow()
+    for file_id, upload_time in bind.execute(sa.select(files.c.id, files.c.upload_time)).fetchall():
+        when = upload_time or now
+        period = when.year * 100 + when.month
+        bind.execute(entries.update().where(entries.c.logfile_id == file_id).values(period=period))
+        bind.execute(anomalies.update().where(
+            anomalies.c.analysis_id.in_(sa.select(results.c.id).where(results.c.file_id == file_id))
+        ).values(period=period))
+
+
+def rebuild(table, spec, periods):
+    """Recreate a PostgreSQL table as list-partitioned by period (one partition per entry of periods),
+    or as a plain table again when periods is None, and move its rows across"""
+    old = f'{table}_old'
+    op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    # Primary key and index names are schema-wide, so free them for the new table
+    op.execute(f'ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey')
+    for name in spec['indexes']:
+        op.execute(f'ALTER INDEX {name} RENAME TO {name}_old')
+
+    if periods is None:
+        op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS)')
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)')
+    else:
+        op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY LIST (period)')
+        # Unique constraints on a partitioned table must include the partition key
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, period)')
+        for period in periods:
+            op.execute(f'CREATE TABLE {table}_p{int(period)} PARTITION OF {table} FOR VALUES IN ({int(period)})')
+    # Keep the id sequence when the old table is dropped
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    for name, columns in spec['indexes'].items():
+        op.execute(f'CREATE INDEX {name} ON {table} {columns}')
+    for name, definition in spec['foreign_keys'].items():
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+
+    op.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+    # Also drops the partitions of a previously partitioned table
+    op.execute(f'DROP TABLE {old}')
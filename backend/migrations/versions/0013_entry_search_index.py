@@ -0,0 +1,55 @@
+"""entry search index
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17 08:41:05.220318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from services.dimensions import load_values_by_id, hydrate
+from services.search import create_search_index, search_columns, search_text
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+entries = sa.table(
+    'log_entry',
+    sa.column('id', sa.Integer), sa.column('logfile_id', sa.Integer), sa.column('parsed_data', sa.JSON),
+    sa.column('domain_id', sa.Integer), sa.column('user_agent_id', sa.Integer), sa.column('src_ip_id', sa.Integer),
+)
+
+BATCH = 5000
+
+
+def upgrade():
+    bind = op.get_bind()
+    # The index is raw DDL (an FTS5 virtual table on SQLite), so autogenerate does not track it
+    create_search_index(bind)
+    backfill(bind)
+
+
+def downgrade():
+    op.execute('DROP TABLE IF EXISTS entry_search')
+
+
+def backfill(bind):
+    """Index the text of every existing entry, BATCH entries per statement"""
+    table, entry_id = search_columns(bind.dialect.name)
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(entries).where(entries.c.id > last_id).order_by(entries.c.id).limit(BATCH)
+        ).all()
+        if not rows:
+            return
+        id_rows = [(row.domain_id, row.user_agent_id, row.src_ip_id) for row in rows]
+        values = load_values_by_id(bind, id_rows)
+        bind.execute(sa.insert(table), [
+            {entry_id.name: row.id, 'logfile_id': row.logfile_id, 'line': search_text(hydrate(row.parsed_data, ids, values))}
+            for row, ids in zip(rows, id_rows)
+        ])
+        last_id = rows[-1].id
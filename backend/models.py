@@ -1,7 +1,58 @@
 from extensions import db
 from datetime import datetime
+import ipaddress
+import socket
+from sqlalchemy.dialects.postgresql import INET
+from services.compression import encode_document, decode_document
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# Values accepted by the LogEntry enum columns; anything else is stored as NULL
+ENTRY_ACTIONS = ('Allowed', 'Blocked')
+HTTP_METHODS = ('GET', 'POST', 'PUT', 'DELETE', 'HEAD', 'OPTIONS', 'PATCH', 'CONNECT', 'TRACE')
+
+def pack_ip(text):
+    """4/16-byte form of an IP address; inet_pton is far faster than the ipaddress module for IPv4"""
+    try:
+        return socket.inet_pton(socket.AF_INET, text)
+    except OSError:
+        return ipaddress.ip_address(text).packed
+
+def period_of(when):
+    """Upload month as a YYYYMM integer; log_entry and anomaly are partitioned by it on PostgreSQL"""
+    return when.year * 100 + when.month
+
+class IPAddress(db.TypeDecorator):
+    """IPv4/IPv6 address: INET on PostgreSQL, packed 4/16-byte binary elsewhere. Reads return the text form."""
+    impl = db.LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(INET())
+        return dialect.type_descriptor(db.LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == 'postgresql':
+            return value
+        return pack_ip(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == 'postgresql':
+            return value
+        value = bytes(value)
+        return socket.inet_ntoa(value) if len(value) == 4 else str(ipaddress.ip_address(value))
+
+class CompressedJSON(db.TypeDecorator):
+    """JSON document stored as zstd-compressed bytes. Reads decode it, and also accept plain JSON."""
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else encode_document(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decode_document(value)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -19,26 +70,143 @@ class LogFile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(256), nullable=False)
     upload_time = db.Column(db.DateTime, default=datetime.utcnow)
+    stored_path = db.Column(db.String(512), nullable=True)  # Immutable copy that entry offsets point into
+    content_digest = db.Column(db.String(64), nullable=True, index=True)  # BLAKE2b of the stored bytes, set once fully ingested
+    # Options the entries were parsed with; a re-upload only reuses the file when they match.
+    # NULL on files ingested before the options were recorded, which are never reused
+    ingest_format = db.Column(db.String(16), nullable=True)  # The requested format, 'auto' included
+    collapse_seconds = db.Column(db.Integer, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     entries = db.relationship('LogEntry', backref='logfile', lazy=True)
 
-class LogEntry(db.Model):
+    @property
+    def period(self):
+        return period_of(self.upload_time or datetime.utcnow())
+
+class UploadSession(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    logfile_id = db.Column(db.Integer, db.ForeignKey('log_file.id'), nullable=False)
+    filepath = db.Column(db.String(512), nullable=False)
+    log_format = db.Column(db.String(16), nullable=True)  # None until detected from the first lines
+    compression = db.Column(db.String(8), nullable=True)  # gzip/bz2/zstd, sniffed from the first chunk
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)  # Bytes acknowledged on disk
+    parsed_bytes = db.Column(db.BigInteger, nullable=False, default=0)  # Bytes up to the last ingested line
+    num_logs = db.Column(db.Integer, nullable=False, default=0)
+    parse_errors = db.Column(db.Integer, nullable=False, default=0)
+    collapse_seconds = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    completed = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Domain(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), unique=True, nullable=False)
+
+class UserAgent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.String(512), unique=True, nullable=False)
+
+class DomainVerdict(db.Model):
+    """is_suspicious_domain verdict for a domain, shared by every analysis while rules_version is current"""
+    domain = db.Column(db.String(255), primary_key=True)
+    rules_version = db.Column(db.String(16), nullable=False)
+    suspicious = db.Column(db.Boolean, nullable=False)
+    reason = db.Column(db.String(255), nullable=False)
+
+class SourceIP(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.String(64), unique=True, nullable=False)  # As logged, so hostnames are kept too
+
+def entry_period(context):
+    """Default LogEntry.period for ORM inserts: the upload month of the entry's file"""
+    logfile_id = context.get_current_parameters()['logfile_id']
+    upload_time = context.connection.execute(
+        db.select(LogFile.upload_time).where(LogFile.id == logfile_id)
+    ).scalar()
+    return period_of(upload_time or datetime.utcnow())
+
+class LogEntry(db.Model):
+    __table_args__ = (
+        # Per-file scans in id order (analysis, preview) and time-ordered keyset pages.
+        # id is the tiebreaker of the time order; SQLite would add the rowid implicitly, PostgreSQL needs it spelled out
+        db.Index('ix_log_entry_logfile_id', 'logfile_id', 'id'),
+        db.Index('ix_log_entry_logfile_timestamp', 'logfile_id', 'timestamp', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)  # (id, period) on PostgreSQL, where the table is partitioned by period
     logfile_id = db.Column(db.Integer, db.ForeignKey('log_file.id'), nullable=False)
+    period = db.Column(db.Integer, nullable=False, default=entry_period)
     timestamp = db.Column(db.DateTime, nullable=False)
-    raw_line = db.Column(db.Text, nullable=False)
+    raw_line = db.Column(db.Text, nullable=True)  # Only kept when the stored copy is compressed
+    line_offset = db.Column(db.BigInteger, nullable=True)  # Byte offset of the line in LogFile.stored_path
+    line_length = db.Column(db.Integer, nullable=True)
     parsed_data = db.Column(db.JSON, nullable=True)
-    anomalies = db.relationship('Anomaly', backref='logentry', lazy=True)
+    occurrences = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Identical lines collapsed into this row
+    last_timestamp = db.Column(db.DateTime, nullable=True)  # Latest collapsed occurrence; None for a single line
+    # Typed copies of the parsed fields the analysis reads; NULL when the log value does not fit
+    status_code = db.Column(db.SmallInteger, nullable=True)
+    bytes_sent = db.Column(db.BigInteger, nullable=True)
+    bytes_received = db.Column(db.BigInteger, nullable=True)
+    action = db.Column(db.Enum(*ENTRY_ACTIONS, name='entry_action'), nullable=True)
+    method = db.Column(db.Enum(*HTTP_METHODS, name='http_method'), nullable=True)
+    src_ip = db.Column(IPAddress, nullable=True)
+    dest_ip = db.Column(IPAddress, nullable=True)
+    # Interned strings; the value is removed from parsed_data when it has an id
+    domain_id = db.Column(db.Integer, db.ForeignKey('domain.id'), nullable=True)
+    user_agent_id = db.Column(db.Integer, db.ForeignKey('user_agent.id'), nullable=True)
+    src_ip_id = db.Column(db.Integer, db.ForeignKey('source_ip.id'), nullable=True)
+    anomalies = db.relationship('Anomaly', backref='logentry', lazy=True,
+                                primaryjoin='LogEntry.id == foreign(Anomaly.logentry_id)')
+
+class EntryRollup(db.Model):
+    """Hourly aggregate of compacted log entries, kept after the raw rows are deleted"""
+    __table_args__ = (
+        db.Index('ix_entry_rollup_logfile_hour', 'logfile_id', 'hour'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    logfile_id = db.Column(db.Integer, db.ForeignKey('log_file.id'), nullable=False)
+    hour = db.Column(db.DateTime, nullable=False)  # Entry timestamps truncated to the hour
+    src_ip_id = db.Column(db.Integer, db.ForeignKey('source_ip.id'), nullable=True)
+    domain_id = db.Column(db.Integer, db.ForeignKey('domain.id'), nullable=True)
+    status_code = db.Column(db.SmallInteger, nullable=True)
+    action = db.Column(db.Enum(*ENTRY_ACTIONS, name='entry_action'), nullable=True)
+    count = db.Column(db.Integer, nullable=False)  # Log lines, counting collapsed occurrences
+    bytes_sent = db.Column(db.BigInteger, nullable=True)
+    bytes_sent_max = db.Column(db.BigInteger, nullable=True)
+    bytes_received = db.Column(db.BigInteger, nullable=True)
+    bytes_received_max = db.Column(db.BigInteger, nullable=True)
 
 class Anomaly(db.Model):
+    __table_args__ = (
+        # Every read is scoped to one analysis; the second column serves the /result and /dashboard filters
+        db.Index('ix_anomaly_analysis_id', 'analysis_id', 'id'),
+        db.Index('ix_anomaly_analysis_severity', 'analysis_id', 'severity'),
+        db.Index('ix_anomaly_analysis_category', 'analysis_id', 'category'),
+        db.Index('ix_anomaly_analysis_type', 'analysis_id', 'type'),
+        db.Index('ix_anomaly_analysis_src_ip', 'analysis_id', 'src_ip'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    logentry_id = db.Column(db.Integer, db.ForeignKey('log_entry.id'), nullable=False)
-    reason = db.Column(db.String(256), nullable=False)
+    analysis_id = db.Column(db.Integer, db.ForeignKey('analysis_result.id'), nullable=False)
+    # No foreign key: a partitioned log_entry has no unique constraint on id alone.
+    # NULL once the flagged entry was compacted into a rollup.
+    logentry_id = db.Column(db.Integer, nullable=True)
+    period = db.Column(db.Integer, nullable=False)  # Same partition as the flagged entry
+    timestamp = db.Column(db.DateTime, nullable=True)
+    type = db.Column(db.String(32), nullable=False)  # First rule that fired, else 'ml'
+    reason = db.Column(db.String(256), nullable=False)  # Comma-separated detection methods
+    severity = db.Column(db.String(16), nullable=False)
+    category = db.Column(db.String(64), nullable=False)  # Threat category shown on the dashboard
     confidence = db.Column(db.Float, nullable=False)
+    iso_forest = db.Column(db.Boolean, nullable=False, default=False)
+    lof = db.Column(db.Boolean, nullable=False, default=False)
+    src_ip = db.Column(db.String(64), nullable=True)
+    domain = db.Column(db.String(255), nullable=True)
+    method = db.Column(db.String(16), nullable=True)
+    status_code = db.Column(db.SmallInteger, nullable=True)
     explanation = db.Column(db.Text, nullable=True)
+    details = db.Column(CompressedJSON, nullable=False)  # The full anomaly document returned by /result
 
 class AnalysisResult(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     file_id = db.Column(db.Integer, db.ForeignKey('log_file.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    results = db.Column(db.JSON, nullable=False)
+    results = db.Column(CompressedJSON, nullable=False)  # Summary only; the anomalies are Anomaly rows
+    anomalies = db.relationship('Anomaly', backref='analysis', lazy=True)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Delete log files uploaded before the retention window, with their entries, anomalies and
+analysis results. On PostgreSQL the expired monthly partitions of log_entry and anomaly are
+dropped whole; SQLite has no partitions, so there every expired row is deleted.
+
+Usage: python prune_logs.py [months]   (defaults to RETENTION_MONTHS)
+"""
+
+import os
+import sys
+from datetime import datetime
+from app import create_app
+from extensions import db
+from services.partitions import prune_before, retention_cutoff
+
+def main(months):
+    app = create_app()
+    with app.app_context():
+        months = months or app.config['RETENTION_MONTHS']
+        if months <= 0:
+            print("Retention is disabled; pass a number of months or set RETENTION_MONTHS")
+            return 1
+        summary = prune_before(db.session, retention_cutoff(datetime.utcnow(), months))
+        db.session.commit()
+        # Stored uploads are only removed once their rows are gone for good
+        for path in summary['stored_paths']:
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"Kept uploads from {summary['cutoff_period']} on: removed {summary['files']} files, "
+              f"dropped partitions {summary['partitions_dropped'] or 'none'}, "
+              f"expired {summary['digests_expired']} duplicate digests")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 0))
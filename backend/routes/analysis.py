@@ -1,14 +1,33 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
-from models import LogFile, LogEntry, AnalysisResult
+from models import LogFile, LogEntry, AnalysisResult, Anomaly, Domain
 from sklearn.ensemble import IsolationForest
 from sklearn.neighbors import LocalOutlierFactor
 from sklearn.preprocessing import StandardScaler
 import numpy as np
 import json
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from sqlalchemy import select
 from services.llm_service import LLMService
+from services.dimensions import DIMENSION_ID_COLUMNS, LOOKUP_CHUNK, load_dimension_values, hydrate
+from services.anomalies import anomaly_explanation, anomaly_rows, save_anomalies, filter_anomalies, timeline_type
+from services.rollups import file_rollups
+from services.sqlite import run_write
+from services.queries import file_entries
+from services.rules import automation_indicator, is_suspicious_domain
+from services.verdicts import lookup_domain_verdicts, save_domain_verdicts
+from services.features import FEATURE_COLUMNS, FeatureBuilder, weighted_mean_std, with_features
+from services.rule_columns import RULE_COLUMNS, LEGACY_RULE_COLUMNS, RuleColumns, RuleColumnBuilder, factorize
+
+# Rows fetched per round trip when streaming a file's entries
+STREAM_BATCH = 5000
+
+# Largest page of anomalies returned for one ?limit= request
+MAX_ANOMALY_PAGE = 1000
+
+# What the anomaly rows need of each analyzed entry
+AnalyzedEntry = namedtuple('AnalyzedEntry', 'id period timestamp method status_code')
 
 analysis_bp = Blueprint('analysis', __name__)
 
@@ -47,136 +66,151 @@ def calculate_confidence_score(anomaly_type, severity, model_scores=None, statis
     
     return min(confidence, 1.0)  # Cap at 1.0
 
-def detect_security_anomalies(entries, entry_data_list):
-    """Detect specific security-related anomalies with confidence scores"""
+def get_bytes(entry_data):
+    """Return (bytes_sent, bytes_received), preferring the parser's typed fields over the legacy 'bytes' string"""
+    if 'bytes_sent' in entry_data:
+        return entry_data['bytes_sent'], entry_data.get('bytes_received', 0)
+    sent, received = map(int, entry_data.get('bytes', '0 0').split())
+    return sent, received
+
+def weighted_percentile(values, weights, q):
+    """Smallest value whose cumulative weight reaches q percent of the total"""
+    order = np.argsort(values)
+    cumulative = np.cumsum(np.asarray(weights, dtype=float)[order])
+    idx = np.searchsorted(cumulative, cumulative[-1] * q / 100.0)
+    return np.asarray(values)[order][min(idx, len(order) - 1)]
+
+def field_values(entry_data_list, field, default=None):
+    return [data.get(field, default) for data in entry_data_list]
+
+def byte_columns(entry_data_list):
+    """(sent, received, readable) arrays; entries whose bytes cannot be read count as 0 and are not readable"""
+    n = len(entry_data_list)
+    sent = np.zeros(n)
+    received = np.zeros(n)
+    readable = np.ones(n, dtype=bool)
+    for i, data in enumerate(entry_data_list):
+        try:
+            sent[i], received[i] = get_bytes(data)
+        except Exception:
+            sent[i] = received[i] = 0
+            readable[i] = False
+    return sent, received, readable
+
+def entry_columns(entry_data_list):
+    """RuleColumns of parsed entry dicts"""
+    is_403 = np.fromiter((data.get('status_code') == '403' for data in entry_data_list), dtype=bool,
+                         count=len(entry_data_list))
+    return RuleColumns(
+        factorize(field_values(entry_data_list, 'src_ip')),
+        factorize(field_values(entry_data_list, 'user_agent')),
+        factorize(field_values(entry_data_list, 'domain')),
+        is_403,
+        *byte_columns(entry_data_list),
+    )
+
+def missing_as_empty(column):
+    """A factorized column with missing values counted as ''"""
+    values, codes = column
+    merged, remap = factorize(['' if value is None else value for value in values])
+    return merged, remap[codes]
+
+def detect_security_anomalies(entries, entry_data_list, weights=None, domain_verdicts=None):
+    """Detect specific security-related anomalies in parsed entry dicts, see detect_column_anomalies"""
+    return detect_column_anomalies(entry_columns(entry_data_list), weights, domain_verdicts)
+
+def detect_column_anomalies(columns, weights=None, domain_verdicts=None):
+    """Detect specific security-related anomalies with confidence scores from RuleColumns.
+
+    weights[i] is the number of log lines entry i stands for when repeated lines
+    were collapsed at ingest; request counts and byte statistics are weighted by it.
+    domain_verdicts maps domains to already known is_suspicious_domain results.
+    Each rule is evaluated over whole columns, or once per distinct value, and
+    findings are only built for the flagged entries.
+    """
     security_anomalies = []
-    
-    # Group entries by source IP for pattern analysis
-    ip_entries = defaultdict(list)
-    for i, entry in enumerate(entries):
-        src_ip = entry_data_list[i].get('src_ip', '')
-        ip_entries[src_ip].append((i, entry_data_list[i]))
+    n = len(columns.is_403)
+    weights = np.ones(n, dtype=np.int64) if weights is None else np.asarray(weights)
+    src_ip_values, src_ip_codes = columns.src_ip
+    src_ip = lambda i: src_ip_values[src_ip_codes[i]]
     
     # 1. Detect multiple 403s from same IP (brute force/scraping)
-    for src_ip, ip_logs in ip_entries.items():
-        if len(ip_logs) >= 3:  # Need at least 3 entries to detect pattern
-            status_403_count = sum(1 for _, data in ip_logs if data.get('status_code') == '403')
-            if status_403_count >= 2:  # Multiple 403s indicate brute force
-                for idx, data in ip_logs:
-                    if data.get('status_code') == '403':
-                        confidence = calculate_confidence_score('brute_force_403', 'high', 
-                                                             statistical_evidence={'pattern_count': status_403_count})
-                        security_anomalies.append({
-                            'type': 'brute_force_403',
-                            'severity': 'high',
-                            'confidence': confidence,
-                            'entry_index': idx,
-                            'src_ip': src_ip,
-                            'pattern': f"Multiple 403 errors from {src_ip} ({status_403_count} out of {len(ip_logs)} requests)",
-                            'description': f"Potential brute force attack or scraping attempt from {src_ip}",
-                            'explanation': f"IP {src_ip} generated {status_403_count} 403 errors in {len(ip_logs)} requests, indicating potential brute force or scraping activity"
-                        })
+    ips, ip_codes = missing_as_empty(columns.src_ip)
+    is_403 = columns.is_403
+    request_counts = np.bincount(ip_codes, weights=weights, minlength=len(ips)).astype(np.int64)
+    counts_403 = np.bincount(ip_codes[is_403], weights=weights[is_403], minlength=len(ips)).astype(np.int64)
+    # Need at least 3 requests to detect a pattern; multiple 403s indicate brute force
+    brute_force_ips = (request_counts >= 3) & (counts_403 >= 2)
+    flagged = np.flatnonzero(is_403 & brute_force_ips[ip_codes])
+    # Findings are listed per IP, in order of first appearance
+    for idx in flagged[np.argsort(ip_codes[flagged], kind='stable')].tolist():
+        code = ip_codes[idx]
+        ip, request_count, status_403_count = ips[code], int(request_counts[code]), int(counts_403[code])
+        confidence = calculate_confidence_score('brute_force_403', 'high', 
+                                             statistical_evidence={'pattern_count': status_403_count})
+        security_anomalies.append({
+            'type': 'brute_force_403',
+            'severity': 'high',
+            'confidence': confidence,
+            'entry_index': idx,
+            'src_ip': ip,
+            'pattern': f"Multiple 403 errors from {ip} ({status_403_count} out of {request_count} requests)",
+            'description': f"Potential brute force attack or scraping attempt from {ip}",
+            'explanation': f"IP {ip} generated {status_403_count} 403 errors in {request_count} requests, indicating potential brute force or scraping activity"
+        })
     
-    # 2. Detect automation tools in User-Agent
-    automation_indicators = ['curl', 'wget', 'python', 'postman', 'bot', 'spider', 'crawler']
-    for i, data in enumerate(entry_data_list):
-        user_agent = data.get('user_agent', '').lower()
-        for indicator in automation_indicators:
-            if indicator in user_agent:
-                confidence = calculate_confidence_score('automation_detected', 'medium')
-                security_anomalies.append({
-                    'type': 'automation_detected',
-                    'severity': 'medium',
-                    'confidence': confidence,
-                    'entry_index': i,
-                    'src_ip': data.get('src_ip'),
-                    'user_agent': data.get('user_agent'),
-                    'pattern': f"Automation tool detected: {indicator}",
-                    'description': f"Automated request detected with User-Agent containing '{indicator}'",
-                    'explanation': f"User-Agent contains '{indicator}', indicating automated request rather than normal browser traffic"
-                })
-                break  # Only flag once per entry
+    # 2. Detect automation tools in User-Agent, checking each distinct User-Agent once
+    user_agents, ua_codes = missing_as_empty(columns.user_agent)
+    indicators = [automation_indicator(user_agent) for user_agent in user_agents]
+    automated = np.array([indicator is not None for indicator in indicators], dtype=bool)
+    confidence = calculate_confidence_score('automation_detected', 'medium')
+    for i in np.flatnonzero(automated[ua_codes]).tolist():
+        indicator = indicators[ua_codes[i]]
+        security_anomalies.append({
+            'type': 'automation_detected',
+            'severity': 'medium',
+            'confidence': confidence,
+            'entry_index': i,
+            'src_ip': src_ip(i),
+            'user_agent': user_agents[ua_codes[i]],
+            'pattern': f"Automation tool detected: {indicator}",
+            'description': f"Automated request detected with User-Agent containing '{indicator}'",
+            'explanation': f"User-Agent contains '{indicator}', indicating automated request rather than normal browser traffic"
+        })
     
     # 3. Detect connections to suspicious/rare domains
-    # More realistic suspicious domain detection
-    suspicious_tlds = ['.xyz', '.top', '.cc', '.tk', '.ml', '.ga', '.cf']  # Often used for malicious sites
-    suspicious_patterns = [
-        # Typosquatting patterns
-        ('google', ['g00gle', 'go0gle', 'gogle', 'gooogle']),
-        ('facebook', ['facebo0k', 'faceb00k', 'fasebook', 'facebok']),
-        ('amazon', ['amaz0n', 'amazoon', 'amazn', 'amaz0n']),
-        ('microsoft', ['m1crosoft', 'micros0ft', 'm1cr0s0ft', 'microsft']),
-        ('paypal', ['paypa1', 'paypall', 'paypa1', 'paypa1']),
-        ('apple', ['app1e', 'app1e', 'appel', 'app1e']),
-    ]
-    
-    # Check for suspicious TLDs and patterns
-    def is_suspicious_domain(domain):
-        domain_lower = domain.lower()
-        
-        # Check for suspicious TLDs
-        for tld in suspicious_tlds:
-            if domain_lower.endswith(tld):
-                return True, f"Suspicious TLD: {tld}"
-        
-        # Check for typosquatting patterns
-        for legitimate, variations in suspicious_patterns:
-            if legitimate in domain_lower:
-                for variation in variations:
-                    if variation in domain_lower:
-                        return True, f"Typosquatting: {legitimate} → {variation}"
-        
-        # Check for suspicious subdomain patterns
-        if domain_lower.count('.') > 2:  # Too many subdomains
-            return True, "Excessive subdomains"
-        
-        # Check for random-looking domains (lots of numbers/random chars)
-        if len(domain) > 20 and sum(c.isdigit() for c in domain) > len(domain) * 0.3:
-            return True, "Random-looking domain with many numbers"
-        
-        return False, ""
-
-    rare_domains = set()  # Track domains that appear only once
-    
-    # Count domain frequency
-    domain_counts = defaultdict(int)
-    for data in entry_data_list:
-        domain = data.get('domain', '')
-        domain_counts[domain] += 1
-    
-    # Find rare domains (appear only once)
-    for domain, count in domain_counts.items():
-        if count == 1:
-            rare_domains.add(domain)
-    
-    for i, data in enumerate(entry_data_list):
-        domain = data.get('domain', '')
-        
-        # Check for suspicious domain patterns
-        is_suspicious, reason = is_suspicious_domain(domain)
-        if is_suspicious:
-            confidence = calculate_confidence_score('suspicious_domain', 'high')
+    domains, domain_codes = missing_as_empty(columns.domain)
+    # Rare domains appear only once
+    rare = np.bincount(domain_codes, weights=weights, minlength=len(domains)) == 1
+    # Classify each distinct domain once rather than once per entry
+    known = domain_verdicts or {}
+    verdicts = [known[domain] if domain in known else is_suspicious_domain(domain) for domain in domains]
+    suspicious = np.array([is_suspicious for is_suspicious, _ in verdicts], dtype=bool)
+    suspicious_confidence = calculate_confidence_score('suspicious_domain', 'high')
+    rare_confidence = calculate_confidence_score('rare_domain', 'medium')
+    for i in np.flatnonzero(suspicious[domain_codes] | rare[domain_codes]).tolist():
+        code = domain_codes[i]
+        domain = domains[code]
+        if suspicious[code]:
+            reason = verdicts[code][1]
             security_anomalies.append({
                 'type': 'suspicious_domain',
                 'severity': 'high',
-                'confidence': confidence,
+                'confidence': suspicious_confidence,
                 'entry_index': i,
-                'src_ip': data.get('src_ip'),
+                'src_ip': src_ip(i),
                 'domain': domain,
                 'pattern': f"Suspicious domain: {domain}",
                 'description': f"Domain shows suspicious characteristics: {reason}",
                 'explanation': f"Domain '{domain}' shows suspicious characteristics: {reason}. This could indicate a malicious or phishing site."
             })
-        
-        # Check for rare domains
-        if domain in rare_domains:
-            confidence = calculate_confidence_score('rare_domain', 'medium')
+        if rare[code]:
             security_anomalies.append({
                 'type': 'rare_domain',
                 'severity': 'medium',
-                'confidence': confidence,
+                'confidence': rare_confidence,
                 'entry_index': i,
-                'src_ip': data.get('src_ip'),
+                'src_ip': src_ip(i),
                 'domain': domain,
                 'pattern': f"Rare domain accessed: {domain}",
                 'description': f"Connection to rarely accessed domain: {domain}",
@@ -184,60 +218,58 @@ def detect_security_anomalies(entries, entry_data_list):
             })
     
     # 4. Detect data exfiltration (unusual data transfer patterns)
-    # Calculate baseline for data transfer
-    all_bytes_sent = []
-    all_bytes_received = []
-    
-    for data in entry_data_list:
-        try:
-            bytes_str = data.get('bytes', '0 0')
-            sent, received = map(int, bytes_str.split())
-            all_bytes_sent.append(sent)
-            all_bytes_received.append(received)
-        except:
-            all_bytes_sent.append(0)
-            all_bytes_received.append(0)
-    
-    if all_bytes_sent and all_bytes_received:
-        avg_sent = np.mean(all_bytes_sent)
-        avg_received = np.mean(all_bytes_received)
-        std_sent = np.std(all_bytes_sent)
-        std_received = np.std(all_bytes_received)
+    if n:
+        # Baseline for data transfer; unreadable bytes count as 0 but are never flagged
+        all_bytes_sent, all_bytes_received = columns.bytes_sent, columns.bytes_received
+        avg_sent, std_sent = weighted_mean_std(all_bytes_sent, weights)
+        avg_received, std_received = weighted_mean_std(all_bytes_received, weights)
         
         # Threshold: 2 standard deviations above mean
         sent_threshold = avg_sent + (2 * std_sent)
         received_threshold = avg_received + (2 * std_received)
         
-        for i, data in enumerate(entry_data_list):
-            try:
-                bytes_str = data.get('bytes', '0 0')
-                sent, received = map(int, bytes_str.split())
-                
-                if sent > sent_threshold or received > received_threshold:
-                    std_deviations = max(
-                        (sent - avg_sent) / std_sent if std_sent > 0 else 0,
-                        (received - avg_received) / std_received if std_received > 0 else 0
-                    )
-                    confidence = calculate_confidence_score('data_exfiltration', 'high', 
-                                                         statistical_evidence={'std_deviations': std_deviations})
-                    security_anomalies.append({
-                        'type': 'data_exfiltration',
-                        'severity': 'high',
-                        'confidence': confidence,
-                        'entry_index': i,
-                        'src_ip': data.get('src_ip'),
-                        'domain': data.get('domain'),
-                        'bytes_sent': sent,
-                        'bytes_received': received,
-                        'pattern': f"Unusual data transfer: {sent} sent, {received} received",
-                        'description': f"Potential data exfiltration - {sent} bytes sent, {received} bytes received (threshold: {sent_threshold:.0f} sent, {received_threshold:.0f} received)",
-                        'explanation': f"Data transfer of {sent} bytes sent and {received} bytes received is {std_deviations:.1f} standard deviations above normal, indicating potential data exfiltration"
-                    })
-            except:
-                continue
+        exfiltration = columns.readable_bytes & ((all_bytes_sent > sent_threshold) | (all_bytes_received > received_threshold))
+        domain_values, raw_domain_codes = columns.domain
+        for i in np.flatnonzero(exfiltration).tolist():
+            sent, received = int(all_bytes_sent[i]), int(all_bytes_received[i])
+            std_deviations = max(
+                (sent - avg_sent) / std_sent if std_sent > 0 else 0,
+                (received - avg_received) / std_received if std_received > 0 else 0
+            )
+            confidence = calculate_confidence_score('data_exfiltration', 'high', 
+                                                 statistical_evidence={'std_deviations': std_deviations})
+            security_anomalies.append({
+                'type': 'data_exfiltration',
+                'severity': 'high',
+                'confidence': confidence,
+                'entry_index': i,
+                'src_ip': src_ip(i),
+                'domain': domain_values[raw_domain_codes[i]],
+                'bytes_sent': sent,
+                'bytes_received': received,
+                'pattern': f"Unusual data transfer: {sent} sent, {received} received",
+                'description': f"Potential data exfiltration - {sent} bytes sent, {received} bytes received (threshold: {sent_threshold:.0f} sent, {received_threshold:.0f} received)",
+                'explanation': f"Data transfer of {sent} bytes sent and {received} bytes received is {std_deviations:.1f} standard deviations above normal, indicating potential data exfiltration"
+            })
     
     return security_anomalies
 
+def flagged_entries(file_id, period, ids, values):
+    """{id: (AnalyzedEntry, hydrated parsed_data)} for the entries of a file with the given ids"""
+    ids = ids.tolist()
+    found = {}
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        rows = db.session.execute(file_entries(select(
+            LogEntry.id, LogEntry.period, LogEntry.timestamp, LogEntry.parsed_data, *DIMENSION_ID_COLUMNS,
+            LogEntry.method, LogEntry.status_code,
+        ), file_id, period).where(LogEntry.id.in_(ids[start:start + LOOKUP_CHUNK])))
+        for entry in rows:
+            found[entry.id] = (
+                AnalyzedEntry(entry.id, entry.period, entry.timestamp, entry.method, entry.status_code),
+                hydrate(entry.parsed_data, (entry.domain_id, entry.user_agent_id, entry.src_ip_id), values),
+            )
+    return found
+
 def analyze_feature_importance(X, model, model_name):
     """Analyze which features contributed most to anomaly detection"""
     if model_name == 'isolation_forest':
@@ -256,7 +288,9 @@ def analyze_feature_importance(X, model, model_name):
 def generate_reasoning(entry_data, iso_score, lof_score, feature_importance, model_name, security_anomalies=None, averages=None, stds=None):
     reasons = []
     # Analyze status codes
-    status_code = int(entry_data.get('status_code', 0))
+    # Non-numeric statuses (JSONL and CSV accept any text) count as missing
+    status = str(entry_data.get('status_code') or '')
+    status_code = int(status) if status.isdigit() else 0
     if status_code >= 400:
         reasons.append(f"Unusual status code: {status_code} (>=400)")
     elif status_code == 0:
@@ -265,8 +299,7 @@ def generate_reasoning(entry_data, iso_score, lof_score, feature_importance, mod
         reasons.append(f"Rare status code: {status_code}")
     # Analyze bytes transferred
     try:
-        bytes_str = entry_data.get('bytes', '0 0')
-        bytes_sent, bytes_received = map(int, bytes_str.split())
+        bytes_sent, bytes_received = get_bytes(entry_data)
         avg_sent = averages['bytes_sent'] if averages and 'bytes_sent' in averages else None
         avg_received = averages['bytes_received'] if averages and 'bytes_received' in averages else None
         std_sent = stds['bytes_sent'] if stds and 'bytes_sent' in stds else None
@@ -325,28 +358,6 @@ def generate_reasoning(entry_data, iso_score, lof_score, feature_importance, mod
         reasons.append("Local Outlier Factor detected this entry as an outlier compared to its neighbors.")
     return reasons
 
-def getAnomalyExplanation(anomaly):
-    """Extract explanation from anomaly object using fallback logic"""
-    # First, try to get explanation from top level
-    explanation = anomaly.get('explanation', '')
-    
-    # If not found, try to get from security anomalies
-    if not explanation and anomaly.get('security_anomalies'):
-        security_anomaly = anomaly['security_anomalies'][0]
-        explanation = security_anomaly.get('explanation', '')
-    
-    # If still not found, try to get from ML reasoning
-    if not explanation and anomaly.get('reasoning'):
-        iso_reasons = anomaly.get('reasoning', {}).get('isolation_forest', {}).get('reasons', [])
-        lof_reasons = anomaly.get('reasoning', {}).get('lof', {}).get('reasons', [])
-        if iso_reasons:
-            explanation = iso_reasons[0]
-        elif lof_reasons:
-            explanation = lof_reasons[0]
-    
-    # Final fallback
-    return explanation or "No explanation available"
-
 def to_native(obj):
     if isinstance(obj, np.generic):
         return obj.item()
@@ -397,50 +408,52 @@ def run_analysis():
     logfile = LogFile.query.get(file_id)
     if not logfile:
         return jsonify({'msg': 'LogFile not found'}), 404
-    entries = LogEntry.query.filter_by(logfile_id=file_id).all()
-    if not entries:
+    num_entries = db.session.execute(
+        file_entries(select(db.func.count()).select_from(LogEntry), file_id, logfile.period)
+    ).scalar()
+    if not num_entries:
         return jsonify({'msg': 'No log entries found for this file'}), 404
     
     # Initialize LLM service if requested
     llm_service = LLMService() if use_llm else None
     
-    # Extract features for anomaly detection
-    features = []
-    entry_data_list = []
-    for entry in entries:
-        pdata = entry.parsed_data or {}
-        try:
-            # Extract more features for better analysis
-            status_code = int(pdata.get('status_code', 0))
-            bytes_str = pdata.get('bytes', '0 0')
-            bytes_sent, bytes_received = map(int, bytes_str.split())
-            
-            features.append([
-                status_code,
-                bytes_sent,
-                bytes_received,
-                len(pdata.get('domain', '')),
-                len(pdata.get('user_agent', '')),
-                1 if pdata.get('action') == 'Blocked' else 0,
-                1 if pdata.get('method') == 'POST' else 0,
-            ])
-            entry_data_list.append(pdata)
-        except Exception as e:
-            print(f"Error processing entry {entry.id}: {e}")
-            features.append([0, 0, 0, 0, 0, 0, 0])
-            entry_data_list.append(pdata)
-    
-    X = np.array(features)
+    # Stream only the needed columns: the features, computed by the database, fill a preallocated
+    # float32 matrix a batch at a time and the rule inputs typed arrays, so no ORM entity or
+    # parsed_data dict is built for an entry; only flagged entries are hydrated further down
+    features = FeatureBuilder(num_entries)
+    rule_columns = RuleColumnBuilder(num_entries, len(FEATURE_COLUMNS))
+    dimension_values = load_dimension_values(db.session, file_id)
+    rows = db.session.execute(
+        file_entries(with_features(select(*FEATURE_COLUMNS, *RULE_COLUMNS, *LEGACY_RULE_COLUMNS)), file_id, logfile.period)
+        .order_by(LogEntry.id).execution_options(yield_per=STREAM_BATCH)
+    )
+    for batch in rows.partitions():
+        # Rows added since the count are left for the next analysis
+        added = features.add(batch)
+        rule_columns.add(batch[:added])
+        if added < len(batch):
+            break
+    rows.close()
+    # Lines collapsed at ingest count once per occurrence
+    X, weights = features.finish()
+    columns = rule_columns.finish(dimension_values, features)
+    weighted = bool((weights > 1).any())
     
     # Standardize features
     scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    X_scaled = scaler.fit_transform(X, sample_weight=weights) if weighted else scaler.fit_transform(X)
     
     # Run Isolation Forest
     iso = IsolationForest(contamination=0.1, random_state=42)
-    iso_scores = iso.fit_predict(X_scaled)
-    
-    # Run Local Outlier Factor
+    if weighted:
+        iso.fit(X_scaled, sample_weight=weights)
+        # Contamination is a share of log lines, not of collapsed rows
+        iso.offset_ = weighted_percentile(iso.score_samples(X_scaled), weights, 100 * 0.1)
+        iso_scores = iso.predict(X_scaled)
+    else:
+        iso_scores = iso.fit_predict(X_scaled)
+    
+    # Run Local Outlier Factor (it takes no sample weights, so it scores distinct rows)
     lof = LocalOutlierFactor(n_neighbors=20, contamination=0.1)
     lof_scores = lof.fit_predict(X_scaled)
     
@@ -448,114 +461,116 @@ def run_analysis():
     iso_importance = analyze_feature_importance(X_scaled, iso, 'isolation_forest')
     lof_importance = analyze_feature_importance(X_scaled, lof, 'lof')
     
-    # Detect security-specific anomalies
-    security_anomalies = detect_security_anomalies(entries, entry_data_list)
+    # Detect security-specific anomalies; verdicts stored by earlier analyses are reused
+    domain_verdicts, new_verdicts = lookup_domain_verdicts(db.session, dimension_values['domain'].values())
+    security_anomalies = detect_column_anomalies(columns, weights, domain_verdicts)
     
-    # Calculate averages for bytes sent/received
-    all_bytes_sent = [int((d.get('bytes', '0 0').split()[0])) for d in entry_data_list if 'bytes' in d]
-    all_bytes_received = [int((d.get('bytes', '0 0').split()[1])) for d in entry_data_list if 'bytes' in d]
-    averages = {
-        'bytes_sent': np.mean(all_bytes_sent) if all_bytes_sent else 0,
-        'bytes_received': np.mean(all_bytes_received) if all_bytes_received else 0
-    }
-
-    # Calculate standard deviations for bytes sent/received
-    std_sent = np.std(all_bytes_sent) if all_bytes_sent else 0
-    std_received = np.std(all_bytes_received) if all_bytes_received else 0
-    stds = {
-        'bytes_sent': std_sent,
-        'bytes_received': std_received
-    }
+    # Averages and standard deviations for bytes sent/received, from the feature columns
+    averages, stds = features.byte_stats()
 
     # Collect anomalies with reasoning and confidence scores
+    findings = defaultdict(list)
+    for finding in security_anomalies:
+        findings[finding['entry_index']].append(finding)
+    has_findings = np.zeros(len(X), dtype=bool)
+    has_findings[list(findings)] = True
+    flagged = np.flatnonzero((iso_scores == -1) | (lof_scores == -1) | has_findings)
+    # Only the flagged entries are read back and hydrated for their anomaly documents
+    flagged_rows = flagged_entries(file_id, logfile.period, rule_columns.ids[flagged], dimension_values)
     anomalies = []
-    for i, entry in enumerate(entries):
+    anomaly_entries = []
+    for i, entry_id in zip(flagged.tolist(), rule_columns.ids[flagged].tolist()):
+        if entry_id not in flagged_rows:
+            # Deleted while the analysis ran
+            continue
+        entry, entry_data = flagged_rows[entry_id]
         is_anomaly = iso_scores[i] == -1 or lof_scores[i] == -1
-        # Check if this entry has security anomalies
-        entry_security_anomalies = [a for a in security_anomalies if a['entry_index'] == i]
-        if is_anomaly or entry_security_anomalies:
-            # Calculate ML model confidence
-            ml_confidence = 0.0
-            if iso_scores[i] == -1 and lof_scores[i] == -1:
-                ml_confidence = 0.85  # Both models agree
-            elif iso_scores[i] == -1 or lof_scores[i] == -1:
-                ml_confidence = 0.70  # One model flags
-            # Generate reasoning for each model
-            iso_reasons = generate_reasoning(entry_data_list[i], iso_scores[i], lof_scores[i], iso_importance, 'isolation_forest', entry_security_anomalies, averages, stds) if iso_scores[i] == -1 else []
-            lof_reasons = generate_reasoning(entry_data_list[i], iso_scores[i], lof_scores[i], lof_importance, 'lof', entry_security_anomalies, averages, stds) if lof_scores[i] == -1 else []
-            model_reasons = {
-                'isolation_forest': {
-                    'flagged': iso_scores[i] == -1,
-                    'reasons': iso_reasons,
-                    'feature_importance': iso_importance.tolist()
-                },
-                'lof': {
-                    'flagged': lof_scores[i] == -1,
-                    'reasons': lof_reasons,
-                    'feature_importance': lof_importance.tolist()
-                }
+        # Security anomalies found for this entry
+        entry_security_anomalies = findings.get(i, [])
+        # Calculate ML model confidence
+        ml_confidence = 0.0
+        if iso_scores[i] == -1 and lof_scores[i] == -1:
+            ml_confidence = 0.85  # Both models agree
+        elif iso_scores[i] == -1 or lof_scores[i] == -1:
+            ml_confidence = 0.70  # One model flags
+        # Generate reasoning for each model
+        iso_reasons = generate_reasoning(entry_data, iso_scores[i], lof_scores[i], iso_importance, 'isolation_forest', entry_security_anomalies, averages, stds) if iso_scores[i] == -1 else []
+        lof_reasons = generate_reasoning(entry_data, iso_scores[i], lof_scores[i], lof_importance, 'lof', entry_security_anomalies, averages, stds) if lof_scores[i] == -1 else []
+        model_reasons = {
+            'isolation_forest': {
+                'flagged': iso_scores[i] == -1,
+                'reasons': iso_reasons,
+                'feature_importance': iso_importance.tolist()
+            },
+            'lof': {
+                'flagged': lof_scores[i] == -1,
+                'reasons': lof_reasons,
+                'feature_importance': lof_importance.tolist()
             }
-            # Calculate overall confidence score
-            max_security_confidence = max([a['confidence'] for a in entry_security_anomalies]) if entry_security_anomalies else 0.0
-            overall_confidence = max(ml_confidence, max_security_confidence)
-            # Determine severity
-            if entry_security_anomalies:
-                # Use the highest severity from rule-based anomalies
-                severity = max([a['severity'] for a in entry_security_anomalies], key=lambda s: {'high':3,'medium':2,'low':1}.get(s,0))
-            else:
-                # ML-only anomaly: set severity based on confidence or model agreement
-                if iso_scores[i] == -1 and lof_scores[i] == -1:
-                    severity = 'high'
-                elif overall_confidence > 0.8:
-                    severity = 'high'
-                elif overall_confidence > 0.6:
-                    severity = 'medium'
-                else:
-                    severity = 'low'
-            # Determine the main type for this anomaly and assign a meaningful category
-            if entry_security_anomalies:
-                main_type = entry_security_anomalies[0]['type']
-                threat_category = get_threat_category(main_type)
-            elif iso_scores[i] == -1 or lof_scores[i] == -1:
-                # ML-only anomaly: assign category based on reasoning
-                ml_reasons = iso_reasons if iso_scores[i] == -1 else lof_reasons
-                threat_category = map_reason_to_category(ml_reasons)
-                main_type = 'ml'
+        }
+        # Calculate overall confidence score
+        max_security_confidence = max([a['confidence'] for a in entry_security_anomalies]) if entry_security_anomalies else 0.0
+        overall_confidence = max(ml_confidence, max_security_confidence)
+        # Determine severity
+        if entry_security_anomalies:
+            # Use the highest severity from rule-based anomalies
+            severity = max([a['severity'] for a in entry_security_anomalies], key=lambda s: {'high':3,'medium':2,'low':1}.get(s,0))
+        else:
+            # ML-only anomaly: set severity based on confidence or model agreement
+            if iso_scores[i] == -1 and lof_scores[i] == -1:
+                severity = 'high'
+            elif overall_confidence > 0.8:
+                severity = 'high'
+            elif overall_confidence > 0.6:
+                severity = 'medium'
             else:
-                main_type = 'other'
-                threat_category = 'Unusual Pattern'
-            anomaly_data = {
-                'id': entry.id,
-                'timestamp': entry_data_list[i].get('timestamp'),
-                'src_ip': entry_data_list[i].get('src_ip'),
-                'dest_ip': entry_data_list[i].get('dest_ip'),
-                'domain': entry_data_list[i].get('domain'),
-                'action': entry_data_list[i].get('action'),
-                'method': entry_data_list[i].get('method'),
-                'status_code': entry_data_list[i].get('status_code'),
-                'bytes': entry_data_list[i].get('bytes'),
-                'user_agent': entry_data_list[i].get('user_agent'),
-                'iso_forest': int(iso_scores[i] == -1),
-                'lof': int(lof_scores[i] == -1),
-                'confidence_score': overall_confidence,
-                'reasoning': model_reasons,
-                'security_anomalies': entry_security_anomalies,
-                'severity': severity,
-                'threat_category': threat_category,
-                'anomaly_summary': {
-                    'ml_detected': is_anomaly,
-                    'security_detected': len(entry_security_anomalies) > 0,
-                    'highest_severity': severity,
-                    'detection_methods': ['ml'] if is_anomaly else [] + [a['type'] for a in entry_security_anomalies]
-                }
+                severity = 'low'
+        # Determine the main type for this anomaly and assign a meaningful category
+        if entry_security_anomalies:
+            main_type = entry_security_anomalies[0]['type']
+            threat_category = get_threat_category(main_type)
+        elif iso_scores[i] == -1 or lof_scores[i] == -1:
+            # ML-only anomaly: assign category based on reasoning
+            ml_reasons = iso_reasons if iso_scores[i] == -1 else lof_reasons
+            threat_category = map_reason_to_category(ml_reasons)
+            main_type = 'ml'
+        else:
+            main_type = 'other'
+            threat_category = 'Unusual Pattern'
+        anomaly_data = {
+            'id': entry.id,
+            'timestamp': entry_data.get('timestamp'),
+            'src_ip': entry_data.get('src_ip'),
+            'dest_ip': entry_data.get('dest_ip'),
+            'domain': entry_data.get('domain'),
+            'action': entry_data.get('action'),
+            'method': entry_data.get('method'),
+            'status_code': entry_data.get('status_code'),
+            'bytes': entry_data.get('bytes'),
+            'user_agent': entry_data.get('user_agent'),
+            'occurrences': int(weights[i]),
+            'iso_forest': int(iso_scores[i] == -1),
+            'lof': int(lof_scores[i] == -1),
+            'confidence_score': overall_confidence,
+            'reasoning': model_reasons,
+            'security_anomalies': entry_security_anomalies,
+            'severity': severity,
+            'threat_category': threat_category,
+            'anomaly_summary': {
+                'ml_detected': is_anomaly,
+                'security_detected': len(entry_security_anomalies) > 0,
+                'highest_severity': severity,
+                'detection_methods': ['ml'] if is_anomaly else [] + [a['type'] for a in entry_security_anomalies]
             }
-            anomalies.append(anomaly_data)
+        }
+        anomalies.append(anomaly_data)
+        anomaly_entries.append(entry)
     
     # Generate summary report with LLM (only once, not per anomaly)
     summary_report = None
     if llm_service and anomalies:
         summary_context = {
-            'num_entries': len(entries),
+            'num_entries': int(weights.sum()),
             'num_anomalies': len(anomalies),
             'top_anomalies': anomalies[:5],
             'security_anomalies': security_anomalies,
@@ -576,7 +591,7 @@ def run_analysis():
                 'src_ip': anomaly.get('src_ip', 'Unknown'),
                 'domain': anomaly.get('domain', 'Unknown'),
                 'timestamp': anomaly.get('timestamp', 'Unknown'),
-                'explanation': getAnomalyExplanation(anomaly),
+                'explanation': anomaly_explanation(anomaly),
                 'detection_methods': anomaly.get('anomaly_summary', {}).get('detection_methods', [])
             }
             summary_context['anomaly_details'].append(anomaly_detail)
@@ -598,12 +613,12 @@ def run_analysis():
         
         summary_report = llm_service.generate_summary_report(summary_context)
     
-    # Store analysis result in DB
+    # Store the analysis summary; each anomaly becomes an indexed Anomaly row
+    anomalies = json.loads(json.dumps(anomalies, default=to_native))
     results_dict = {
         'file_id': file_id,
-        'num_entries': len(entries),
+        'num_entries': int(weights.sum()),
         'num_anomalies': len(anomalies),
-        'anomalies': anomalies,
         'security_anomalies': security_anomalies,
         'model_performance': {
             'isolation_forest_anomalies': sum(1 for a in anomalies if a['iso_forest']),
@@ -613,184 +628,165 @@ def run_analysis():
         'summary_report': summary_report,
         'llm_enabled': use_llm
     }
-    result = AnalysisResult(
-        file_id=file_id,
-        created_at=datetime.utcnow(),
-        results=json.loads(json.dumps(results_dict, default=to_native))
-    )
-    db.session.add(result)
-    db.session.commit()
-    return jsonify(result.results)
+    results = json.loads(json.dumps(results_dict, default=to_native))
+    rows = anomaly_rows(anomalies, anomaly_entries)
+
+    def store_result(session):
+        result = AnalysisResult(file_id=file_id, created_at=datetime.utcnow(), results=results)
+        session.add(result)
+        session.flush()
+        save_anomalies(session, result.id, rows)
+        save_domain_verdicts(session, new_verdicts)
+        return result.id
+
+    run_write(store_result)
+    return jsonify(dict(results, anomalies=anomalies))
 
 @analysis_bp.route('/result/<int:file_id>', methods=['GET'])
 def get_analysis_result(file_id):
     result = AnalysisResult.query.filter_by(file_id=file_id).order_by(AnalysisResult.created_at.desc()).first()
     if not result:
         return jsonify({'msg': 'No analysis result found for this file'}), 404
-    return jsonify(result.results)
+    # Only the matching anomaly rows are read, e.g. ?severity=high&min_confidence=0.8
+    period = db.session.get(LogFile, file_id).period
+    query = filter_anomalies(Anomaly.query.filter(Anomaly.analysis_id == result.id, Anomaly.period == period), request.args)
+    after_id = request.args.get('after_id', 0, type=int)
+    limit = request.args.get('limit', type=int)
+    query = query.filter(Anomaly.id > after_id).order_by(Anomaly.id)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_ANOMALY_PAGE))
+        query = query.limit(limit)
+    rows = query.with_entities(Anomaly.id, Anomaly.details).all()
+    return jsonify(dict(
+        result.results,
+        anomalies=[row.details for row in rows],
+        next_after_id=rows[-1].id if limit and rows and len(rows) == limit else None
+    ))
 
 @analysis_bp.route('/dashboard/<int:file_id>', methods=['GET'])
 def dashboard_metrics(file_id):
     result = AnalysisResult.query.filter_by(file_id=file_id).order_by(AnalysisResult.created_at.desc()).first()
     if not result:
         return jsonify({'msg': 'No analysis result found for this file'}), 404
-    # Fetch log entries for this file
-    entries = LogEntry.query.filter_by(logfile_id=file_id).all()
-    if not entries:
+    period = db.session.get(LogFile, file_id).period
+    has_entries = db.session.execute(
+        select(file_entries(select(LogEntry.id), file_id, period).exists())
+    ).scalar()
+    # Hours whose raw entries were compacted away are charted from their rollups
+    rollups = file_rollups(db.session, file_id)
+    if not has_entries and not rollups:
         return jsonify({'msg': 'No log entries found for this file'}), 404
     data = result.results
-    anomalies = data.get('anomalies', [])
+    # Anomaly aggregates are computed in the database from the indexed Anomaly rows
+    scoped = Anomaly.query.filter(Anomaly.analysis_id == result.id, Anomaly.period == period)
+    def grouped(column):
+        return scoped.with_entities(column, db.func.count()).group_by(column).all()
+    def top(column, label):
+        count = db.func.count().label('count')
+        rows = scoped.with_entities(column, count).filter(column != 'unknown') \
+            .group_by(column).order_by(count.desc(), column).limit(5).all()
+        return [{label: value, 'count': c} for value, c in rows]
+    def summarize(a):
+        return {
+            'id': a.logentry_id,
+            'timestamp': a.timestamp.strftime('%Y-%m-%d %H:%M:%S') if a.timestamp else None,
+            'type': a.reason,
+            'severity': a.severity,
+            'src_ip': a.src_ip,
+            'domain': a.domain,
+            'confidence_score': a.confidence,
+            'explanation': a.explanation,
+            'threat_category': a.category,
+        }
     # Total logs
     total_logs = data.get('num_entries', 0)
     # Total anomalies
-    total_anomalies = data.get('num_anomalies', len(anomalies))
-    # Anomalies by type
+    total_anomalies = data.get('num_anomalies', 0)
+    # Anomalies by type; reason lists every detection method that flagged the entry
     anomalies_by_type = {}
-    for a in anomalies:
-        t = a.get('anomaly_summary', {}).get('detection_methods', ['unknown'])
-        for typ in t:
-            anomalies_by_type[typ] = anomalies_by_type.get(typ, 0) + 1
+    for reason, count in grouped(Anomaly.reason):
+        for typ in reason.split(','):
+            if typ:
+                anomalies_by_type[typ] = anomalies_by_type.get(typ, 0) + count
     # Anomalies by severity
-    anomalies_by_severity = {}
-    for a in anomalies:
-        sev = a.get('highest_severity') or a.get('severity') or 'unknown'
-        anomalies_by_severity[sev] = anomalies_by_severity.get(sev, 0) + 1
+    anomalies_by_severity = dict(grouped(Anomaly.severity))
     # Top source IPs
-    ip_counts = {}
-    for a in anomalies:
-        ip = a.get('src_ip', 'unknown')
-        ip_counts[ip] = ip_counts.get(ip, 0) + 1
-    top_source_ips = sorted([
-        {'ip': ip, 'count': count} for ip, count in ip_counts.items() if ip != 'unknown'
-    ], key=lambda x: x['count'], reverse=True)[:5]
+    top_source_ips = top(Anomaly.src_ip, 'ip')
     # Top domains
-    domain_counts = {}
-    for a in anomalies:
-        domain = a.get('domain', 'unknown')
-        domain_counts[domain] = domain_counts.get(domain, 0) + 1
-    top_domains = sorted([
-        {'domain': d, 'count': c} for d, c in domain_counts.items() if d != 'unknown'
-    ], key=lambda x: x['count'], reverse=True)[:5]
+    top_domains = top(Anomaly.domain, 'domain')
     # Anomalies over time (by date)
-    from collections import Counter
-    from datetime import datetime
-    date_counts = Counter()
-    for a in anomalies:
-        ts = a.get('timestamp')
-        if ts:
-            try:
-                date = str(ts).split(' ')[0]
-                date_counts[date] += 1
-            except:
-                continue
     anomalies_over_time = [
-        {'date': date, 'count': count} for date, count in sorted(date_counts.items())
+        {'date': str(date), 'count': count}
+        for date, count in sorted(grouped(db.func.date(Anomaly.timestamp)), key=lambda x: str(x[0]))
+        if date is not None
     ]
     # Recent anomalies (last 10)
-    recent_anomalies = []
-    for a in sorted(anomalies, key=lambda x: x.get('timestamp', ''), reverse=True)[:10]:
-        # Get explanation from security anomalies if available
-        explanation = a.get('explanation', '')
-        if not explanation and a.get('security_anomalies'):
-            # Get explanation from the first security anomaly
-            security_anomaly = a['security_anomalies'][0]
-            explanation = security_anomaly.get('explanation', '')
-        
-        # Fallback to ML reasoning if no security explanation
-        if not explanation:
-            ml_reasons = a.get('reasoning', {}).get('isolation_forest', {}).get('reasons', [])
-            if ml_reasons:
-                explanation = ml_reasons[0]
-            else:
-                explanation = "No explanation available"
-        
-        recent_anomalies.append({
-            'timestamp': a.get('timestamp'),
-            'type': ','.join(a.get('anomaly_summary', {}).get('detection_methods', [])),
-            'severity': a.get('highest_severity') or a.get('severity'),
-            'src_ip': a.get('src_ip'),
-            'domain': a.get('domain'),
-            'explanation': explanation,
-            'threat_category': a.get('threat_category', 'Other'),
-        })
+    recent_anomalies = [
+        summarize(a) for a in scoped.order_by(Anomaly.timestamp.desc(), Anomaly.id).limit(10)
+    ]
+    # Anomalies listed on the dashboard, narrowed by the same filters as /result
+    anomalies = [summarize(a) for a in filter_anomalies(scoped, request.args).order_by(Anomaly.id)]
     # Timeline data with bytes sent for all log entries
+    flagged = {
+        a.logentry_id: a for a in scoped.with_entities(
+            Anomaly.logentry_id, Anomaly.type, Anomaly.iso_forest, Anomaly.lof, Anomaly.category)
+    }
+    # Entries stream through once, feeding both the timeline and the action counts; only the
+    # typed columns the charts need are fetched and domains come from the interned table
+    entries = db.session.execute(
+        file_entries(select(
+            LogEntry.id, LogEntry.timestamp, LogEntry.bytes_sent, LogEntry.src_ip, LogEntry.status_code,
+            LogEntry.action, LogEntry.occurrences,
+            db.func.coalesce(Domain.name, LogEntry.parsed_data['domain'].as_string()).label('domain')
+        ).outerjoin(Domain, LogEntry.domain_id == Domain.id), file_id, period).execution_options(yield_per=STREAM_BATCH)
+    )
     timeline_data = []
+    blocked_vs_allowed = {'Blocked': 0, 'Allowed': 0, 'Other': 0}
     for entry in entries:
-        entry_data = entry.parsed_data or {}
-        timestamp = entry_data.get('timestamp', '')
-        try:
-            bytes_str = entry_data.get('bytes', '0 0')
-            bytes_sent, _ = map(int, bytes_str.split())
-            # Find anomaly for this entry (if any)
-            anomaly = next((a for a in anomalies if a.get('id') == entry.id), None)
-            anomaly_type = None
-            threat_category = None
-            if anomaly:
-                # Use the main_type logic from run_analysis
-                if anomaly.get('security_anomalies') and len(anomaly['security_anomalies']) > 0:
-                    anomaly_type = anomaly['security_anomalies'][0]['type']
-                    threat_category = anomaly.get('threat_category', 'Unusual Pattern')
-                elif anomaly.get('iso_forest') and anomaly.get('lof'):
-                    anomaly_type = 'ml'
-                    threat_category = anomaly.get('threat_category', 'Unusual Pattern')
-                elif anomaly.get('iso_forest'):
-                    anomaly_type = 'isolation_forest'
-                    threat_category = anomaly.get('threat_category', 'Unusual Pattern')
-                elif anomaly.get('lof'):
-                    anomaly_type = 'lof'
-                    threat_category = anomaly.get('threat_category', 'Unusual Pattern')
-                else:
-                    anomaly_type = 'other'
-                    threat_category = anomaly.get('threat_category', 'Unusual Pattern')
-            timeline_data.append({
-                'id': entry.id,  # Add unique ID for mapping
-                'timestamp': timestamp,
-                'bytes_sent': bytes_sent,
-                'src_ip': entry_data.get('src_ip', ''),
-                'domain': entry_data.get('domain', ''),
-                'status_code': entry_data.get('status_code', ''),
-                'is_anomaly': anomaly is not None,
-                'anomaly_type': anomaly_type,
-                'threat_category': threat_category
-            })
-        except:
-            timeline_data.append({
-                'id': entry.id,  # Add unique ID for mapping
-                'timestamp': timestamp,
-                'bytes_sent': 0,
-                'src_ip': entry_data.get('src_ip', ''),
-                'domain': entry_data.get('domain', ''),
-                'status_code': entry_data.get('status_code', ''),
-                'is_anomaly': any(a.get('id') == entry.id for a in anomalies),
-                'anomaly_type': None,
-                'threat_category': None
-            })
+        # Blocked vs. Allowed Actions (all log entries)
+        blocked_vs_allowed[entry.action or 'Other'] += entry.occurrences or 1
+        anomaly = flagged.get(entry.id)
+        timeline_data.append({
+            'id': entry.id,  # Add unique ID for mapping
+            'timestamp': entry.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            'bytes_sent': entry.bytes_sent or 0,
+            'src_ip': entry.src_ip or '',
+            'domain': entry.domain or '',
+            'status_code': str(entry.status_code) if entry.status_code is not None else '',
+            'occurrences': entry.occurrences or 1,
+            'is_anomaly': anomaly is not None,
+            'anomaly_type': timeline_type(anomaly) if anomaly else None,
+            'threat_category': anomaly.category if anomaly else None
+        })
+    for rollup in rollups:
+        timeline_data.append({
+            'id': f"rollup-{rollup['id']}",
+            'timestamp': rollup['hour'].strftime('%Y-%m-%d %H:%M:%S'),
+            'bytes_sent': rollup['bytes_sent'] or 0,
+            'src_ip': rollup['src_ip'] or '',
+            'domain': rollup['domain'] or '',
+            'status_code': str(rollup['status_code']) if rollup['status_code'] is not None else '',
+            'occurrences': rollup['count'],
+            'is_anomaly': False,
+            'anomaly_type': None,
+            'threat_category': None,
+            'rollup': True
+        })
     # Sort timeline data by timestamp
     timeline_data.sort(key=lambda x: x['timestamp'])
-    # Blocked vs. Allowed Actions (all log entries)
-    blocked_vs_allowed = {'Blocked': 0, 'Allowed': 0, 'Other': 0}
-    for entry in entries:
-        action = (entry.parsed_data or {}).get('action', '').capitalize()
-        if action == 'Blocked':
-            blocked_vs_allowed['Blocked'] += 1
-        elif action == 'Allowed':
-            blocked_vs_allowed['Allowed'] += 1
-        else:
-            blocked_vs_allowed['Other'] += 1
+    for rollup in rollups:
+        blocked_vs_allowed[rollup['action'] or 'Other'] += rollup['count']
 
     # Top Methods Used in Anomalies
     top_methods_in_anomalies = {}
-    for a in anomalies:
-        method = (a.get('method') or '').upper()
+    for method, count in grouped(Anomaly.method):
         if method:
-            top_methods_in_anomalies[method] = top_methods_in_anomalies.get(method, 0) + 1
+            top_methods_in_anomalies[method.upper()] = top_methods_in_anomalies.get(method.upper(), 0) + count
 
     # Top Status Codes in Anomalies
-    top_status_codes_in_anomalies = {}
-    for a in anomalies:
-        status = str(a.get('status_code', ''))
-        if status:
-            top_status_codes_in_anomalies[status] = top_status_codes_in_anomalies.get(status, 0) + 1
+    top_status_codes_in_anomalies = {
+        str(status): count for status, count in grouped(Anomaly.status_code) if status is not None
+    }
 
     # summary_report may be a string (old) or dict (new)
     summary_report = data.get('summary_report', 'No summary report available')
@@ -818,7 +814,7 @@ def dashboard_metrics(file_id):
         'blocked_vs_allowed': blocked_vs_allowed,
         'top_methods_in_anomalies': top_methods_in_anomalies,
         'top_status_codes_in_anomalies': top_status_codes_in_anomalies,
-        'anomalies': anomalies,  # <-- Add this line
+        'anomalies': anomalies,
         'summary_report': summary_report
     }
     return jsonify(dashboard_data)
@@ -1,11 +1,28 @@
 from flask import Blueprint, request, jsonify, current_app
 import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from sqlalchemy import delete, or_, select
+from werkzeug.utils import secure_filename
 from extensions import db
-from models import LogFile, LogEntry
-from datetime import datetime
+from models import LogFile, LogEntry, UploadSession
+from services.ingest import ingest_file, ingest_byte_range
+from services.parsers import PARSERS
+from services.compression import detect_compression, sniff_file, is_supported
+from services.rawlines import read_raw_line
+from services.dimensions import load_values_by_id, hydrate
+from services.queries import entries_by_id, entries_by_time
+from services.dedup import save_stream, hash_file, find_duplicate, duplicate_summary
+from services.sqlite import current_writer, run_write
+from services.search import MIN_QUERY_LENGTH, delete_file_search_rows, delete_search_rows, file_id_range, search_entries
 
 upload_bp = Blueprint('upload', __name__)
 
+MAX_PREVIEW_LIMIT = 500
+# Stored uploads are read-only once written; entries address them by byte offset
+STORED_FILE_MODE = 0o444
+
 @upload_bp.route('', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -13,50 +30,358 @@ def upload_file():
     file = request.files['file']
     if file.filename == '':
         return jsonify({'msg': 'No selected file'}), 400
+    log_format = request.form.get('format', 'auto')
+    if log_format != 'auto' and log_format not in PARSERS:
+        return jsonify({'msg': f'Unsupported log format: {log_format}'}), 400
+    collapse_seconds = request.form.get('collapse_seconds', current_app.config['INGEST_COLLAPSE_SECONDS'], type=int)
+    if collapse_seconds < 0:
+        return jsonify({'msg': 'collapse_seconds must be a non-negative integer'}), 400
     # Save file
     upload_folder = current_app.config['UPLOAD_FOLDER']
     os.makedirs(upload_folder, exist_ok=True)
-    filepath = os.path.join(upload_folder, file.filename)
-    file.save(filepath)
+    # Unique name so entry offsets never point into a file that was later overwritten
+    filepath = os.path.join(upload_folder, f"{uuid.uuid4().hex}_{secure_filename(file.filename)}")
+    digest = save_stream(file.stream, filepath)
+    # Re-uploads of an already ingested file with the same options reuse its entries and analysis
+    duplicate = find_duplicate(digest, log_format, collapse_seconds)
+    if duplicate:
+        os.remove(filepath)
+        return jsonify(dict(duplicate_summary(duplicate), filename=file.filename))
+    os.chmod(filepath, STORED_FILE_MODE)
+    # Compressed uploads are stored as-is and decompressed while parsing
+    compression = sniff_file(filepath)
+    if not is_supported(compression):
+        os.remove(filepath)
+        return jsonify({'msg': f'Unsupported compression: {compression}'}), 400
     # Create LogFile record (assume user_id=1 for now)
-    logfile = LogFile(filename=file.filename, user_id=1)
+    logfile = LogFile(filename=file.filename, user_id=1, stored_path=filepath, ingest_format=log_format,
+                      collapse_seconds=collapse_seconds)
     db.session.add(logfile)
     db.session.commit()
-    # Parse file and store entries
-    parsed_entries = []
-    with open(filepath, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(' ', 9)
-            if len(parts) < 10:
-                continue
-            entry_data = {
-                'timestamp': parts[0] + ' ' + parts[1],
-                'src_ip': parts[2],
-                'dest_ip': parts[3],
-                'domain': parts[4],
-                'action': parts[5],
-                'method': parts[6],
-                'status_code': parts[7],
-                'user_agent': parts[8],
-                'bytes': parts[9],
-            }
-            # Store in DB
-            log_entry = LogEntry(
-                logfile_id=logfile.id,
-                timestamp=datetime.strptime(entry_data['timestamp'], '%Y-%m-%d %H:%M:%S'),
-                raw_line=line,
-                parsed_data=entry_data
-            )
-            db.session.add(log_entry)
-            parsed_entries.append(entry_data)
+    # Parse file and bulk-insert entries in fixed-size batches; through the SQLite writer each batch commits on its own
+    try:
+        stats = ingest_file(filepath, logfile.id, batch_size=current_app.config['INGEST_BATCH_SIZE'],
+                            log_format=log_format, workers=current_app.config['INGEST_WORKERS'],
+                            chunk_bytes=current_app.config['INGEST_CHUNK_BYTES'], collapse_seconds=collapse_seconds,
+                            sqlite_writer=current_writer())
+    except Exception:
+        discard_failed_upload(logfile.id, filepath)
+        raise
+    # Only set once the entries are in, so a failed ingest is never reused
+    logfile.content_digest = digest
     db.session.commit()
+    current_app.logger.info('Ingested %d lines from %s in %ss (%s lines/s)', stats['num_logs'], file.filename,
+                            stats['elapsed_seconds'], stats['lines_per_second'])
     return jsonify({
         'msg': 'File uploaded, parsed, and stored',
         'filename': file.filename,
         'logfile_id': logfile.id,
-        'num_logs': len(parsed_entries),
-        'logs': parsed_entries,
+        'num_logs': stats['num_logs'],
+        'parse_errors': stats['parse_errors'],
+        'collapsed': stats['collapsed'],
+        'log_format': stats['log_format'],
+        'compression': compression,
+        'lines_per_second': stats['lines_per_second'],
+        'duplicate': False,
+        'analysis_id': None,
+    })
+
+def discard_failed_upload(logfile_id, filepath):
+    """Delete the entries, index rows, LogFile and stored copy of an upload whose ingest failed.
+
+    Batches already committed would otherwise stay behind under a file with no
+    digest, which neither analysis nor duplicate detection ever looks at again.
+    """
+    def job(session):
+        delete_file_search_rows(session, [logfile_id])
+        session.execute(delete(LogEntry).where(LogEntry.logfile_id == logfile_id))
+        session.execute(delete(LogFile).where(LogFile.id == logfile_id))
+    db.session.rollback()
+    run_write(job)
+    os.remove(filepath)
+
+def page_limit(default):
+    """The ?limit= page size, clamped to 1..MAX_PREVIEW_LIMIT"""
+    return max(1, min(request.args.get('limit', default, type=int), MAX_PREVIEW_LIMIT))
+
+def chunked_status(session):
+    return {
+        'upload_id': session.id,
+        'logfile_id': session.logfile_id,
+        'offset': session.received_bytes,
+        'num_logs': session.num_logs,
+        'parse_errors': session.parse_errors,
+        'log_format': session.log_format,
+        'compression': session.compression,
+        'completed': session.completed,
+    }
+
+def ingest_pending(session, final=False):
+    """Parse the bytes received since the last complete line and fold the counts into the session.
+
+    Compressed uploads cannot be split at line boundaries, so they are parsed
+    in one streaming pass when the upload is finalized. Through the SQLite writer
+    batches commit before the session's progress does; if the ingest fails, the
+    entries past parsed_bytes are deleted so the retried chunk is not ingested twice.
+    """
+    batch_size = current_app.config['INGEST_BATCH_SIZE']
+    log_format = session.log_format or 'auto'
+    if session.compression and not final:
+        return
+    writer = current_writer()
+    if writer is not None:
+        # The writer commits on its own connection; the request session must not hold the write lock
+        db.session.commit()
+    logfile_id, parsed_bytes = session.logfile_id, session.parsed_bytes
+    try:
+        if session.compression:
+            stats = ingest_file(session.filepath, logfile_id, batch_size=batch_size, log_format=log_format,
+                                collapse_seconds=session.collapse_seconds, sqlite_writer=writer)
+            parsed_to = session.received_bytes
+        else:
+            stats, parsed_to = ingest_byte_range(
+                session.filepath, logfile_id, parsed_bytes, session.received_bytes, final=final,
+                batch_size=batch_size, log_format=log_format, collapse_seconds=session.collapse_seconds,
+                sqlite_writer=writer
+            )
+    except Exception:
+        if writer is not None:
+            discard_unparsed_entries(logfile_id, parsed_bytes)
+        raise
+    session.log_format = stats['log_format']
+    session.parsed_bytes = parsed_to
+    session.num_logs += stats['num_logs']
+    session.parse_errors += stats['parse_errors']
+
+def discard_unparsed_entries(logfile_id, parsed_bytes):
+    """Delete the entries and index rows a failed chunk ingest committed past parsed_bytes"""
+    def job(session):
+        # Compressed uploads keep raw lines without offsets and are only parsed at finalize
+        unparsed = (LogEntry.logfile_id == logfile_id,
+                    or_(LogEntry.line_offset.is_(None), LogEntry.line_offset >= parsed_bytes))
+        delete_search_rows(session, select(LogEntry.id).where(*unparsed))
+        session.execute(delete(LogEntry).where(*unparsed))
+    db.session.rollback()
+    run_write(job)
+
+def discard_duplicate_upload(session, duplicate):
+    """Point a finished chunked upload at the file it duplicates and drop its own rows.
+
+    Chunks are parsed as they arrive, so the content is only known to be a
+    duplicate at finalize; the entries already written are deleted.
+    """
+    own_id = session.logfile_id
+    session.logfile_id = duplicate.id
+    db.session.flush()
+    delete_file_search_rows(db.session, [own_id])
+    LogEntry.query.filter_by(logfile_id=own_id).delete(synchronize_session=False)
+    LogFile.query.filter_by(id=own_id).delete(synchronize_session=False)
+
+@upload_bp.route('/chunked', methods=['POST'])
+def init_chunked_upload():
+    """Start a resumable upload; chunks are then PUT in order at the returned offset"""
+    data = request.get_json() or {}
+    filename = data.get('filename')
+    if not filename:
+        return jsonify({'msg': 'filename is required'}), 400
+    log_format = data.get('format', 'auto')
+    if log_format != 'auto' and log_format not in PARSERS:
+        return jsonify({'msg': f'Unsupported log format: {log_format}'}), 400
+    collapse_seconds = data.get('collapse_seconds', current_app.config['INGEST_COLLAPSE_SECONDS'])
+    if not isinstance(collapse_seconds, int) or collapse_seconds < 0:
+        return jsonify({'msg': 'collapse_seconds must be a non-negative integer'}), 400
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    filepath = os.path.join(upload_folder, f"{upload_id}_{secure_filename(filename)}")
+    open(filepath, 'wb').close()
+    logfile = LogFile(filename=filename, user_id=1, stored_path=filepath, ingest_format=log_format,
+                      collapse_seconds=collapse_seconds)
+    db.session.add(logfile)
+    db.session.flush()
+    session = UploadSession(id=upload_id, logfile_id=logfile.id, filepath=filepath,
+                            log_format=None if log_format == 'auto' else log_format, collapse_seconds=collapse_seconds,
+                            received_bytes=0, parsed_bytes=0, num_logs=0, parse_errors=0, completed=False)
+    db.session.add(session)
+    db.session.commit()
+    return jsonify(dict(chunked_status(session), chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'])), 201
+
+@upload_bp.route('/chunked/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    """Report the last acknowledged offset so an interrupted upload can resume"""
+    session = db.session.get(UploadSession, upload_id)
+    if not session:
+        return jsonify({'msg': 'Upload not found'}), 404
+    return jsonify(chunked_status(session))
+
+@upload_bp.route('/chunked/<upload_id>', methods=['PUT'])
+def append_chunk(upload_id):
+    """Append a chunk at ?offset=N, then ingest every line it completes"""
+    session = db.session.get(UploadSession, upload_id, with_for_update=True)
+    if not session:
+        return jsonify({'msg': 'Upload not found'}), 404
+    if session.completed:
+        return jsonify(dict(chunked_status(session), msg='Upload already finalized')), 409
+    offset = request.args.get('offset', type=int)
+    if offset != session.received_bytes:
+        return jsonify(dict(chunked_status(session), msg='Offset mismatch')), 409
+    chunk = request.get_data()
+    if session.received_bytes == 0:
+        session.compression = detect_compression(chunk[:4])
+        if not is_supported(session.compression):
+            return jsonify(dict(chunked_status(session), msg=f'Unsupported compression: {session.compression}')), 400
+    with open(session.filepath, 'r+b') as f:
+        # Drop any bytes written by an attempt whose acknowledgement never committed
+        f.seek(session.received_bytes)
+        f.truncate()
+        f.write(chunk)
+    session.received_bytes += len(chunk)
+    ingest_pending(session)
+    db.session.commit()
+    return jsonify(chunked_status(session))
+
+@upload_bp.route('/chunked/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    """Ingest the trailing partial line and close the upload"""
+    session = db.session.get(UploadSession, upload_id, with_for_update=True)
+    if not session:
+        return jsonify({'msg': 'Upload not found'}), 404
+    if not session.completed:
+        ingest_pending(session, final=True)
+        session.completed = True
+        digest = hash_file(session.filepath)
+        own = db.session.get(LogFile, session.logfile_id)
+        duplicate = find_duplicate(digest, own.ingest_format, own.collapse_seconds, exclude_id=own.id)
+        if duplicate:
+            discard_duplicate_upload(session, duplicate)
+        else:
+            own.content_digest = digest
+        db.session.commit()
+        if duplicate:
+            os.remove(session.filepath)
+        else:
+            os.chmod(session.filepath, STORED_FILE_MODE)
+    logfile = db.session.get(LogFile, session.logfile_id)
+    if logfile.stored_path != session.filepath:
+        return jsonify(dict(duplicate_summary(logfile), filename=logfile.filename))
+    return jsonify({
+        'msg': 'File uploaded, parsed, and stored',
+        'filename': logfile.filename,
+        'logfile_id': session.logfile_id,
+        'num_logs': session.num_logs,
+        'parse_errors': session.parse_errors,
+        'log_format': session.log_format,
+        'compression': session.compression,
+        'duplicate': False,
+        'analysis_id': None,
+    })
+
+def serialize_entries(logfile, rows):
+    """Hydrated entry dicts, with raw_line, for rows selected with ENTRY_PAGE_COLUMNS"""
+    values = load_values_by_id(db.session, [row[6:] for row in rows])
+    return [
+        dict(hydrate(parsed_data, ids, values), id=entry_id,
+             raw_line=read_raw_line(logfile.stored_path, raw_line, line_offset, line_length))
+        for entry_id, _, parsed_data, raw_line, line_offset, line_length, *ids in rows
+    ]
+
+def parse_time_arg(name):
+    """Read an ISO 8601 timestamp query argument as naive UTC; raises ValueError when malformed"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@upload_bp.route('/<int:file_id>/preview', methods=['GET'])
+def preview_file(file_id):
+    """Return a page of parsed entries for a file, keyset-paged on entry id"""
+    logfile = LogFile.query.get(file_id)
+    if not logfile:
+        return jsonify({'msg': 'LogFile not found'}), 404
+    limit = page_limit(20)
+    after_id = request.args.get('after_id', 0, type=int)
+    rows = db.session.execute(entries_by_id(file_id, limit, after_id, logfile.period)).all()
+    entries = serialize_entries(logfile, rows)
+    return jsonify({
+        'logfile_id': file_id,
+        'filename': logfile.filename,
+        'entries': entries,
+        # Pass back as after_id to fetch the following page; None on the last page
+        'next_after_id': entries[-1]['id'] if entries and len(entries) == limit else None,
+    })
+
+@upload_bp.route('/<int:file_id>/entries', methods=['GET'])
+def list_entries(file_id):
+    """Page through a file's entries in time order, optionally within [start, end)"""
+    logfile = db.session.get(LogFile, file_id)
+    if not logfile:
+        return jsonify({'msg': 'LogFile not found'}), 404
+    limit = page_limit(100)
+    try:
+        start = parse_time_arg('start')
+        end = parse_time_arg('end')
+        after_timestamp = parse_time_arg('after_timestamp')
+    except ValueError as e:
+        return jsonify({'msg': f'Invalid timestamp: {e}'}), 400
+    after_id = request.args.get('after_id', type=int)
+    after = None
+    if after_timestamp is not None:
+        if after_id is None:
+            return jsonify({'msg': 'after_timestamp requires after_id'}), 400
+        after = (after_timestamp, after_id)
+    rows = db.session.execute(entries_by_time(file_id, limit, start, end, after, logfile.period)).all()
+    entries = serialize_entries(logfile, rows)
+    next_page = None
+    if rows and len(rows) == limit:
+        # Keyset cursor: pass both back to continue after the last entry
+        next_page = {'after_timestamp': rows[-1].timestamp.isoformat(' '), 'after_id': rows[-1].id}
+    return jsonify({
+        'logfile_id': file_id,
+        'entries': entries,
+        'next': next_page,
+    })
+
+@upload_bp.route('/search', methods=['GET'])
+def search_log_entries():
+    """Find entries containing ?q= in any parsed field, optionally in one file and within [start, end).
+
+    Matching is a case-insensitive substring search through the full-text index, paged on entry id.
+    """
+    query = request.args.get('q', '').strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return jsonify({'msg': f'q must be at least {MIN_QUERY_LENGTH} characters'}), 400
+    limit = page_limit(50)
+    after_id = request.args.get('after_id', 0, type=int)
+    try:
+        start = parse_time_arg('start')
+        end = parse_time_arg('end')
+    except ValueError as e:
+        return jsonify({'msg': f'Invalid timestamp: {e}'}), 400
+    file_id = request.args.get('file_id', type=int)
+    period = id_range = None
+    if file_id is not None:
+        logfile = db.session.get(LogFile, file_id)
+        if not logfile:
+            return jsonify({'msg': 'LogFile not found'}), 404
+        period = logfile.period
+        id_range = file_id_range(db.session, file_id, start, end)
+    rows = []
+    if id_range is None or id_range[0] is not None:
+        rows = db.session.execute(search_entries(db.engine.dialect.name, query, limit, after_id, file_id, id_range,
+                                                 start, end, period)).all()
+    by_file = defaultdict(list)
+    for row in rows:
+        by_file[row.logfile_id].append(row[:-1])
+    entries = []
+    for logfile in LogFile.query.filter(LogFile.id.in_(by_file)):
+        entries += [dict(entry, logfile_id=logfile.id) for entry in serialize_entries(logfile, by_file[logfile.id])]
+    entries.sort(key=lambda entry: entry['id'])
+    return jsonify({
+        'q': query,
+        'entries': entries,
+        # Pass back as after_id to fetch the following page; None on the last page
+        'next_after_id': rows[-1].id if rows and len(rows) == limit else None,
     })
@@ -0,0 +1,97 @@
+from sqlalchemy import insert
+from models import Anomaly
+
+# Query parameter -> Anomaly column that /result and /dashboard filter on
+ANOMALY_FILTERS = {
+    'severity': Anomaly.severity,
+    'category': Anomaly.category,
+    'type': Anomaly.type,
+    'src_ip': Anomaly.src_ip,
+}
+
+def anomaly_explanation(anomaly):
+    """Extract explanation from anomaly object using fallback logic"""
+    # First, try to get explanation from top level
+    explanation = anomaly.get('explanation', '')
+
+    # If not found, try to get from security anomalies
+    if not explanation and anomaly.get('security_anomalies'):
+        security_anomaly = anomaly['security_anomalies'][0]
+        explanation = security_anomaly.get('explanation', '')
+
+    # If still not found, try to get from ML reasoning
+    if not explanation and anomaly.get('reasoning'):
+        iso_reasons = anomaly.get('reasoning', {}).get('isolation_forest', {}).get('reasons', [])
+        lof_reasons = anomaly.get('reasoning', {}).get('lof', {}).get('reasons', [])
+        if iso_reasons:
+            explanation = iso_reasons[0]
+        elif lof_reasons:
+            explanation = lof_reasons[0]
+
+    # Final fallback
+    return explanation or "No explanation available"
+
+def main_type(anomaly):
+    if anomaly.get('security_anomalies'):
+        return anomaly['security_anomalies'][0]['type']
+    if anomaly.get('iso_forest') or anomaly.get('lof'):
+        return 'ml'
+    return 'other'
+
+def clip(value, length):
+    return str(value)[:length] if value is not None else None
+
+def anomaly_row(analysis_id, anomaly, entry):
+    """Anomaly table row for one anomaly document of run_analysis and the LogEntry it flags"""
+    methods = anomaly.get('anomaly_summary', {}).get('detection_methods', [])
+    return {
+        'analysis_id': analysis_id,
+        'logentry_id': entry.id,
+        'period': entry.period,
+        'timestamp': entry.timestamp,
+        'type': main_type(anomaly)[:32],
+        'reason': ','.join(methods)[:256],
+        'severity': anomaly.get('severity') or 'unknown',
+        'category': anomaly.get('threat_category') or 'Other',
+        'confidence': anomaly.get('confidence_score', 0.0),
+        'iso_forest': bool(anomaly.get('iso_forest')),
+        'lof': bool(anomaly.get('lof')),
+        'src_ip': clip(anomaly.get('src_ip'), 64),
+        'domain': clip(anomaly.get('domain'), 255),
+        'method': entry.method,
+        'status_code': entry.status_code,
+        'explanation': anomaly_explanation(anomaly),
+        'details': anomaly,
+    }
+
+def anomaly_rows(anomalies, entries):
+    """Anomaly rows, analysis_id still unset, for anomaly documents and the flagged LogEntry rows in the same order"""
+    return [anomaly_row(None, anomaly, entry) for anomaly, entry in zip(anomalies, entries)]
+
+def save_anomalies(session, analysis_id, rows):
+    """Insert rows from anomaly_rows as the anomalies of an analysis"""
+    if rows:
+        session.execute(insert(Anomaly), [dict(row, analysis_id=analysis_id) for row in rows])
+
+def filter_anomalies(query, args):
+    """Narrow an Anomaly query by the severity/category/type/src_ip/min_confidence request args"""
+    for name, column in ANOMALY_FILTERS.items():
+        value = args.get(name)
+        if value:
+            query = query.filter(column == value)
+    min_confidence = args.get('min_confidence', type=float)
+    if min_confidence is not None:
+        query = query.filter(Anomaly.confidence >= min_confidence)
+    return query
+
+def timeline_type(anomaly):
+    """Anomaly type shown on the dashboard timeline: the rule that fired, else which models flagged it"""
+    if anomaly.type not in ('ml', 'other'):
+        return anomaly.type
+    if anomaly.iso_forest and anomaly.lof:
+        return 'ml'
+    if anomaly.iso_forest:
+        return 'isolation_forest'
+    if anomaly.lof:
+        return 'lof'
+    return 'other'
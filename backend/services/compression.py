@@ -0,0 +1,83 @@
+import bz2
+import gzip
+import io
+import json
+import threading
+
+try:
+    import zstandard
+except ImportError:  # zstd uploads are rejected when the package is not installed
+    zstandard = None
+
+# Leading bytes of each supported container
+MAGIC_NUMBERS = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+
+# Stored JSON documents are small, so higher levels cost write time without shrinking them much further
+DOCUMENT_LEVEL = 3
+
+# zstd contexts are not thread-safe; each thread keeps its own
+_codecs = threading.local()
+
+def detect_compression(head):
+    """Return 'gzip', 'bz2' or 'zstd' from the first bytes of a file, or None for plain text"""
+    for magic, name in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return name
+    return None
+
+def sniff_file(filepath):
+    with open(filepath, 'rb') as f:
+        return detect_compression(f.read(4))
+
+def is_supported(compression):
+    return compression != 'zstd' or zstandard is not None
+
+def open_decompressed(raw, compression):
+    """Wrap a binary file object so reads return decompressed bytes"""
+    if compression is None:
+        return raw
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(raw, mode='rb')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('zstd uploads require the zstandard package')
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+    raise ValueError(f"Unknown compression: {compression}")
+
+def open_text(raw):
+    """Wrap a buffered binary upload as a text stream, decompressing it on the fly.
+
+    The plaintext is never written to disk. Returns (stream, compression); the
+    caller keeps ownership of raw and closes it.
+    """
+    compression = detect_compression(raw.peek(4)[:4])
+    stream = open_decompressed(raw, compression)
+    return io.TextIOWrapper(stream, encoding='utf-8', errors='replace'), compression
+
+def encode_document(value):
+    """A JSON value as zstd-compressed bytes, or as plain UTF-8 JSON when zstandard is not installed"""
+    data = json.dumps(value, separators=(',', ':')).encode()
+    if zstandard is None:
+        return data
+    if not hasattr(_codecs, 'compressor'):
+        _codecs.compressor = zstandard.ZstdCompressor(level=DOCUMENT_LEVEL)
+    return _codecs.compressor.compress(data)
+
+def decode_document(data):
+    """Read a value written by encode_document; plain JSON text or bytes is read as is"""
+    if isinstance(data, str):
+        return json.loads(data)
+    data = bytes(data)
+    if detect_compression(data[:4]) == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Compressed documents require the zstandard package')
+        if not hasattr(_codecs, 'decompressor'):
+            _codecs.decompressor = zstandard.ZstdDecompressor()
+        data = _codecs.decompressor.decompress(data)
+    return json.loads(data)
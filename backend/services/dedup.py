@@ -0,0 +1,49 @@
+import hashlib
+from models import LogFile, LogEntry, AnalysisResult
+
+DIGEST_SIZE = 32
+READ_SIZE = 1024 * 1024
+
+def new_hasher():
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+def save_stream(stream, filepath, read_size=READ_SIZE):
+    """Copy an upload stream to filepath, hashing the bytes on the way through; returns the hex digest"""
+    hasher = new_hasher()
+    with open(filepath, 'wb') as out:
+        while True:
+            block = stream.read(read_size)
+            if not block:
+                break
+            hasher.update(block)
+            out.write(block)
+    return hasher.hexdigest()
+
+def hash_file(filepath, read_size=READ_SIZE):
+    hasher = new_hasher()
+    with open(filepath, 'rb') as f:
+        while True:
+            block = f.read(read_size)
+            if not block:
+                break
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def find_duplicate(digest, log_format, collapse_seconds, exclude_id=None):
+    """Return the earliest fully ingested LogFile with the same content and ingest options, or None"""
+    query = LogFile.query.filter_by(content_digest=digest, ingest_format=log_format, collapse_seconds=collapse_seconds)
+    if exclude_id is not None:
+        query = query.filter(LogFile.id != exclude_id)
+    return query.order_by(LogFile.id).first()
+
+def duplicate_summary(logfile):
+    """Upload response fields for a file whose content was already ingested as logfile"""
+    result = AnalysisResult.query.filter_by(file_id=logfile.id).order_by(AnalysisResult.created_at.desc()).first()
+    return {
+        'msg': 'File already uploaded; reusing stored entries',
+        'logfile_id': logfile.id,
+        'num_logs': LogEntry.query.filter_by(logfile_id=logfile.id).count(),
+        'duplicate': True,
+        # Latest analysis of the original upload, so clients can skip a re-run
+        'analysis_id': result.id if result else None,
+    }
@@ -0,0 +1,136 @@
+import weakref
+from sqlalchemy import event, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import LogEntry, Domain, UserAgent, SourceIP
+
+# parsed_data field -> (dimension model, value column, LogEntry id column, longest value stored)
+DIMENSIONS = {
+    'domain': (Domain, Domain.name, LogEntry.domain_id, 255),
+    'user_agent': (UserAgent, UserAgent.value, LogEntry.user_agent_id, 512),
+    'src_ip': (SourceIP, SourceIP.value, LogEntry.src_ip_id, 64),
+}
+DIMENSION_FIELDS = tuple(DIMENSIONS)
+DIMENSION_ID_COLUMNS = tuple(DIMENSIONS[field][2] for field in DIMENSION_FIELDS)
+
+# Keep IN lists well under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+# Committed value -> id maps for each engine, shared by every request in this process
+_committed = weakref.WeakKeyDictionary()
+
+def committed_ids(engine):
+    return _committed.setdefault(engine, {field: {} for field in DIMENSION_FIELDS})
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending_ids(session):
+    pending = session.info.pop('dimension_ids', None)
+    if pending:
+        engine, ids = pending
+        shared = committed_ids(engine)
+        for field, values in ids.items():
+            shared[field].update(values)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_ids(session):
+    # Ids created in a rolled-back transaction no longer exist
+    session.info.pop('dimension_ids', None)
+
+def dimension_value(data, field):
+    """The value to intern for field, or None when it is missing or does not fit the dimension table"""
+    value = data.get(field)
+    if type(value) is str and len(value) <= DIMENSIONS[field][3]:
+        return value
+    return None
+
+class DimensionEncoder:
+    """Replaces domain, user agent and source IP strings in entry rows with dimension ids.
+
+    Ids are looked up in a per-process cache and unknown values are inserted once per
+    batch. Ids created inside the current transaction are only shared with other
+    requests after it commits.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        engine = session.get_bind()
+        self.committed = committed_ids(engine)
+        if 'dimension_ids' not in session.info:
+            session.info['dimension_ids'] = (engine, {field: {} for field in DIMENSION_FIELDS})
+        self.pending = session.info['dimension_ids'][1]
+
+    def lookup(self, field, value):
+        return self.committed[field].get(value) or self.pending[field].get(value)
+
+    def encode(self, rows):
+        """Return rows with parsed_data stripped of interned fields and their ids appended"""
+        for field in DIMENSION_FIELDS:
+            missing = {dimension_value(row[3], field) for row in rows} - {None}
+            missing = {value for value in missing if not self.lookup(field, value)}
+            if missing:
+                self.pending[field].update(self.create(field, missing))
+        encoded = []
+        for row in rows:
+            data = row[3]
+            stripped = dict(data)
+            ids = []
+            for field in DIMENSION_FIELDS:
+                value = dimension_value(data, field)
+                if value is None:
+                    ids.append(None)
+                else:
+                    ids.append(self.lookup(field, value))
+                    del stripped[field]
+            encoded.append(row[:3] + (stripped,) + tuple(row[4:]) + tuple(ids))
+        return encoded
+
+    def create(self, field, values):
+        """Insert values into the dimension table, tolerating concurrent inserts, and return their ids"""
+        model, column, _, _ = DIMENSIONS[field]
+        dialect = self.session.get_bind().dialect.name
+        rows = [{column.key: value} for value in values]
+        if dialect == 'postgresql':
+            stmt = postgresql.insert(model.__table__).on_conflict_do_nothing(index_elements=[column.key])
+        elif dialect == 'sqlite':
+            stmt = sqlite.insert(model.__table__).on_conflict_do_nothing(index_elements=[column.key])
+        else:
+            stmt = insert(model.__table__)
+        self.session.execute(stmt, rows)
+        return fetch_ids(self.session, field, values)
+
+def fetch_ids(session, field, values):
+    model, column, _, _ = DIMENSIONS[field]
+    values = list(values)
+    ids = {}
+    for i in range(0, len(values), LOOKUP_CHUNK):
+        chunk = values[i:i + LOOKUP_CHUNK]
+        ids.update(session.execute(select(column, model.id).where(column.in_(chunk))).all())
+    return ids
+
+def load_dimension_values(session, logfile_id):
+    """{field: {id: value}} for every dimension value referenced by a file's entries"""
+    values = {}
+    for field, (model, column, id_column, _) in DIMENSIONS.items():
+        used = select(id_column).where(LogEntry.logfile_id == logfile_id, id_column.isnot(None)).distinct()
+        values[field] = dict(session.execute(select(model.id, column).where(model.id.in_(used))).all())
+    return values
+
+def load_values_by_id(session, id_rows):
+    """{field: {id: value}} for just the ids in id_rows, each a (domain, user agent, src ip) id tuple"""
+    values = {}
+    for i, field in enumerate(DIMENSION_FIELDS):
+        model, column = DIMENSIONS[field][:2]
+        wanted = list({ids[i] for ids in id_rows} - {None})
+        values[field] = {}
+        for start in range(0, len(wanted), LOOKUP_CHUNK):
+            chunk = wanted[start:start + LOOKUP_CHUNK]
+            values[field].update(session.execute(select(model.id, column).where(model.id.in_(chunk))).all())
+    return values
+
+def hydrate(parsed_data, ids, values):
+    """Rebuild the full parsed entry from stored parsed_data and its (domain, user agent, src ip) ids"""
+    data = dict(parsed_data or {})
+    for field, value_id in zip(DIMENSION_FIELDS, ids):
+        if value_id is not None:
+            data[field] = values[field][value_id]
+    return data
@@ -0,0 +1,88 @@
+import numpy as np
+from sqlalchemy import case, func
+from models import LogEntry, Domain, UserAgent
+
+# Columns of the analysis feature matrix
+FEATURE_NAMES = ('status_code', 'bytes_sent', 'bytes_received', 'domain_length', 'user_agent_length', 'blocked', 'post')
+
+def _length(value_column, field):
+    # Interned values come from the dimension table, older rows keep theirs in parsed_data
+    return func.length(func.coalesce(value_column, LogEntry.parsed_data[field].as_string(), ''))
+
+# The features computed by the database, in FEATURE_NAMES order, followed by the entry's
+# weight and whether it has a typed bytes_sent; select them first and join FEATURE_JOINS
+FEATURE_COLUMNS = (
+    func.coalesce(LogEntry.status_code, 0),
+    func.coalesce(LogEntry.bytes_sent, 0),
+    func.coalesce(LogEntry.bytes_received, 0),
+    _length(Domain.name, 'domain'),
+    _length(UserAgent.value, 'user_agent'),
+    case((LogEntry.action == 'Blocked', 1), else_=0),
+    case((LogEntry.method == 'POST', 1), else_=0),
+    func.coalesce(LogEntry.occurrences, 1),
+    case((LogEntry.bytes_sent.isnot(None), 1), else_=0),
+)
+FEATURE_JOINS = ((Domain, LogEntry.domain_id == Domain.id), (UserAgent, LogEntry.user_agent_id == UserAgent.id))
+
+def weighted_mean_std(values, weights):
+    """Mean and standard deviation of values, each counted weights[i] times"""
+    if np.all(np.asarray(weights) == 1):
+        return np.mean(values), np.std(values)
+    mean = np.average(values, weights=weights)
+    return mean, np.sqrt(np.average((np.asarray(values) - mean) ** 2, weights=weights))
+
+def with_features(stmt):
+    """Outer-join the dimension tables FEATURE_COLUMNS read lengths from"""
+    for model, on in FEATURE_JOINS:
+        stmt = stmt.outerjoin(model, on)
+    return stmt
+
+class FeatureBuilder:
+    """Fills the float32 feature matrix of an analysis in place from batches of streamed rows.
+
+    Every row starts with the FEATURE_COLUMNS values; each batch is converted to an array
+    in one call, so no per-entry Python objects are kept for the features.
+    """
+
+    def __init__(self, capacity):
+        self.X = np.zeros((capacity, len(FEATURE_NAMES)), dtype=np.float32)
+        self.weights = np.ones(capacity, dtype=np.int64)
+        self.has_bytes_sent = np.zeros(capacity, dtype=bool)
+        # Exact bytes sent and received, which float32 rounds above 16 MiB
+        self.bytes = np.zeros((capacity, 2))
+        self.size = 0
+
+    def add(self, rows):
+        """Append a batch of rows; rows beyond the capacity are ignored. Returns how many were added"""
+        rows = rows[:len(self.X) - self.size]
+        if not rows:
+            return 0
+        width = len(FEATURE_COLUMNS)
+        block = np.array([row[:width] for row in rows], dtype=np.float64)
+        end = self.size + len(rows)
+        self.X[self.size:end] = block[:, :len(FEATURE_NAMES)]
+        self.bytes[self.size:end] = block[:, 1:3]
+        self.weights[self.size:end] = block[:, -2]
+        self.has_bytes_sent[self.size:end] = block[:, -1] > 0
+        self.size = end
+        return len(rows)
+
+    def finish(self):
+        """(X, weights) of the rows added, trimmed when fewer rows came than the capacity"""
+        self.X = self.X[:self.size]
+        self.weights = self.weights[:self.size]
+        self.has_bytes_sent = self.has_bytes_sent[:self.size]
+        self.bytes = self.bytes[:self.size]
+        return self.X, self.weights
+
+    def byte_stats(self):
+        """({'bytes_sent', 'bytes_received'} means, same for standard deviations) over entries with typed bytes"""
+        weights = self.weights[self.has_bytes_sent]
+        averages, stds = {}, {}
+        for name in ('bytes_sent', 'bytes_received'):
+            if len(weights):
+                values = self.X[self.has_bytes_sent, FEATURE_NAMES.index(name)].astype(np.float64)
+                averages[name], stds[name] = weighted_mean_std(values, weights)
+            else:
+                averages[name], stds[name] = 0, 0
+        return averages, stds
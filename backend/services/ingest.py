@@ -0,0 +1,420 @@
+import csv
+import io
+import ipaddress
+import json
+import multiprocessing
+import os
+import socket
+import time
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from sqlalchemy import insert, text
+from extensions import db
+from models import LogEntry, ENTRY_ACTIONS, HTTP_METHODS
+from services.parsers import PARSERS, get_parser, detect_format
+from services.timestamps import parse_timestamp
+from services.compression import detect_compression, open_text
+from services.dimensions import DimensionEncoder
+from services.partitions import ensure_partitions, file_period
+from services.search import index_entries, search_text
+
+# Column order shared by the executemany and COPY write paths
+ENTRY_COLUMNS = ('logfile_id', 'timestamp', 'raw_line', 'parsed_data', 'line_offset', 'line_length',
+                 'occurrences', 'last_timestamp', 'status_code', 'bytes_sent', 'bytes_received',
+                 'action', 'method', 'src_ip', 'dest_ip', 'domain_id', 'user_agent_id', 'src_ip_id', 'period')
+
+EPOCH = datetime(1970, 1, 1)
+
+# Byte ranges a parallel ingest keeps submitted per worker process
+IN_FLIGHT_PER_WORKER = 2
+
+# Parse workers are forked from a clean server process, not from the request: a fork would copy
+# the SQLite writer thread's locks and open connections in whatever state they happen to be in
+POOL_CONTEXT = multiprocessing.get_context('forkserver')
+POOL_CONTEXT.set_forkserver_preload(['services.ingest'])
+
+def iter_offset_lines(f, start=0):
+    """Yield (byte offset, line bytes) for each line of a binary stream that begins at offset start"""
+    offset = start
+    for raw in f:
+        yield offset, raw
+        offset += len(raw)
+
+def iter_text_lines(f):
+    """Yield (None, line) for a text stream with no addressable stored copy"""
+    for line in f:
+        yield None, line
+
+@lru_cache(maxsize=65536)
+def normalize_ip(text):
+    """Canonical text form of an IPv4/IPv6 address, or None when text is not one"""
+    try:
+        # inet_pton only accepts canonical dotted quads, which are already normalized
+        socket.inet_pton(socket.AF_INET, text)
+        return text
+    except OSError:
+        pass
+    try:
+        return str(ipaddress.ip_address(text))
+    except ValueError:
+        return None
+
+def as_int(value):
+    return value if type(value) is int else None
+
+def as_enum(value, members):
+    if value in members:
+        return value
+    value = str(value).capitalize() if members is ENTRY_ACTIONS else str(value).upper()
+    return value if value in members else None
+
+def typed_columns(entry_data):
+    """Values for the typed LogEntry columns, in ENTRY_COLUMNS order, taken from a parsed entry"""
+    get = entry_data.get
+    status = get('status_code', '')
+    src_ip = get('src_ip', '')
+    dest_ip = get('dest_ip', '')
+    return (
+        # Four digits at most always fits a smallint
+        int(status) if type(status) is str and status.isascii() and status.isdigit() and len(status) <= 4 else None,
+        as_int(get('bytes_sent')),
+        as_int(get('bytes_received')),
+        as_enum(get('action', ''), ENTRY_ACTIONS),
+        as_enum(get('method', ''), HTTP_METHODS),
+        normalize_ip(src_ip) if type(src_ip) is str else None,
+        normalize_ip(dest_ip) if type(dest_ip) is str else None,
+    )
+
+def iter_rows(lines, logfile_id, stats, log_format='auto'):
+    """Yield entry row tuples in ENTRY_COLUMNS order, counting skipped lines in stats.
+
+    lines yields (offset, line) pairs. Byte lines with an offset are stored as
+    (line_offset, line_length) into the upload; text lines (offset None) keep raw_line.
+    With log_format 'auto' the format is detected from the first parseable line and
+    recorded in stats['log_format'].
+    """
+    parse = None if log_format == 'auto' else get_parser(log_format)
+    for offset, line in lines:
+        raw_line = length = None
+        if offset is None:
+            line = raw_line = line.strip()
+        else:
+            stripped = line.strip()
+            offset += len(line) - len(line.lstrip())
+            length = len(stripped)
+            line = stripped.decode('utf-8', errors='replace')
+        if not line:
+            continue
+        if parse is None:
+            detected = detect_format(line)
+            if detected is None:
+                stats['parse_errors'] += 1
+                continue
+            stats['log_format'] = detected
+            parse = PARSERS[detected]
+        entry_data = parse(line)
+        if entry_data is None:
+            stats['parse_errors'] += 1
+            continue
+        try:
+            timestamp = parse_timestamp(entry_data['timestamp'])
+        except (ValueError, TypeError):
+            stats['parse_errors'] += 1
+            continue
+        yield (logfile_id, timestamp, raw_line, entry_data, offset, length, 1, None) + typed_columns(entry_data)
+
+def collapse_rows(rows, bucket_seconds, stats):
+    """Merge rows whose parsed fields match apart from the timestamp within each time bucket.
+
+    A bucket is closed as soon as a row from another bucket arrives, so memory is
+    bounded by the distinct lines per bucket. The merged row keeps the earliest
+    line and its timestamp, counts the lines in occurrences and records the
+    latest timestamp in last_timestamp.
+    """
+    pending = {}
+    current_bucket = None
+    for row in rows:
+        timestamp, entry_data = row[1], row[3]
+        bucket = int((timestamp - EPOCH).total_seconds()) // bucket_seconds
+        if bucket != current_bucket:
+            yield from map(tuple, pending.values())
+            pending = {}
+            current_bucket = bucket
+        key = tuple(value for name, value in entry_data.items() if name != 'timestamp')
+        try:
+            merged = pending.get(key)
+        except TypeError:
+            # Nested JSON values are not hashable; keep such lines as they are
+            yield row
+            continue
+        if merged is None:
+            pending[key] = list(row)
+            continue
+        stats['collapsed'] += 1
+        last = max(merged[7] or merged[1], timestamp)
+        if timestamp < merged[1]:
+            merged[1:6] = row[1:6]
+        merged[6] += 1
+        merged[7] = last
+    yield from map(tuple, pending.values())
+
+class BatchWriter:
+    """Buffers parsed rows and writes them to log_entry in fixed-size batches.
+
+    With a SQLiteWriter each batch is handed to it and committed in its own transaction;
+    one batch stays in flight while the next is parsed.
+    """
+
+    def __init__(self, session, batch_size=5000, sqlite_writer=None):
+        self.session = session
+        self.batch_size = batch_size
+        self.sqlite_writer = sqlite_writer
+        self.in_flight = None
+        self.buffer = []
+        self.rows_written = 0
+        self.encoder = DimensionEncoder(session)
+        self.periods = {}
+        dialect = session.get_bind().dialect
+        # COPY FROM STDIN is only available through psycopg2
+        self.use_copy = dialect.name == 'postgresql'
+        self.use_dbapi = dialect.name == 'sqlite'
+        # Column bind processors (JSON, DateTime, IP address), resolved once instead of per parameter
+        table = LogEntry.__table__
+        self.processors = [
+            (i, proc) for i, proc in enumerate(
+                table.c[name].type.dialect_impl(dialect).bind_processor(dialect) for name in ENTRY_COLUMNS
+            ) if proc is not None
+        ]
+
+    def period(self, logfile_id):
+        """Partition period of a file, creating its partitions the first time the file is written"""
+        if logfile_id not in self.periods:
+            period = file_period(self.session, logfile_id)
+            ensure_partitions(self.session, period)
+            self.periods[logfile_id] = period
+        return self.periods[logfile_id]
+
+    def add(self, row):
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.sqlite_writer is None:
+            self.write(self.buffer)
+        else:
+            self.wait()
+            batch = self.buffer
+            self.in_flight = self.sqlite_writer.submit(lambda session: write_batch(session, batch))
+        self.rows_written += len(self.buffer)
+        self.buffer = []
+
+    def wait(self):
+        """Block until the batch handed to the writer has committed, re-raising its error"""
+        if self.in_flight is not None:
+            future, self.in_flight = self.in_flight, None
+            future.result()
+
+    def write(self, batch):
+        periods = {logfile_id: self.period(logfile_id) for logfile_id in {row[0] for row in batch}}
+        # Indexed before encoding, which moves domain, user agent and source IP out of parsed_data
+        texts = [search_text(row[3]) for row in batch]
+        rows = [row + (periods[row[0]],) for row in self.encoder.encode(batch)]
+        if self.use_copy:
+            ids = self._copy(rows)
+        elif self.use_dbapi:
+            ids = self._dbapi_executemany(rows)
+        else:
+            ids = self._executemany(rows)
+        index_entries(self.session, ids, [row[0] for row in batch], texts)
+
+    def _executemany(self, rows):
+        return self.session.execute(
+            insert(LogEntry.__table__).returning(LogEntry.__table__.c.id, sort_by_parameter_order=True),
+            [dict(zip(ENTRY_COLUMNS, row)) for row in rows]
+        ).scalars().all()
+
+    def _dbapi_executemany(self, rows):
+        """executemany on the raw sqlite3 cursor with positional rows, skipping per-row dict building.
+
+        Returns the new ids: the transaction holds SQLite's write lock, so they are the
+        consecutive ids up to the current maximum.
+        """
+        params = []
+        for row in rows:
+            row = list(row)
+            for i, proc in self.processors:
+                row[i] = proc(row[i])
+            params.append(row)
+        cursor = self.session.connection().connection.cursor()
+        try:
+            cursor.executemany(
+                f"INSERT INTO {LogEntry.__tablename__} ({', '.join(ENTRY_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(ENTRY_COLUMNS))})",
+                params
+            )
+            last_id = cursor.execute(f"SELECT max(id) FROM {LogEntry.__tablename__}").fetchone()[0]
+        finally:
+            cursor.close()
+        return range(last_id - len(params) + 1, last_id + 1)
+
+    def _copy(self, rows):
+        """COPY the rows in with ids drawn from the log_entry sequence up front, and return those ids"""
+        ids = self.session.execute(
+            text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :n)"),
+            {'table': LogEntry.__tablename__, 'n': len(rows)}
+        ).scalars().all()
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for entry_id, row in zip(ids, rows):
+            logfile_id, timestamp, raw_line, parsed_data, line_offset, line_length, occurrences, last_timestamp = row[:8]
+            # csv writes None as an unquoted empty field, which COPY reads as NULL; IPs go in as inet text
+            writer.writerow((entry_id, logfile_id, timestamp.isoformat(' '), raw_line, json.dumps(parsed_data),
+                             line_offset, line_length, occurrences,
+                             last_timestamp.isoformat(' ') if last_timestamp else None) + row[8:])
+        buf.seek(0)
+        cursor = self.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {LogEntry.__tablename__} (id, {', '.join(ENTRY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buf
+            )
+        finally:
+            cursor.close()
+        return ids
+
+def write_batch(session, batch):
+    """SQLiteWriter job inserting one batch of entry rows"""
+    BatchWriter(session).write(batch)
+
+def new_stats(log_format):
+    return {'num_logs': 0, 'parse_errors': 0, 'collapsed': 0,
+            'log_format': None if log_format == 'auto' else log_format}
+
+def write_rows(rows, stats, batch_size=5000, collapse_seconds=0, sqlite_writer=None):
+    """Drain an iterable of entry rows into log_entry in batches and fill in throughput stats.
+
+    With collapse_seconds set, repeated lines are merged per bucket first (see collapse_rows).
+    The caller owns the transaction; rows are flushed in batches but not committed. With a
+    sqlite_writer each batch is committed by the writer instead, so the caller's session
+    must not hold uncommitted writes.
+    """
+    if collapse_seconds:
+        rows = collapse_rows(rows, collapse_seconds, stats)
+    writer = BatchWriter(db.session, batch_size, sqlite_writer)
+    started = time.perf_counter()
+    for row in rows:
+        writer.add(row)
+    writer.flush()
+    writer.wait()
+    elapsed = time.perf_counter() - started
+    stats['num_logs'] = writer.rows_written
+    stats['elapsed_seconds'] = round(elapsed, 3)
+    stats['lines_per_second'] = round(writer.rows_written / elapsed) if elapsed > 0 else 0
+    return stats
+
+def ingest_lines(lines, logfile_id, batch_size=5000, log_format='auto', collapse_seconds=0, sqlite_writer=None):
+    """Parse (offset, line) pairs and bulk-insert the entries, returning ingest statistics"""
+    stats = new_stats(log_format)
+    return write_rows(iter_rows(lines, logfile_id, stats, log_format), stats, batch_size, collapse_seconds,
+                      sqlite_writer)
+
+def split_ranges(filepath, chunk_bytes):
+    """Split a file into (start, end) byte ranges of about chunk_bytes that end on a newline"""
+    ranges = []
+    size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def detect_file_format(filepath, max_lines=1000):
+    """Detect the log format from the first parseable line of a plain-text file"""
+    with open(filepath, 'rb') as f:
+        for _, raw in zip(range(max_lines), f):
+            line = raw.strip().decode('utf-8', errors='replace')
+            if line:
+                detected = detect_format(line)
+                if detected:
+                    return detected
+    return None
+
+def parse_byte_range(job):
+    """Process-pool worker: parse one newline-aligned byte range into entry rows"""
+    filepath, logfile_id, start, end, log_format = job
+    stats = new_stats(log_format)
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    rows = list(iter_rows(iter_offset_lines(io.BytesIO(data), start), logfile_id, stats, log_format))
+    return rows, stats['parse_errors']
+
+def iter_parallel_rows(filepath, logfile_id, log_format, stats, workers, chunk_bytes):
+    """Parse byte ranges of a file in a process pool, yielding rows in original file order.
+
+    At most IN_FLIGHT_PER_WORKER ranges per worker are submitted ahead of the one being
+    consumed, so parsed rows waiting for the writer stay bounded however large the file is.
+    """
+    jobs = iter((filepath, logfile_id, start, end, log_format) for start, end in split_ranges(filepath, chunk_bytes))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT) as pool:
+        # Futures are consumed in submission order, so rows merge back in file order
+        pending = deque(pool.submit(parse_byte_range, job) for job in islice(jobs, workers * IN_FLIGHT_PER_WORKER))
+        while pending:
+            rows, parse_errors = pending.popleft().result()
+            for job in islice(jobs, 1):
+                pending.append(pool.submit(parse_byte_range, job))
+            stats['parse_errors'] += parse_errors
+            yield from rows
+
+def ingest_file(filepath, logfile_id, batch_size=5000, log_format='auto', workers=1, chunk_bytes=8 * 1024 * 1024,
+                collapse_seconds=0, sqlite_writer=None):
+    """Parse a saved upload, decompressing gzip/bz2/zstd while streaming, and bulk-insert its entries.
+
+    Plain-text files larger than chunk_bytes are split on newlines and parsed by a pool of
+    `workers` processes. With a sqlite_writer the batches are committed as they are written.
+    """
+    with open(filepath, 'rb') as raw:
+        compression = detect_compression(raw.peek(4)[:4])
+        if compression is None and workers > 1 and os.path.getsize(filepath) > chunk_bytes:
+            # Every worker must use the same parser, so detect up front
+            if log_format == 'auto':
+                log_format = detect_file_format(filepath) or 'auto'
+            if log_format != 'auto':
+                stats = new_stats(log_format)
+                rows = iter_parallel_rows(filepath, logfile_id, log_format, stats, workers, chunk_bytes)
+                stats = write_rows(rows, stats, batch_size, collapse_seconds, sqlite_writer)
+                stats['compression'] = None
+                return stats
+        if compression is None:
+            lines = iter_offset_lines(raw)
+        else:
+            # There is no plaintext copy to point into, so these entries keep raw_line
+            lines = iter_text_lines(open_text(raw)[0])
+        stats = ingest_lines(lines, logfile_id, batch_size, log_format, collapse_seconds, sqlite_writer)
+    stats['compression'] = compression
+    return stats
+
+def ingest_byte_range(filepath, logfile_id, start, end, final=False, batch_size=5000, log_format='auto',
+                      collapse_seconds=0, sqlite_writer=None):
+    """Ingest the complete lines stored between byte offsets start and end of a partial upload.
+
+    Returns (stats, parsed_to) where parsed_to is the offset just past the last
+    newline consumed. A trailing partial line is left for the next call unless final is set.
+    With a sqlite_writer the batches are committed as they are written.
+    """
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    cut = len(data) if final else data.rfind(b'\n') + 1
+    lines = iter_offset_lines(io.BytesIO(data[:cut]), start)
+    return ingest_lines(lines, logfile_id, batch_size, log_format, collapse_seconds, sqlite_writer), start + cut
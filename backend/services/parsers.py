@@ -0,0 +1,153 @@
+import csv
+import json
+import re
+from datetime import timezone
+from urllib.parse import urlsplit
+from services.timestamps import TimestampDecoder
+
+# Registered line parsers by format name; each takes one stripped line and
+# returns an entry dict (see make_entry) or None when the line is malformed.
+PARSERS = {}
+
+# Formats tried, in order, when an upload does not name its format
+DETECTION_ORDER = ['space', 'combined', 'jsonl', 'csv']
+
+CSV_COLUMNS = ['timestamp', 'src_ip', 'dest_ip', 'domain', 'action', 'method',
+               'status_code', 'user_agent', 'bytes_sent', 'bytes_received']
+
+COMBINED_RE = re.compile(
+    r'(?P<src_ip>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] '
+    r'"(?P<method>[A-Z]+) (?P<target>\S+)[^"]*" (?P<status>\d{3}) (?P<size>\d+|-)'
+    r'(?: "(?P<referer>[^"]*)" "(?P<user_agent>[^"]*)")?'
+)
+
+# Common Log Format time, e.g. 10/Oct/2000:13:55:36 -0700
+parse_clf_timestamp = TimestampDecoder('%d/%b/%Y:%H:%M:%S %z', length=26, seconds_at=18)
+
+def register_parser(name):
+    """Decorator adding a line parser to the registry under name"""
+    def decorator(func):
+        PARSERS[name] = func
+        return func
+    return decorator
+
+def get_parser(name):
+    if name not in PARSERS:
+        raise ValueError(f"Unknown log format: {name}")
+    return PARSERS[name]
+
+def detect_format(line):
+    """Return the first registered format that parses line, or None"""
+    for name in DETECTION_ORDER:
+        if PARSERS[name](line) is not None:
+            return name
+    return None
+
+def make_entry(timestamp, src_ip, dest_ip, domain, action, method, status_code, user_agent, bytes_sent, bytes_received):
+    """Build the parsed_data dict shared by every format.
+
+    bytes_sent/bytes_received are ints; 'bytes' and the string status_code are
+    kept in the original layout for stored rows and the rule engine.
+    """
+    return {
+        'timestamp': timestamp,
+        'src_ip': src_ip,
+        'dest_ip': dest_ip,
+        'domain': domain,
+        'action': action,
+        'method': method,
+        'status_code': status_code,
+        'user_agent': user_agent,
+        'bytes': f"{bytes_sent} {bytes_received}",
+        'bytes_sent': bytes_sent,
+        'bytes_received': bytes_received,
+    }
+
+@register_parser('space')
+def parse_space(line):
+    """Native format: date time src dest domain action method status user_agent sent received.
+
+    The user agent may contain spaces; the two byte counts are taken from the right.
+    """
+    parts = line.split(' ', 8)
+    if len(parts) < 9:
+        return None
+    tail = parts[8].rsplit(' ', 2)
+    if len(tail) < 3:
+        return None
+    try:
+        bytes_sent = int(tail[1])
+        bytes_received = int(tail[2])
+    except ValueError:
+        return None
+    return make_entry(parts[0] + ' ' + parts[1], parts[2], parts[3], parts[4], parts[5],
+                      parts[6], parts[7], tail[0], bytes_sent, bytes_received)
+
+@register_parser('combined')
+def parse_combined(line):
+    """Apache/Nginx combined log format.
+
+    Combined logs carry no destination or firewall action: the domain comes from an
+    absolute request target, 401/403 responses count as Blocked, and the response
+    size is recorded as bytes received by the client. Timestamps are converted to UTC.
+    """
+    match = COMBINED_RE.match(line)
+    if not match:
+        return None
+    try:
+        when = parse_clf_timestamp(match.group('time'))
+    except ValueError:
+        return None
+    status = match.group('status')
+    size = match.group('size')
+    return make_entry(
+        when.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        match.group('src_ip'),
+        '',
+        urlsplit(match.group('target')).hostname or '',
+        'Blocked' if status in ('401', '403') else 'Allowed',
+        match.group('method'),
+        status,
+        match.group('user_agent') or '',
+        0,
+        0 if size == '-' else int(size),
+    )
+
+def _text(record, field):
+    """A string field of a JSON record; absent and null values are empty"""
+    value = record.get(field)
+    return '' if value is None else str(value)
+
+@register_parser('jsonl')
+def parse_jsonl(line):
+    """One JSON object per line using the parsed_data field names"""
+    if not line.startswith('{'):
+        return None
+    try:
+        record = json.loads(line)
+        if not isinstance(record['timestamp'], str):
+            return None
+        if 'bytes_sent' in record:
+            bytes_sent = int(record['bytes_sent'])
+            bytes_received = int(record.get('bytes_received', 0))
+        else:
+            bytes_sent, bytes_received = map(int, str(record.get('bytes', '0 0')).split())
+        return make_entry(record['timestamp'], _text(record, 'src_ip'), _text(record, 'dest_ip'),
+                          _text(record, 'domain'), _text(record, 'action'), _text(record, 'method'),
+                          _text(record, 'status_code'), _text(record, 'user_agent'),
+                          bytes_sent, bytes_received)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+@register_parser('csv')
+def parse_csv(line):
+    """Comma-separated fields in CSV_COLUMNS order; a header row is skipped as malformed"""
+    fields = next(csv.reader((line,)), [])
+    if len(fields) != len(CSV_COLUMNS):
+        return None
+    try:
+        bytes_sent = int(fields[8])
+        bytes_received = int(fields[9])
+    except ValueError:
+        return None
+    return make_entry(*fields[:8], bytes_sent, bytes_received)
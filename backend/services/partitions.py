@@ -0,0 +1,114 @@
+import weakref
+from datetime import datetime
+from sqlalchemy import delete, select, text, update
+from models import LogFile, LogEntry, EntryRollup, Anomaly, AnalysisResult, UploadSession, period_of
+from services.search import delete_file_search_rows
+
+# Tables list-partitioned by upload month on PostgreSQL; partitions are named <table>_p<YYYYMM>
+PARTITIONED_TABLES = ('log_entry', 'anomaly')
+
+# Keep IN lists well under SQLite's bound-parameter limit
+DELETE_CHUNK = 500
+
+# Periods known to have partitions, per engine
+_created = weakref.WeakKeyDictionary()
+
+def partition_name(table, period):
+    return f'{table}_p{period}'
+
+def file_period(session, logfile_id):
+    upload_time = session.execute(select(LogFile.upload_time).where(LogFile.id == logfile_id)).scalar()
+    return period_of(upload_time or datetime.utcnow())
+
+def ensure_partitions(session, period):
+    """Create the log_entry and anomaly partitions for period on PostgreSQL; a no-op elsewhere.
+
+    Runs in its own short transaction so concurrent uploads see the partition at once,
+    and so the current transaction does not hold a lock on the parent tables.
+    """
+    engine = session.get_bind()
+    if engine.dialect.name != 'postgresql':
+        return
+    created = _created.setdefault(engine, set())
+    if period in created:
+        return
+    with engine.begin() as conn:
+        # Attaching a partition briefly locks the parent; fail rather than wait on a lock the caller holds
+        conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+        # Serializes uploads racing to create the same month
+        conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': period})
+        for table in PARTITIONED_TABLES:
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS {partition_name(table, period)} '
+                f'PARTITION OF {table} FOR VALUES IN ({int(period)})'
+            ))
+    created.add(period)
+
+def partition_periods(session, table='log_entry'):
+    """Periods that have a partition of table, oldest first (PostgreSQL only)"""
+    names = session.execute(text(
+        'SELECT c.relname FROM pg_inherits i '
+        'JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent '
+        'WHERE p.relname = :table'
+    ), {'table': table}).scalars()
+    prefix = f'{table}_p'
+    return sorted(int(name[len(prefix):]) for name in names if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+def retention_cutoff(now, months):
+    """Oldest period kept when the current and the previous months - 1 upload months are retained"""
+    index = now.year * 12 + now.month - 1 - (months - 1)
+    return (index // 12) * 100 + index % 12 + 1
+
+def prune_before(session, cutoff_period):
+    """Delete every file uploaded before cutoff_period with its entries, search rows, rollups, anomalies and results.
+
+    On PostgreSQL whole partitions are dropped. SQLite has no partitions and so no cheap way to
+    drop a month: every expired row is deleted, a chunk of files per statement through the
+    per-file indexes, and the freed pages are only returned to the filesystem by a VACUUM.
+    Files kept past the cutoff whose entries were dropped with a partition lose their
+    content digest, so a re-upload of that content is ingested again rather than deduplicated
+    against rows that are gone. Returns a summary including the stored paths, which the
+    caller removes once the transaction has committed.
+    """
+    cutoff = datetime(cutoff_period // 100, cutoff_period % 100, 1)
+    expired = session.execute(select(LogFile.id, LogFile.stored_path).where(LogFile.upload_time < cutoff)).all()
+    file_ids = [row.id for row in expired]
+    dropped = []
+    orphaned = set()
+    # The search index is not partitioned, so its rows go first, while the entries still map ids to files
+    for i in range(0, len(file_ids), DELETE_CHUNK):
+        delete_file_search_rows(session, file_ids[i:i + DELETE_CHUNK])
+    if session.get_bind().dialect.name == 'postgresql':
+        for period in partition_periods(session):
+            if period < cutoff_period:
+                # A file whose upload_time was moved past the cutoff after ingest keeps rows here
+                orphaned.update(session.execute(text(
+                    f'SELECT DISTINCT logfile_id FROM {partition_name("log_entry", period)}')).scalars())
+                for table in PARTITIONED_TABLES:
+                    session.execute(text(f'DROP TABLE IF EXISTS {partition_name(table, period)}'))
+                dropped.append(period)
+        _created.get(session.get_bind(), set()).difference_update(dropped)
+        orphaned = sorted(orphaned.difference(file_ids))
+        for i in range(0, len(orphaned), DELETE_CHUNK):
+            session.execute(update(LogFile).where(LogFile.id.in_(orphaned[i:i + DELETE_CHUNK]))
+                            .values(content_digest=None).execution_options(synchronize_session=False))
+    else:
+        for i in range(0, len(file_ids), DELETE_CHUNK):
+            chunk = file_ids[i:i + DELETE_CHUNK]
+            analyses = select(AnalysisResult.id).where(AnalysisResult.file_id.in_(chunk))
+            session.execute(delete(Anomaly).where(Anomaly.analysis_id.in_(analyses))
+                            .execution_options(synchronize_session=False))
+            session.execute(delete(LogEntry).where(LogEntry.logfile_id.in_(chunk))
+                            .execution_options(synchronize_session=False))
+    for i in range(0, len(file_ids), DELETE_CHUNK):
+        chunk = file_ids[i:i + DELETE_CHUNK]
+        for model, column in ((AnalysisResult, AnalysisResult.file_id), (UploadSession, UploadSession.logfile_id),
+                              (EntryRollup, EntryRollup.logfile_id), (LogFile, LogFile.id)):
+            session.execute(delete(model).where(column.in_(chunk)).execution_options(synchronize_session=False))
+    return {
+        'cutoff_period': cutoff_period,
+        'files': len(file_ids),
+        'partitions_dropped': dropped,
+        'digests_expired': len(orphaned),
+        'stored_paths': [row.stored_path for row in expired if row.stored_path],
+    }
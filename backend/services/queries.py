@@ -0,0 +1,52 @@
+from sqlalchemy import select, text, tuple_
+from models import LogEntry
+from services.dimensions import DIMENSION_ID_COLUMNS
+
+# Columns returned for each entry by the paged entry endpoints
+ENTRY_PAGE_COLUMNS = (LogEntry.id, LogEntry.timestamp, LogEntry.parsed_data, LogEntry.raw_line,
+                      LogEntry.line_offset, LogEntry.line_length) + DIMENSION_ID_COLUMNS
+
+def file_entries(query, file_id, period=None):
+    """Restrict query to one file; passing the file's period lets PostgreSQL prune to a single partition"""
+    query = query.where(LogEntry.logfile_id == file_id)
+    if period is not None:
+        query = query.where(LogEntry.period == period)
+    return query
+
+def entries_by_id(file_id, limit, after_id=0, period=None):
+    """One page of a file's entries in id order, starting after after_id"""
+    return file_entries(select(*ENTRY_PAGE_COLUMNS), file_id, period).where(
+        LogEntry.id > after_id
+    ).order_by(LogEntry.id).limit(limit)
+
+def entries_by_time(file_id, limit, start=None, end=None, after=None, period=None):
+    """One page of a file's entries ordered by (timestamp, id).
+
+    start/end bound the timestamp as [start, end); after is the (timestamp, id)
+    of the last entry on the previous page.
+    """
+    query = file_entries(select(*ENTRY_PAGE_COLUMNS), file_id, period)
+    if start is not None:
+        query = query.where(LogEntry.timestamp >= start)
+    if end is not None:
+        query = query.where(LogEntry.timestamp < end)
+    if after is not None:
+        query = query.where(tuple_(LogEntry.timestamp, LogEntry.id) > tuple_(*after))
+    return query.order_by(LogEntry.timestamp, LogEntry.id).limit(limit)
+
+def explain(session, query):
+    """Return the database's plan for query as a list of lines (SQLite or PostgreSQL)"""
+    dialect = session.get_bind().dialect
+    sql = str(query.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    if dialect.name == 'sqlite':
+        return [row[-1] for row in session.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+    return [row[0] for row in session.execute(text('EXPLAIN ' + sql))]
+
+def uses_full_scan(plan):
+    """True when a plan reads log_entry without an index"""
+    for line in plan:
+        if line.startswith('SCAN log_entry') and 'INDEX' not in line:
+            return True
+        if 'Seq Scan on log_entry' in line:
+            return True
+    return False
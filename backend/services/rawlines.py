@@ -0,0 +1,50 @@
+import mmap
+import threading
+from collections import OrderedDict
+from config import Config
+
+class MmapCache:
+    """LRU of read-only memory maps over stored uploads, keyed by path.
+
+    A chunked upload keeps growing after it was first read, so a map too short for
+    the requested range is replaced by one over the file's current size.
+    """
+
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, path, offset, length):
+        # Slicing happens under the lock so an eviction cannot close a map mid-read
+        with self._lock:
+            mm = self._maps.get(path)
+            if mm is None or offset + length > len(mm):
+                if mm is not None:
+                    mm.close()
+                with open(path, 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[path] = mm
+                self._maps.move_to_end(path)
+                if len(self._maps) > self.capacity:
+                    _, evicted = self._maps.popitem(last=False)
+                    evicted.close()
+            else:
+                self._maps.move_to_end(path)
+            return mm[offset:offset + length]
+
+    def close(self):
+        with self._lock:
+            for mm in self._maps.values():
+                mm.close()
+            self._maps.clear()
+
+mmap_cache = MmapCache(Config.MMAP_CACHE_SIZE)
+
+def read_raw_line(stored_path, raw_line, line_offset, line_length):
+    """Return an entry's original line from the database copy or the stored upload"""
+    if raw_line is not None:
+        return raw_line
+    if stored_path is None or line_offset is None:
+        return None
+    return mmap_cache.read(stored_path, line_offset, line_length).decode('utf-8', errors='replace')
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from sqlalchemy import delete, func, insert, select, update
+from models import LogFile, LogEntry, EntryRollup, Anomaly
+from services.dimensions import load_values_by_id
+from services.search import delete_search_rows
+
+# Entries are aggregated per file and hour by these columns
+ROLLUP_KEYS = ('src_ip_id', 'domain_id', 'status_code', 'action')
+ROLLUP_COLUMNS = ('logfile_id', 'hour') + ROLLUP_KEYS + (
+    'count', 'bytes_sent', 'bytes_sent_max', 'bytes_received', 'bytes_received_max')
+
+def hour_of(column, dialect):
+    """SQL expression truncating a DateTime column to the hour"""
+    if dialect == 'postgresql':
+        return func.date_trunc('hour', column)
+    # SQLAlchemy stores SQLite datetimes as 'YYYY-MM-DD HH:MM:SS.ffffff' text
+    return func.strftime('%Y-%m-%d %H:00:00.000000', column)
+
+def compaction_cutoff(now, days):
+    """Entries older than days are compacted; whole hours only, so one compaction never splits an hour"""
+    return (now - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+
+def files_to_compact(session, cutoff):
+    """Ids of files uploaded before cutoff that still have raw entries older than it"""
+    return session.execute(
+        select(LogFile.id).where(LogFile.upload_time < cutoff).where(
+            select(LogEntry.id).where(LogEntry.logfile_id == LogFile.id, LogEntry.timestamp < cutoff).exists()
+        ).order_by(LogFile.id)
+    ).scalars().all()
+
+def compact_file(session, logfile, cutoff):
+    """Aggregate a file's entries older than cutoff into hourly EntryRollup rows and delete them.
+
+    Returns the number of raw entries removed. Byte sums count every collapsed occurrence.
+    Anomalies flagged on those entries are kept, with logentry_id cleared.
+    """
+    aged = (LogEntry.logfile_id == logfile.id, LogEntry.period == logfile.period, LogEntry.timestamp < cutoff)
+    hour = hour_of(LogEntry.timestamp, session.get_bind().dialect.name)
+    keys = [getattr(LogEntry, key) for key in ROLLUP_KEYS]
+    aggregates = select(
+        LogEntry.logfile_id, hour, *keys,
+        func.sum(LogEntry.occurrences),
+        func.sum(LogEntry.bytes_sent * LogEntry.occurrences), func.max(LogEntry.bytes_sent),
+        func.sum(LogEntry.bytes_received * LogEntry.occurrences), func.max(LogEntry.bytes_received),
+    ).where(*aged).group_by(LogEntry.logfile_id, hour, *keys)
+    session.execute(insert(EntryRollup).from_select(ROLLUP_COLUMNS, aggregates))
+    aged_ids = select(LogEntry.id).where(*aged)
+    session.execute(update(Anomaly).where(Anomaly.period == logfile.period, Anomaly.logentry_id.in_(aged_ids))
+                    .values(logentry_id=None).execution_options(synchronize_session=False))
+    delete_search_rows(session, aged_ids)
+    result = session.execute(delete(LogEntry).where(*aged).execution_options(synchronize_session=False))
+    return result.rowcount
+
+def file_rollups(session, logfile_id):
+    """A file's hourly rollups with src_ip and domain values filled in.
+
+    Rows written for the same hour by separate compactions are merged here.
+    """
+    keys = [EntryRollup.hour] + [getattr(EntryRollup, key) for key in ROLLUP_KEYS]
+    rows = session.execute(
+        select(
+            func.min(EntryRollup.id).label('id'), *keys,
+            func.sum(EntryRollup.count).label('count'),
+            func.sum(EntryRollup.bytes_sent).label('bytes_sent'),
+            func.max(EntryRollup.bytes_sent_max).label('bytes_sent_max'),
+            func.sum(EntryRollup.bytes_received).label('bytes_received'),
+            func.max(EntryRollup.bytes_received_max).label('bytes_received_max'),
+        ).where(EntryRollup.logfile_id == logfile_id).group_by(*keys).order_by(EntryRollup.hour)
+    ).all()
+    values = load_values_by_id(session, [(row.domain_id, None, row.src_ip_id) for row in rows])
+    return [
+        dict(row._asdict(), domain=values['domain'].get(row.domain_id), src_ip=values['src_ip'].get(row.src_ip_id))
+        for row in rows
+    ]
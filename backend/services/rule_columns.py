@@ -0,0 +1,105 @@
+from collections import namedtuple
+import numpy as np
+from sqlalchemy import case, func, or_
+from models import LogEntry
+from services.dimensions import DIMENSION_FIELDS, DIMENSION_ID_COLUMNS
+
+# The per-entry inputs of the security rules as parallel arrays. src_ip, user_agent and domain
+# are factorized (distinct values, code of each entry); a missing value is None. is_403 flags
+# 403 responses, and bytes_sent/bytes_received only count where readable_bytes is set.
+RuleColumns = namedtuple('RuleColumns', 'src_ip user_agent domain is_403 bytes_sent bytes_received readable_bytes')
+
+# Selected right after FEATURE_COLUMNS: the entry id, its domain, user agent and source IP ids
+# (-1 for a value that stayed in parsed_data), whether it answered 403, and whether any of
+# those values or its bytes have to be read from parsed_data. LEGACY_RULE_COLUMNS follow,
+# NULL except on such rows.
+RULE_COLUMNS = (
+    LogEntry.id,
+    *(func.coalesce(id_column, -1) for id_column in DIMENSION_ID_COLUMNS),
+    case((LogEntry.status_code == 403, 1), else_=0),
+    case((or_(LogEntry.bytes_sent.is_(None), *(id_column.is_(None) for id_column in DIMENSION_ID_COLUMNS)), 1), else_=0),
+)
+LEGACY_RULE_COLUMNS = (
+    *(case((id_column.is_(None), func.coalesce(LogEntry.parsed_data[field].as_string(), '')))
+      for field, id_column in zip(DIMENSION_FIELDS, DIMENSION_ID_COLUMNS)),
+    # Rows parsed before the typed byte fields only carry 'bytes': "sent received"
+    case((LogEntry.bytes_sent.is_(None), func.coalesce(LogEntry.parsed_data['bytes'].as_string(), '0 0'))),
+)
+
+def factorize(values):
+    """(distinct values in order of first appearance, code of each value as an index into them)"""
+    uniques = list(dict.fromkeys(values))
+    index = {value: code for code, value in enumerate(uniques)}
+    return uniques, np.fromiter(map(index.__getitem__, values), dtype=np.intp, count=len(values))
+
+def factorize_ids(ids, legacy, values):
+    """Factorize a dimension column from its ids; rows with id -1 take their value from legacy[row]"""
+    keys = ids.copy()
+    legacy_keys = {}
+    for row, value in legacy.items():
+        # Values left in parsed_data get negative keys, one per distinct value
+        keys[row] = -1 - legacy_keys.setdefault(value, len(legacy_keys))
+    unique_keys, first, codes = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    legacy_values = list(legacy_keys)
+    names = [values[key] if key >= 0 else legacy_values[-1 - key] for key in unique_keys[order].tolist()]
+    # An interned value and the same value left in parsed_data are one value
+    uniques, merged = factorize(names)
+    return uniques, merged[rank[codes]]
+
+class RuleColumnBuilder:
+    """Collects RuleColumns from the rows streamed for an analysis, next to a FeatureBuilder.
+
+    Each row carries FEATURE_COLUMNS, RULE_COLUMNS and LEGACY_RULE_COLUMNS in that order.
+    Ids and flags are copied a batch at a time into arrays; parsed_data values are only
+    kept for the rare rows flagged as needing them.
+    """
+
+    def __init__(self, capacity, start):
+        self.start = start
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.dimension_ids = np.full((capacity, len(DIMENSION_FIELDS)), -1, dtype=np.int64)
+        self.is_403 = np.zeros(capacity, dtype=bool)
+        self.legacy = {field: {} for field in DIMENSION_FIELDS}
+        self.legacy_bytes = {}
+        self.size = 0
+
+    def add(self, rows):
+        """Append rows, as many as the FeatureBuilder took of the same batch"""
+        if not rows:
+            return
+        width = len(RULE_COLUMNS)
+        block = np.array([row[self.start:self.start + width] for row in rows], dtype=np.int64)
+        end = self.size + len(rows)
+        self.ids[self.size:end] = block[:, 0]
+        self.dimension_ids[self.size:end] = block[:, 1:-2]
+        self.is_403[self.size:end] = block[:, -2] > 0
+        for i in np.flatnonzero(block[:, -1]).tolist():
+            *values, legacy_bytes = rows[i][self.start + width:]
+            for field, value in zip(DIMENSION_FIELDS, values):
+                if value is not None:
+                    self.legacy[field][self.size + i] = str(value)
+            if legacy_bytes is not None:
+                self.legacy_bytes[self.size + i] = legacy_bytes
+        self.size = end
+
+    def finish(self, values, features):
+        """RuleColumns of the rows added, given the file's dimension values and the finished FeatureBuilder"""
+        self.ids = self.ids[:self.size]
+        columns = {
+            field: factorize_ids(self.dimension_ids[:self.size, i], self.legacy[field], values[field])
+            for i, field in enumerate(DIMENSION_FIELDS)
+        }
+        bytes_sent = features.bytes[:, 0].copy()
+        bytes_received = features.bytes[:, 1].copy()
+        readable = features.has_bytes_sent.copy()
+        for row, legacy_bytes in self.legacy_bytes.items():
+            try:
+                bytes_sent[row], bytes_received[row] = map(int, legacy_bytes.split())
+                readable[row] = True
+            except (ValueError, AttributeError):
+                bytes_sent[row] = bytes_received[row] = 0
+        return RuleColumns(columns['src_ip'], columns['user_agent'], columns['domain'], self.is_403[:self.size],
+                           bytes_sent, bytes_received, readable)
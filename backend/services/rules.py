@@ -0,0 +1,94 @@
+import hashlib
+import re
+from functools import lru_cache
+from services.typosquat import brand_index
+
+# User-Agent substrings of automation tools, checked in order
+AUTOMATION_INDICATORS = ['curl', 'wget', 'python', 'postman', 'bot', 'spider', 'crawler']
+
+# More realistic suspicious domain detection
+SUSPICIOUS_TLDS = ['.xyz', '.top', '.cc', '.tk', '.ml', '.ga', '.cf']  # Often used for malicious sites
+SUSPICIOUS_PATTERNS = [
+    # Typosquatting patterns
+    ('google', ['g00gle', 'go0gle', 'gogle', 'gooogle']),
+    ('facebook', ['facebo0k', 'faceb00k', 'fasebook', 'facebok']),
+    ('amazon', ['amaz0n', 'amazoon', 'amazn', 'amaz0n']),
+    ('microsoft', ['m1crosoft', 'micros0ft', 'm1cr0s0ft', 'microsft']),
+    ('paypal', ['paypa1', 'paypall', 'paypa1', 'paypa1']),
+    ('apple', ['app1e', 'app1e', 'appel', 'app1e']),
+]
+
+# Distinct values remembered per process by each cached rule
+RULE_CACHE_SIZE = 65536
+
+# Bump when the logic of is_suspicious_domain changes; its lists and brands are part of RULES_VERSION already
+DOMAIN_RULES_REVISION = 3
+# Identifies the domain rule set, so verdicts stored under another version are classified again
+RULES_VERSION = hashlib.sha1(
+    repr((DOMAIN_RULES_REVISION, SUSPICIOUS_TLDS, SUSPICIOUS_PATTERNS, brand_index.version)).encode()
+).hexdigest()[:16]
+
+_NOTHING = frozenset()
+
+class SubstringMatcher:
+    """Finds which of a fixed set of needles occur in a text.
+
+    One compiled alternation scans the text once; only texts it matches, the rare case,
+    are then checked needle by needle to tell which ones occur.
+    """
+
+    def __init__(self, needles):
+        self.needles = list(dict.fromkeys(needles))
+        self.pattern = re.compile('|'.join(map(re.escape, sorted(self.needles, key=len, reverse=True))))
+
+    def found(self, text):
+        """The set of needles occurring in text"""
+        if not self.pattern.search(text):
+            return _NOTHING
+        return {needle for needle in self.needles if needle in text}
+
+_automation = SubstringMatcher(AUTOMATION_INDICATORS)
+# Variations only count on domains containing their brand, so the brands gate the check
+_brands = SubstringMatcher([legitimate for legitimate, _ in SUSPICIOUS_PATTERNS])
+_suspicious_tlds = tuple(SUSPICIOUS_TLDS)
+
+@lru_cache(maxsize=RULE_CACHE_SIZE)
+def automation_indicator(user_agent):
+    """The first automation indicator the User-Agent contains, or None"""
+    found = _automation.found(user_agent.lower())
+    if not found:
+        return None
+    return next(indicator for indicator in AUTOMATION_INDICATORS if indicator in found)
+
+@lru_cache(maxsize=RULE_CACHE_SIZE)
+def is_suspicious_domain(domain):
+    """(suspicious, reason) for a domain name"""
+    domain_lower = domain.lower()
+
+    # Check for suspicious TLDs
+    if domain_lower.endswith(_suspicious_tlds):
+        tld = next(tld for tld in SUSPICIOUS_TLDS if domain_lower.endswith(tld))
+        return True, f"Suspicious TLD: {tld}"
+
+    # Check for typosquatting patterns
+    brands = _brands.found(domain_lower)
+    for legitimate, variations in SUSPICIOUS_PATTERNS if brands else ():
+        if legitimate in brands:
+            for variation in variations:
+                if variation in domain_lower:
+                    return True, f"Typosquatting: {legitimate} → {variation}"
+
+    # Check for near misses of the brand list
+    squat = brand_index.find(domain_lower)
+    if squat:
+        return True, f"Typosquatting: {squat[0]} → {squat[1]}"
+
+    # Check for suspicious subdomain patterns
+    if domain_lower.count('.') > 2:  # Too many subdomains
+        return True, "Excessive subdomains"
+
+    # Check for random-looking domains (lots of numbers/random chars)
+    if len(domain) > 20 and sum(map(str.isdigit, domain)) > len(domain) * 0.3:
+        return True, "Random-looking domain with many numbers"
+
+    return False, ""
@@ -0,0 +1,135 @@
+import csv
+import io
+import sqlalchemy as sa
+from sqlalchemy import delete, event, func, select, text
+from extensions import db
+from models import LogEntry
+from services.queries import ENTRY_PAGE_COLUMNS, file_entries
+
+# The trigram indexes cannot answer anything shorter
+MIN_QUERY_LENGTH = 3
+
+# Full-text index over entry text: an FTS5 trigram table on SQLite (the entry id is its rowid)
+# and a pg_trgm GIN-indexed table on PostgreSQL. Neither can be declared as a model, so both
+# are created by SEARCH_DDL, when the metadata is created and by migration 0013.
+SEARCH_DDL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS entry_search USING fts5(line, logfile_id UNINDEXED, tokenize='trigram')",
+    ],
+    'postgresql': [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE TABLE IF NOT EXISTS entry_search (entry_id bigint PRIMARY KEY, logfile_id integer NOT NULL, line text NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_entry_search_line ON entry_search USING gin (line gin_trgm_ops)',
+        'CREATE INDEX IF NOT EXISTS ix_entry_search_logfile_id ON entry_search (logfile_id)',
+    ],
+}
+SQLITE_SEARCH = sa.table('entry_search', sa.column('rowid', sa.Integer), sa.column('logfile_id', sa.Integer),
+                         sa.column('line', sa.Text))
+POSTGRES_SEARCH = sa.table('entry_search', sa.column('entry_id', sa.BigInteger), sa.column('logfile_id', sa.Integer),
+                           sa.column('line', sa.Text))
+
+def create_search_index(connection):
+    for statement in SEARCH_DDL.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    create_search_index(connection)
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    connection.exec_driver_sql('DROP TABLE IF EXISTS entry_search')
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Alembic filter leaving the search index, and the FTS5 shadow tables behind it, out of autogenerate"""
+    return not (type_ == 'table' and name.startswith('entry_search'))
+
+def search_columns(dialect):
+    """(table, entry id column) of the search index"""
+    if dialect == 'sqlite':
+        return SQLITE_SEARCH, SQLITE_SEARCH.c.rowid
+    return POSTGRES_SEARCH, POSTGRES_SEARCH.c.entry_id
+
+def search_text(entry_data):
+    """The text indexed for an entry: its parsed field values, so IPs, domains and user agents are all found.
+
+    Raw lines of stored uploads are not in the database, only their offsets, so parsed values
+    are what ingest and the migration backfill can both index; text a parser drops, such as the
+    path of a combined-format request, is not searchable.
+    """
+    return ' '.join(str(value) for value in entry_data.values() if value is not None and value != '')
+
+def index_entries(session, ids, logfile_ids, texts):
+    """Add the index rows of just-inserted entries through the raw DBAPI cursor; a no-op on other databases"""
+    dialect = session.get_bind().dialect.name
+    if dialect not in SEARCH_DDL:
+        return
+    cursor = session.connection().connection.cursor()
+    try:
+        if dialect == 'sqlite':
+            cursor.executemany('INSERT INTO entry_search (rowid, logfile_id, line) VALUES (?, ?, ?)',
+                               list(zip(ids, logfile_ids, texts)))
+        else:
+            buf = io.StringIO()
+            csv.writer(buf).writerows(zip(ids, logfile_ids, texts))
+            buf.seek(0)
+            cursor.copy_expert('COPY entry_search (entry_id, logfile_id, line) FROM STDIN WITH (FORMAT csv)', buf)
+    finally:
+        cursor.close()
+
+def delete_search_rows(session, entry_ids):
+    """Drop the index rows of the entries picked by entry_ids, a select of LogEntry.id run before they are deleted"""
+    table, entry_id = search_columns(session.get_bind().dialect.name)
+    session.execute(delete(table).where(entry_id.in_(entry_ids)).execution_options(synchronize_session=False))
+
+def delete_file_search_rows(session, file_ids):
+    """Drop the index rows of whole files"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # logfile_id is not indexed by FTS5; go through the entries' file index instead
+        delete_search_rows(session, select(LogEntry.id).where(LogEntry.logfile_id.in_(file_ids)))
+    else:
+        session.execute(delete(POSTGRES_SEARCH).where(POSTGRES_SEARCH.c.logfile_id.in_(file_ids))
+                        .execution_options(synchronize_session=False))
+
+def file_id_range(session, file_id, start=None, end=None):
+    """(first, last) id of a file's entries, within [start, end) when given, read from the file indexes.
+
+    Entries of one upload are inserted together, so bounding the index scan by these ids
+    skips the matches of every other file.
+    """
+    bounds = [LogEntry.logfile_id == file_id]
+    if start is not None:
+        bounds.append(LogEntry.timestamp >= start)
+    if end is not None:
+        bounds.append(LogEntry.timestamp < end)
+    # Separate subqueries, as SQLite only answers a lone min() or max() with a single index probe
+    return session.execute(select(
+        select(func.min(LogEntry.id)).where(*bounds).scalar_subquery(),
+        select(func.max(LogEntry.id)).where(*bounds).scalar_subquery(),
+    )).one()
+
+def search_entries(dialect, query, limit, after_id=0, file_id=None, id_range=None, start=None, end=None, period=None):
+    """One page of entries whose text contains query, case-insensitively, in id order after after_id.
+
+    id_range (from file_id_range) bounds the index scan to one file's ids; start/end bound
+    the timestamp as [start, end). Rows are ENTRY_PAGE_COLUMNS followed by logfile_id.
+    """
+    table, entry_id = search_columns(dialect)
+    if dialect == 'sqlite':
+        # A quoted FTS5 string is matched as a substring by the trigram tokenizer
+        match = text('entry_search MATCH :match').bindparams(match='"' + query.replace('"', '""') + '"')
+    else:
+        match = table.c.line.icontains(query, autoescape=True)
+    stmt = select(*ENTRY_PAGE_COLUMNS, LogEntry.logfile_id).select_from(table).join(
+        LogEntry, LogEntry.id == entry_id
+    ).where(match, entry_id > after_id)
+    if file_id is not None:
+        stmt = file_entries(stmt, file_id, period)
+    if id_range is not None:
+        stmt = stmt.where(entry_id.between(*id_range))
+    if start is not None:
+        stmt = stmt.where(LogEntry.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(LogEntry.timestamp < end)
+    return stmt.order_by(entry_id).limit(limit)
@@ -0,0 +1,153 @@
+import fcntl
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from extensions import db
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+def database_path(engine):
+    """Path of a file-backed SQLite database, or None for an in-memory one"""
+    database = engine.url.database
+    if not database or database == ':memory:' or database.startswith('file:'):
+        return None
+    return database
+
+def configure_sqlite(app):
+    """Set the SQLite pragmas on every new connection and create the app's writer; a no-op on other databases"""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = app.config['SQLITE_PRAGMAS']
+    event.listen(engine, 'connect', lambda dbapi_connection, _: apply_pragmas(dbapi_connection, pragmas))
+    path = database_path(engine)
+    # In-memory databases share one connection, so there is nothing for a writer to coordinate
+    if app.config['SQLITE_WRITER'] and path:
+        app.extensions['sqlite_writer'] = SQLiteWriter(engine, f'{path}.writer.lock',
+                                                       app.config['SQLITE_WRITER_MAX_JOBS'])
+
+def current_writer():
+    """The SQLite writer of the current app, or None when writes go through the request session"""
+    return current_app.extensions.get('sqlite_writer')
+
+def run_write(job):
+    """Run job(session) in a committed write transaction and return its result.
+
+    With a SQLite writer the job joins the writer's next grouped transaction, so it must
+    return plain values rather than ORM objects. The request session is committed first
+    so it never holds the write lock the writer is waiting for. Without a writer the job
+    runs on the request session, which is then committed.
+    """
+    writer = current_writer()
+    if writer is None:
+        result = job(db.session)
+        db.session.commit()
+        return result
+    db.session.commit()
+    return writer.run(job)
+
+class SQLiteWriter:
+    """A thread that commits queued write jobs in grouped transactions.
+
+    SQLite admits one writer at a time, and concurrent writers otherwise spin in the busy
+    handler until they time out with 'database is locked'. Jobs are callables taking a
+    Session; every job queued while the writer waits for the lock joins the same
+    transaction, up to max_jobs. gunicorn workers are separate processes, each with its
+    own writer, so the writers take turns through an flock on a file next to the database.
+    """
+
+    def __init__(self, engine, lock_path, max_jobs=64):
+        self.engine = engine
+        self.lock_path = lock_path
+        self.max_jobs = max_jobs
+        self.stats = {'transactions': 0, 'jobs': 0, 'failed_jobs': 0,
+                      'lock_wait_seconds': 0.0, 'max_lock_wait_seconds': 0.0}
+        self.jobs = None
+        self.pid = None
+        self.mutex = threading.Lock()
+
+    def submit(self, job):
+        """Queue job; the returned Future resolves to its result once its transaction commits"""
+        # Threads do not survive fork, so every worker process starts its own
+        if self.pid != os.getpid():
+            with self.mutex:
+                if self.pid != os.getpid():
+                    self.jobs = queue.Queue()
+                    threading.Thread(target=self._run, args=(self.jobs,), name='sqlite-writer', daemon=True).start()
+                    self.pid = os.getpid()
+        future = Future()
+        self.jobs.put((job, future))
+        return future
+
+    def run(self, job):
+        return self.submit(job).result()
+
+    def _run(self, jobs):
+        while True:
+            group = [jobs.get()]
+            try:
+                with open(self.lock_path, 'a') as lock:
+                    started = time.perf_counter()
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                    # Everything queued while waiting for the lock commits in this transaction
+                    while len(group) < self.max_jobs:
+                        try:
+                            group.append(jobs.get_nowait())
+                        except queue.Empty:
+                            break
+                    outcomes = self._commit_group([job for job, _ in group], started)
+            except Exception as e:
+                outcomes = [(None, e)] * len(group)
+            for (_, future), (result, error) in zip(group, outcomes):
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    def _commit_group(self, jobs, started):
+        """(result, error) per job; a failing job is retried alone so it does not fail the rest of its group"""
+        try:
+            return [(result, None) for result in self._transaction(jobs, started)]
+        except Exception as e:
+            if len(jobs) == 1:
+                self.stats['failed_jobs'] += 1
+                return [(None, e)]
+        outcomes = []
+        for job in jobs:
+            try:
+                outcomes.append((self._transaction([job], time.perf_counter())[0], None))
+            except Exception as e:
+                self.stats['failed_jobs'] += 1
+                outcomes.append((None, e))
+        return outcomes
+
+    def _transaction(self, jobs, started):
+        session = Session(self.engine)
+        try:
+            # Take the write lock up front instead of upgrading a read lock on the first insert
+            session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+            waited = time.perf_counter() - started
+            self.stats['lock_wait_seconds'] += waited
+            self.stats['max_lock_wait_seconds'] = max(self.stats['max_lock_wait_seconds'], waited)
+            results = [job(session) for job in jobs]
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        self.stats['transactions'] += 1
+        self.stats['jobs'] += len(jobs)
+        return results
@@ -0,0 +1,79 @@
+from datetime import datetime
+import numpy as np
+
+LOG_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+class TimestampDecoder:
+    """strptime replacement for fixed-layout timestamps that caches everything but the seconds.
+
+    Consecutive log lines almost always share their date and minute, so the
+    prefix is parsed by strptime once and each line only converts its two
+    seconds digits. Anything that does not fit the fixed layout goes through
+    strptime, so results and errors match it exactly.
+    """
+
+    def __init__(self, fmt=LOG_TIMESTAMP_FORMAT, length=19, seconds_at=17):
+        self.fmt = fmt
+        self.length = length
+        self.seconds_at = seconds_at
+        # (cache key, base datetime) swapped as one object so a shared decoder stays consistent
+        self._last = (None, None)
+
+    def __call__(self, text):
+        s = self.seconds_at
+        digits = text[s:s + 2]
+        if len(text) != self.length or not (digits.isascii() and digits.isdigit()):
+            return datetime.strptime(text, self.fmt)
+        key = text[:s] + text[s + 2:]
+        last_key, base = self._last
+        if key != last_key:
+            try:
+                base = datetime.strptime(text[:s] + '00' + text[s + 2:], self.fmt)
+            except ValueError:
+                return datetime.strptime(text, self.fmt)
+            self._last = (key, base)
+        second = int(digits)
+        if second > 59:
+            return datetime.strptime(text, self.fmt)
+        return base.replace(second=second)
+
+# Shared decoder for the native log layout
+parse_timestamp = TimestampDecoder()
+
+def decode_timestamps(texts):
+    """Decode a batch of 'YYYY-MM-DD HH:MM:SS' strings to a datetime64[s] array.
+
+    Well-formed values are decoded with array arithmetic; the rest go through
+    parse_timestamp one by one. Values strptime would reject become NaT.
+    """
+    arr = np.asarray(texts, dtype='U20')
+    out = np.full(arr.shape[0], np.datetime64('NaT'), dtype='datetime64[s]')
+    if arr.shape[0] == 0:
+        return out
+    # UCS-4 code points, one column per character; the 20th column catches over-long values
+    codes = arr.view(np.uint32).reshape(-1, 20).astype(np.int64)
+    digits = codes - ord('0')
+    digit_cols = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+    shaped = (
+        (codes[:, 4] == ord('-')) & (codes[:, 7] == ord('-')) & (codes[:, 10] == ord(' '))
+        & (codes[:, 13] == ord(':')) & (codes[:, 16] == ord(':')) & (codes[:, 19] == 0)
+        & np.all((digits[:, digit_cols] >= 0) & (digits[:, digit_cols] <= 9), axis=1)
+    )
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+    hour = digits[:, 11] * 10 + digits[:, 12]
+    minute = digits[:, 14] * 10 + digits[:, 15]
+    second = digits[:, 17] * 10 + digits[:, 18]
+    valid = shaped & (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (hour < 24) & (minute < 60) & (second < 60)
+    month_start = (np.where(valid, year, 1970) - 1970).astype('datetime64[Y]') + (np.where(valid, month, 1) - 1).astype('timedelta64[M]')
+    days_in_month = ((month_start + np.timedelta64(1, 'M')).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    valid &= day <= days_in_month
+    seconds = (((day - 1) * 24 + hour) * 60 + minute) * 60 + second
+    out[valid] = month_start[valid].astype('datetime64[s]') + seconds[valid].astype('timedelta64[s]')
+    for i in np.flatnonzero(~shaped):
+        try:
+            out[i] = np.datetime64(parse_timestamp(str(texts[i])), 's')
+        except ValueError:
+            pass
+    return out
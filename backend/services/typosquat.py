@@ -0,0 +1,109 @@
+import hashlib
+import os
+import re
+
+# Brand list the index is built from; one name per line, '#' starts a comment
+BRAND_LIST_PATH = os.getenv('BRAND_LIST_PATH', os.path.join(os.path.dirname(__file__), 'brands.txt'))
+
+# Shorter brands collide with ordinary words too often to match fuzzily
+MIN_BRAND_LENGTH = 5
+
+# Digits and symbols read as the letters they imitate
+HOMOGLYPHS = str.maketrans({'0': 'o', '1': 'l', '3': 'e', '4': 'a', '5': 's', '7': 't', '@': 'a', '$': 's'})
+
+# Domain labels are split into words on dots and hyphens
+WORD_SEPARATORS = re.compile(r'[.\-]')
+
+def max_distance(length):
+    """Edits tolerated from a brand of length characters: 5-character brands only through homoglyphs"""
+    if length < 6:
+        return 0
+    return 1 if length < 9 else 2
+
+# Below this length a word one edit from a brand is often an ordinary word, so the edit must be
+# inside it: finance/binance, mobile/tmobile, dockers/docker and domino/dominos all differ at an edge
+INTERIOR_EDITS_BELOW = 9
+
+def deletions(word, distance):
+    """Every string left by deleting at most distance characters from word, word included"""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (edits and adjacent transpositions), or limit + 1 beyond limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+def brand_distance(normalized, brand):
+    """Edit distance by which a homoglyph-normalized word imitates brand, or None when it does not"""
+    limit = max_distance(len(brand))
+    distance = edit_distance(normalized, brand, limit)
+    if distance > limit:
+        return None
+    if distance and len(brand) < INTERIOR_EDITS_BELOW and (normalized[0] != brand[0] or normalized[-1] != brand[-1]):
+        return None
+    return distance
+
+def load_brands(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip().lower() for line in f if line.strip() and not line.startswith('#')]
+
+class TyposquatIndex:
+    """SymSpell-style deletion index finding the brand a domain word imitates.
+
+    Each brand is stored under every string left by deleting up to max_distance of its
+    characters. A word only has to look up its own deletions, so a check costs a few
+    dozen dictionary probes however long the brand list is, instead of an edit distance
+    per brand. Words are compared after mapping homoglyphs, so g00gle matches google.
+    """
+
+    def __init__(self, brands):
+        self.brands = list(dict.fromkeys(brand for brand in brands if len(brand) >= MIN_BRAND_LENGTH))
+        self.rank = {brand: i for i, brand in enumerate(self.brands)}
+        self.deletes = {}
+        for brand in self.brands:
+            for variant in deletions(brand, max_distance(len(brand))):
+                self.deletes.setdefault(variant, []).append(brand)
+        self.max_length = max(map(len, self.brands), default=0) + 2
+        self.version = hashlib.sha1('\n'.join(self.brands).encode()).hexdigest()[:16]
+
+    def match(self, word):
+        """The brand word imitates without being it, or None; the closest and then earliest listed brand wins"""
+        if word in self.rank or not MIN_BRAND_LENGTH - 1 <= len(word) <= self.max_length:
+            return None
+        normalized = word.translate(HOMOGLYPHS)
+        if normalized in self.rank:
+            return normalized
+        best = None
+        for variant in deletions(normalized, 2):
+            for brand in self.deletes.get(variant, ()):
+                distance = brand_distance(normalized, brand)
+                if distance is not None and (best is None or (distance, self.rank[brand]) < best):
+                    best = (distance, self.rank[brand])
+        return self.brands[best[1]] if best else None
+
+    def find(self, domain):
+        """(brand, word) for the first word of a lowercase domain that imitates a brand, or None"""
+        for word in WORD_SEPARATORS.split(domain):
+            brand = self.match(word)
+            if brand:
+                return brand, word
+        return None
+
+brand_index = TyposquatIndex(load_brands(BRAND_LIST_PATH))
@@ -0,0 +1,46 @@
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import DomainVerdict
+from services.dimensions import LOOKUP_CHUNK
+from services.rules import RULES_VERSION, is_suspicious_domain
+
+# Longest domain a verdict is stored for, the width of DomainVerdict.domain
+MAX_DOMAIN_LENGTH = 255
+
+def lookup_domain_verdicts(session, domains):
+    """({domain: (suspicious, reason)}, rows to store) for domains.
+
+    Verdicts stored under the current RULES_VERSION are read in bulk; only the other
+    domains are classified, and their rows are returned for save_domain_verdicts.
+    """
+    domains = [domain for domain in set(domains) if type(domain) is str and len(domain) <= MAX_DOMAIN_LENGTH]
+    verdicts = {}
+    for start in range(0, len(domains), LOOKUP_CHUNK):
+        chunk = domains[start:start + LOOKUP_CHUNK]
+        rows = session.execute(
+            select(DomainVerdict.domain, DomainVerdict.suspicious, DomainVerdict.reason)
+            .where(DomainVerdict.domain.in_(chunk), DomainVerdict.rules_version == RULES_VERSION)
+        )
+        verdicts.update((domain, (suspicious, reason)) for domain, suspicious, reason in rows)
+    new_rows = []
+    for domain in domains:
+        if domain not in verdicts:
+            verdicts[domain] = is_suspicious_domain(domain)
+            suspicious, reason = verdicts[domain]
+            new_rows.append({'domain': domain, 'rules_version': RULES_VERSION, 'suspicious': suspicious, 'reason': reason})
+    return verdicts, new_rows
+
+def save_domain_verdicts(session, rows):
+    """Store verdicts, replacing those of older rule sets; concurrent analyses may store the same domain"""
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        module = postgresql if dialect == 'postgresql' else sqlite
+        stmt = module.insert(DomainVerdict.__table__)
+        stmt = stmt.on_conflict_do_update(index_elements=['domain'], set_={
+            column: stmt.excluded[column] for column in ('rules_version', 'suspicious', 'reason')
+        })
+    else:
+        stmt = insert(DomainVerdict.__table__)
+    session.execute(stmt, rows)
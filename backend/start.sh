@@ -29,13 +29,20 @@ echo "Initializing database..."
 python -c "
 from app import app
 from extensions import db
+from flask_migrate import stamp, upgrade
 from models import User
 
 app.app_context().push()
 
-# Create all tables
-db.create_all()
-print('Database tables created successfully')
+# Databases created with db.create_all() before migrations existed hold the baseline schema
+inspector = db.inspect(db.engine)
+if inspector.has_table('log_file') and not inspector.has_table('alembic_version'):
+    stamp(revision='0001')
+    print('Stamped existing database at baseline revision')
+
+# Create or upgrade all tables
+upgrade()
+print('Database schema is up to date')
 
 # Create default user if it doesn't exist
 if not User.query.filter_by(username='admin').first():
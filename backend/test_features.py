@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the float32 feature matrix and the security rule inputs built from streamed entry columns
+"""
+
+import io
+import numpy as np
+from sqlalchemy import select
+from extensions import db
+from models import LogEntry
+from services.features import FEATURE_COLUMNS, FeatureBuilder, with_features
+from services.rule_columns import RULE_COLUMNS, LEGACY_RULE_COLUMNS, RuleColumnBuilder
+from services.dimensions import DIMENSION_ID_COLUMNS, load_dimension_values, hydrate
+from services.queries import file_entries
+from routes.analysis import detect_column_anomalies, detect_security_anomalies
+
+LINES = [
+    "2025-07-09 16:00:00 192.168.1.7 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 100 10",
+    "2025-07-09 16:05:00 10.0.0.66 93.184.216.34 g00gle-login.xyz Blocked POST 403 curl/7.68.0 90000 3",
+    "2025-07-09 16:10:00 192.168.1.8 93.184.216.34 example.com Allowed GET 301 Chrome/91.0 50 5",
+]
+
+def test_features_come_from_typed_columns_in_batches(client):
+    data = {'file': (io.BytesIO('\n'.join(LINES).encode()), 'features.log')}
+    file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+    rows = db.session.execute(
+        file_entries(with_features(select(*FEATURE_COLUMNS)), file_id).order_by(LogEntry.id)
+    ).all()
+    # One more row than fits is left out
+    builder = FeatureBuilder(2)
+    assert builder.add(rows[:1]) == 1
+    assert builder.add(rows[1:]) == 1
+    X, weights = builder.finish()
+    assert X.dtype == np.float32
+    assert X.tolist() == [
+        [200, 100, 10, len('example.com'), len('Mozilla/5.0'), 0, 0],
+        [403, 90000, 3, len('g00gle-login.xyz'), len('curl/7.68.0'), 1, 1],
+    ]
+    assert weights.tolist() == [1, 1]
+    assert builder.bytes.tolist() == [[100, 10], [90000, 3]]
+    averages, stds = builder.byte_stats()
+    assert averages == {'bytes_sent': 45050, 'bytes_received': 6.5}
+    assert stds == {'bytes_sent': 44950, 'bytes_received': 3.5}
+
+def test_rule_columns_match_the_hydrated_entries(client):
+    lines = LINES * 3 + [
+        # Too long to intern, so the domain stays in parsed_data
+        f"2025-07-09 16:20:00 10.0.0.66 93.184.216.34 {'x' * 260}.com Allowed GET 403 curl/7.68.0 70 7",
+    ]
+    data = {'file': (io.BytesIO('\n'.join(lines).encode()), 'rules.log')}
+    file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+    # A row from before the typed byte columns
+    first_id = db.session.execute(select(db.func.min(LogEntry.id))).scalar()
+    LogEntry.query.filter_by(id=first_id).update({'bytes_sent': None, 'bytes_received': None})
+    db.session.commit()
+    stmt = file_entries(with_features(select(*FEATURE_COLUMNS, *RULE_COLUMNS, *LEGACY_RULE_COLUMNS)), file_id)
+    rows = db.session.execute(stmt.order_by(LogEntry.id)).all()
+    features = FeatureBuilder(len(rows))
+    columns = RuleColumnBuilder(len(rows), len(FEATURE_COLUMNS))
+    columns.add(rows[:features.add(rows)])
+    _, weights = features.finish()
+    values = load_dimension_values(db.session, file_id)
+    found = detect_column_anomalies(columns.finish(values, features), weights)
+
+    stored = db.session.execute(
+        file_entries(select(LogEntry.parsed_data, *DIMENSION_ID_COLUMNS), file_id).order_by(LogEntry.id)
+    ).all()
+    hydrated = [hydrate(row.parsed_data, tuple(row)[1:], values) for row in stored]
+    assert found == detect_security_anomalies(hydrated, hydrated, weights)
+    assert {a['type'] for a in found} >= {'brute_force_403', 'automation_detected', 'suspicious_domain', 'rare_domain'}
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Tests for the batched log ingest path
+"""
+
+import bz2
+import gzip
+import io
+import json
+import pytest
+from extensions import db
+from models import LogFile, LogEntry, AnalysisResult, Domain
+from services.ingest import ingest_file
+from services.parsers import parse_space
+from services.rawlines import read_raw_line
+from services.dimensions import load_dimension_values, hydrate
+from routes.analysis import detect_security_anomalies
+
+SAMPLE_LINES = [
+    "2025-07-09 16:04:55 192.168.1.70 119.68.241.77 stackoverflow.com Allowed POST 301 Mozilla/5.0 1714 2941",
+    "2025-07-09 16:04:50 192.168.1.91 84.97.32.145 github.com Blocked GET 403 Chrome/91.0 74 37",
+    "",
+    "truncated line",
+    "2025-13-09 16:04:45 192.168.1.42 105.93.252.43 github.com Allowed GET 301 Safari/13.1 1346 4524",
+    "2025-07-09 16:04:45 192.168.1.42 105.93.252.43 stackoverflow.com Allowed GET 301 Safari/13.1 1346 4524",
+]
+
+def test_ingest_file_batches_rows(app, tmp_path):
+    """Rows are written across several small batches and malformed lines are counted"""
+    path = tmp_path / 'sample.log'
+    path.write_text('\n'.join(SAMPLE_LINES))
+    stats = ingest_file(str(path), 1, batch_size=2)
+    db.session.commit()
+
+    assert stats['num_logs'] == 3
+    assert stats['parse_errors'] == 2
+    entries = LogEntry.query.order_by(LogEntry.id).all()
+    assert all(e.raw_line is None for e in entries)
+    raw_lines = [read_raw_line(str(path), e.raw_line, e.line_offset, e.line_length) for e in entries]
+    assert raw_lines == [SAMPLE_LINES[0], SAMPLE_LINES[1], SAMPLE_LINES[5]]
+    # Domain, user agent and source IP are interned and stored as ids
+    assert 'domain' not in entries[1].parsed_data
+    values = load_dimension_values(db.session, 1)
+    ids = (entries[1].domain_id, entries[1].user_agent_id, entries[1].src_ip_id)
+    assert hydrate(entries[1].parsed_data, ids, values) == parse_space(SAMPLE_LINES[1])
+    assert entries[1].parsed_data['bytes'] == '74 37'
+    assert entries[2].domain_id != entries[1].domain_id
+    assert entries[0].domain_id == entries[2].domain_id
+
+def test_upload_reports_counts(client):
+    data = {'file': (io.BytesIO('\n'.join(SAMPLE_LINES).encode()), 'sample.log')}
+    res = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data')
+    assert res.status_code == 200
+    body = res.get_json()
+    assert body['num_logs'] == 3
+    assert body['parse_errors'] == 2
+    assert 'logs' not in body
+    assert LogEntry.query.filter_by(logfile_id=body['logfile_id']).count() == 3
+
+def test_preview_pages_by_entry_id(client):
+    data = {'file': (io.BytesIO('\n'.join(SAMPLE_LINES).encode()), 'sample.log')}
+    file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+
+    first = client.get(f'/log-analyzer/api/upload/{file_id}/preview?limit=2').get_json()
+    assert [e['src_ip'] for e in first['entries']] == ['192.168.1.70', '192.168.1.91']
+    assert [e['raw_line'] for e in first['entries']] == SAMPLE_LINES[:2]
+    assert first['next_after_id'] == first['entries'][-1]['id']
+
+    rest = client.get(f"/log-analyzer/api/upload/{file_id}/preview?limit=2&after_id={first['next_after_id']}").get_json()
+    assert [e['src_ip'] for e in rest['entries']] == ['192.168.1.42']
+    assert rest['next_after_id'] is None
+
+def test_preview_limit_is_clamped(client):
+    data = {'file': (io.BytesIO('\n'.join(SAMPLE_LINES).encode()), 'sample.log')}
+    file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+    empty = client.get(f'/log-analyzer/api/upload/{file_id}/preview?limit=0')
+    assert empty.status_code == 200
+    assert len(empty.get_json()['entries']) == 1
+    assert len(client.get(f'/log-analyzer/api/upload/{file_id}/preview?limit=-1').get_json()['entries']) == 1
+
+def test_chunked_upload_resumes_and_parses_incrementally(client):
+    payload = '\n'.join(SAMPLE_LINES).encode()
+    init = client.post('/log-analyzer/api/upload/chunked', json={'filename': 'sample.log'})
+    assert init.status_code == 201
+    upload_id = init.get_json()['upload_id']
+    url = f'/log-analyzer/api/upload/chunked/{upload_id}'
+
+    # First chunk ends mid-line: only the complete first line is ingested
+    res = client.put(f'{url}?offset=0', data=payload[:120]).get_json()
+    assert res['offset'] == 120
+    assert res['num_logs'] == 1
+
+    # A retried or out-of-order chunk is rejected with the offset to resume from
+    stale = client.put(f'{url}?offset=0', data=payload[:120])
+    assert stale.status_code == 409
+    assert stale.get_json()['offset'] == 120
+
+    res = client.put(f'{url}?offset=120', data=payload[120:]).get_json()
+    assert res['num_logs'] == 2
+    assert client.get(url).get_json()['offset'] == len(payload)
+
+    done = client.post(f'{url}/finalize').get_json()
+    assert done['num_logs'] == 3
+    assert done['parse_errors'] == 2
+    preview = client.get(f"/log-analyzer/api/upload/{done['logfile_id']}/preview").get_json()
+    assert [e['raw_line'] for e in preview['entries']] == [SAMPLE_LINES[0], SAMPLE_LINES[1], SAMPLE_LINES[5]]
+
+def test_preview_between_chunks_sees_lines_written_later(client):
+    payload = '\n'.join(SAMPLE_LINES).encode()
+    upload_id = client.post('/log-analyzer/api/upload/chunked', json={'filename': 'grow.log'}).get_json()['upload_id']
+    url = f'/log-analyzer/api/upload/chunked/{upload_id}'
+    file_id = client.put(f'{url}?offset=0', data=payload[:120]).get_json()['logfile_id']
+    # Maps the stored file while it holds only the first chunk
+    first = client.get(f'/log-analyzer/api/upload/{file_id}/preview').get_json()
+    assert [e['raw_line'] for e in first['entries']] == [SAMPLE_LINES[0]]
+    client.put(f'{url}?offset=120', data=payload[120:])
+    client.post(f'{url}/finalize')
+    preview = client.get(f'/log-analyzer/api/upload/{file_id}/preview').get_json()
+    assert [e['raw_line'] for e in preview['entries']] == [SAMPLE_LINES[0], SAMPLE_LINES[1], SAMPLE_LINES[5]]
+
+@pytest.mark.parametrize('compression', ['gzip', 'bz2', 'zstd'])
+def test_upload_decompresses_while_parsing(client, compression):
+    payload = '\n'.join(SAMPLE_LINES).encode()
+    if compression == 'gzip':
+        blob = gzip.compress(payload)
+    elif compression == 'bz2':
+        blob = bz2.compress(payload)
+    else:
+        blob = pytest.importorskip('zstandard').ZstdCompressor().compress(payload)
+    data = {'file': (io.BytesIO(blob), 'sample.log.gz')}
+    body = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()
+    assert body['compression'] == compression
+    assert body['num_logs'] == 3
+    assert body['parse_errors'] == 2
+    # Only the compressed bytes are kept on disk, so entries keep their raw line
+    with open(db.session.get(LogFile, body['logfile_id']).stored_path, 'rb') as f:
+        assert f.read() == blob
+    assert LogEntry.query.filter_by(logfile_id=body['logfile_id']).order_by(LogEntry.id).first().raw_line == SAMPLE_LINES[0]
+
+def test_chunked_compressed_upload_parses_on_finalize(client):
+    blob = gzip.compress('\n'.join(SAMPLE_LINES).encode())
+    upload_id = client.post('/log-analyzer/api/upload/chunked', json={'filename': 'sample.log.gz'}).get_json()['upload_id']
+    url = f'/log-analyzer/api/upload/chunked/{upload_id}'
+    res = client.put(f'{url}?offset=0', data=blob[:30]).get_json()
+    assert res['compression'] == 'gzip'
+    assert res['num_logs'] == 0
+    client.put(f'{url}?offset=30', data=blob[30:])
+    done = client.post(f'{url}/finalize').get_json()
+    assert done['num_logs'] == 3
+    assert done['parse_errors'] == 2
+
+def test_parallel_ingest_matches_serial(app, tmp_path):
+    path = tmp_path / 'big.log'
+    lines = [SAMPLE_LINES[i % 2].replace('16:04:', f'16:{i % 60:02d}:') for i in range(400)]
+    lines[150] = 'truncated line'
+    path.write_text('\n'.join(lines) + '\n')
+
+    serial = ingest_file(str(path), 1)
+    parallel = ingest_file(str(path), 2, workers=3, chunk_bytes=2000)
+    db.session.commit()
+
+    assert parallel['log_format'] == 'space'
+    assert (parallel['num_logs'], parallel['parse_errors']) == (serial['num_logs'], serial['parse_errors']) == (399, 1)
+    columns = (LogEntry.timestamp, LogEntry.parsed_data, LogEntry.line_offset, LogEntry.line_length)
+    rows = lambda file_id: db.session.query(*columns).filter_by(logfile_id=file_id).order_by(LogEntry.id).all()
+    assert rows(1) == rows(2)
+
+def test_duplicate_upload_reuses_entries_and_analysis(client):
+    blob = '\n'.join(SAMPLE_LINES).encode()
+    post = lambda: client.post('/log-analyzer/api/upload', data={'file': (io.BytesIO(blob), 'sample.log')},
+                               content_type='multipart/form-data').get_json()
+    first = post()
+    assert first['duplicate'] is False
+    result = AnalysisResult(file_id=first['logfile_id'], results={'anomalies': []})
+    db.session.add(result)
+    db.session.commit()
+
+    again = post()
+    assert again['duplicate'] is True
+    assert again['logfile_id'] == first['logfile_id']
+    assert again['analysis_id'] == result.id
+    assert again['num_logs'] == 3
+    assert LogFile.query.count() == 1
+    assert LogEntry.query.count() == 3
+
+def test_duplicate_needs_the_same_ingest_options(client):
+    blob = '\n'.join(SAMPLE_LINES).encode()
+    post = lambda **form: client.post('/log-analyzer/api/upload', data=dict(form, file=(io.BytesIO(blob), 'sample.log')),
+                                      content_type='multipart/form-data').get_json()
+    first = post()
+    collapsed = post(collapse_seconds='60')
+    explicit = post(format='space')
+    assert (collapsed['duplicate'], explicit['duplicate']) == (False, False)
+    assert len({first['logfile_id'], collapsed['logfile_id'], explicit['logfile_id']}) == 3
+    assert post(collapse_seconds='60')['logfile_id'] == collapsed['logfile_id']
+
+def test_chunked_duplicate_is_folded_into_original(client):
+    blob = '\n'.join(SAMPLE_LINES).encode()
+    first = client.post('/log-analyzer/api/upload', data={'file': (io.BytesIO(blob), 'sample.log')},
+                        content_type='multipart/form-data').get_json()
+    upload_id = client.post('/log-analyzer/api/upload/chunked', json={'filename': 'copy.log'}).get_json()['upload_id']
+    url = f'/log-analyzer/api/upload/chunked/{upload_id}'
+    client.put(f'{url}?offset=0', data=blob)
+    done = client.post(f'{url}/finalize').get_json()
+    assert done['duplicate'] is True
+    assert done['logfile_id'] == first['logfile_id']
+    assert LogFile.query.count() == 1
+    assert LogEntry.query.count() == 3
+    # Finalize stays idempotent after the upload was folded
+    assert client.post(f'{url}/finalize').get_json()['logfile_id'] == first['logfile_id']
+
+def test_collapse_merges_repeats_within_bucket(app, tmp_path):
+    path = tmp_path / 'noisy.log'
+    repeat = "2025-07-09 16:00:{:02d} 192.168.1.91 84.97.32.145 github.com Blocked GET 403 Chrome/91.0 74 37"
+    other = "2025-07-09 16:00:30 192.168.1.70 119.68.241.77 stackoverflow.com Allowed POST 301 Mozilla/5.0 1714 2941"
+    # Two runs in the first minute around another line, then a repeat in the next minute
+    lines = [repeat.format(s) for s in (5, 10, 20)] + [other] + [repeat.format(s) for s in (40, 50)]
+    lines.append(repeat.format(0).replace('16:00:', '16:01:'))
+    path.write_text('\n'.join(lines) + '\n')
+
+    stats = ingest_file(str(path), 1, collapse_seconds=60)
+    db.session.commit()
+
+    assert (stats['num_logs'], stats['collapsed']) == (3, 4)
+    entries = LogEntry.query.order_by(LogEntry.id).all()
+    assert [e.occurrences for e in entries] == [5, 1, 1]
+    assert entries[0].timestamp.second == 5
+    assert entries[0].last_timestamp.second == 50
+    assert read_raw_line(str(path), None, entries[0].line_offset, entries[0].line_length) == lines[0]
+    assert entries[1].last_timestamp is None
+
+def test_collapsed_counts_weight_security_rules():
+    blocked = parse_space("2025-07-09 16:04:50 10.0.0.9 84.97.32.145 github.com Blocked GET 403 Chrome/91.0 74 37")
+    allowed = parse_space("2025-07-09 16:04:51 10.0.0.9 84.97.32.145 github.com Allowed GET 200 Chrome/91.0 74 37")
+    found = detect_security_anomalies([None, None], [blocked, allowed], weights=[4, 1])
+    brute_force = [a for a in found if a['type'] == 'brute_force_403']
+    assert len(brute_force) == 1
+    assert '4 out of 5 requests' in brute_force[0]['pattern']
+    assert not detect_security_anomalies([None, None], [blocked, allowed])
+
+def test_typed_columns_are_filled_at_ingest(app, tmp_path):
+    path = tmp_path / 'mixed.jsonl'
+    path.write_text(
+        '{"timestamp": "2025-07-09 16:04:50", "src_ip": "2001:DB8::1", "dest_ip": "10.0.0.5", "action": "blocked",'
+        ' "method": "get", "status_code": 403, "bytes_sent": 74, "bytes_received": 37}\n'
+        '{"timestamp": "2025-07-09 16:04:51", "src_ip": "gateway", "dest_ip": "010.0.0.5", "action": "Dropped",'
+        ' "method": "BREW", "status_code": "n/a", "bytes": "5 6"}\n'
+    )
+    ingest_file(str(path), 1)
+    db.session.commit()
+    first, second = LogEntry.query.order_by(LogEntry.id).all()
+    assert (first.status_code, first.bytes_sent, first.bytes_received) == (403, 74, 37)
+    assert (first.action, first.method, first.src_ip, first.dest_ip) == ('Blocked', 'GET', '2001:db8::1', '10.0.0.5')
+    assert (second.status_code, second.bytes_sent, second.bytes_received) == (None, 5, 6)
+    assert (second.action, second.method, second.src_ip, second.dest_ip) == (None, None, None, None)
+    assert LogEntry.query.filter_by(src_ip='2001:db8::1').count() == 1
+
+def test_dimension_ids_from_rolled_back_ingest_are_not_reused(app, tmp_path):
+    path = tmp_path / 'sample.log'
+    path.write_text('\n'.join(SAMPLE_LINES))
+    ingest_file(str(path), 1)
+    db.session.rollback()
+    assert Domain.query.count() == 0
+
+    ingest_file(str(path), 1)
+    db.session.commit()
+    entries = LogEntry.query.all()
+    assert {db.session.get(Domain, e.domain_id).name for e in entries} == {'stackoverflow.com', 'github.com'}
+
+def test_analysis_runs_on_jsonl_with_missing_fields(client):
+    """A record without a status code, or with null fields, is analyzed instead of failing the run"""
+    records = [
+        {'timestamp': f'2025-07-09 16:00:{second:02d}', 'src_ip': f'192.168.1.{second % 4}', 'dest_ip': '93.184.216.34',
+         'domain': 'example.com', 'action': 'Allowed', 'method': 'GET', 'status_code': 200,
+         'user_agent': 'Mozilla/5.0', 'bytes_sent': second, 'bytes_received': 0}
+        for second in range(30)
+    ]
+    del records[0]['status_code']
+    records[1].update(domain=None, user_agent=None, status_code='n/a')
+    records[2]['bytes_sent'] = 90000
+    data = {'file': (io.BytesIO('\n'.join(json.dumps(r) for r in records).encode()), 'sample.jsonl')}
+    body = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()
+    assert body['num_logs'] == 30
+    res = client.post('/log-analyzer/api/analysis/run', json={'file_id': body['logfile_id'], 'use_llm': False})
+    assert res.status_code == 200
+
+def test_jsonl_timestamps_that_are_not_strings_are_skipped(client):
+    records = [
+        {'timestamp': '2025-07-09 16:04:50', 'src_ip': '10.0.0.1', 'status_code': 200, 'bytes_sent': 1},
+        {'timestamp': 1752077090, 'src_ip': '10.0.0.2', 'status_code': 200, 'bytes_sent': 2},
+        {'timestamp': None, 'src_ip': '10.0.0.3', 'status_code': 200, 'bytes_sent': 3},
+    ]
+    data = {'file': (io.BytesIO('\n'.join(json.dumps(r) for r in records).encode()), 'times.jsonl')}
+    res = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data')
+    assert res.status_code == 200
+    assert (res.get_json()['num_logs'], res.get_json()['parse_errors']) == (1, 2)
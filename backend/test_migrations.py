@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Tests for the migration chain: schema parity with the models and data backfills
+"""
+
+import json
+import os
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import upgrade, downgrade
+from sqlalchemy import text
+from app import create_app
+from extensions import db
+from models import LogEntry, Anomaly, AnalysisResult
+from services.dimensions import load_dimension_values, hydrate
+from services.search import include_object
+
+def test_migrations_match_models(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'migrated.db'}"})
+    with app.app_context():
+        upgrade(directory=os.path.join(os.path.dirname(__file__), 'migrations'))
+        with db.engine.connect() as conn:
+            diff = compare_metadata(MigrationContext.configure(conn, opts={'include_object': include_object}), db.metadata)
+        assert diff == []
+
+LEGACY_ROWS = [
+    {'src_ip': '192.168.1.91', 'dest_ip': '2001:db8::1', 'action': 'blocked', 'method': 'GET',
+     'status_code': '403', 'bytes': '74 37', 'domain': 'github.com', 'user_agent': 'Chrome/91.0'},
+    {'src_ip': 'gateway', 'dest_ip': '', 'action': 'Dropped', 'method': 'BREW',
+     'status_code': '-', 'bytes_sent': 5, 'bytes_received': 6, 'domain': 'github.com', 'user_agent': 'x' * 600},
+]
+
+def seed_legacy_entries(app, directory, revision):
+    """Migrate to revision and insert LEGACY_ROWS as entries with only parsed_data filled in"""
+    upgrade(directory=directory, revision=revision)
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO user (id, username, password_hash) VALUES (1, 'admin', 'x')"))
+        conn.execute(text("INSERT INTO log_file (id, filename, user_id) VALUES (1, 'old.log', 1)"))
+        for i, data in enumerate(LEGACY_ROWS, 1):
+            conn.execute(text("INSERT INTO log_entry (id, logfile_id, timestamp, parsed_data, occurrences) "
+                              "VALUES (:id, 1, '2025-07-09 16:04:50', :data, 1)"), {'id': i, 'data': json.dumps(data)})
+
+def test_typed_columns_are_backfilled(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'backfill.db'}"})
+    directory = os.path.join(os.path.dirname(__file__), 'migrations')
+    with app.app_context():
+        seed_legacy_entries(app, directory, '0005')
+        upgrade(directory=directory)
+        first, second = LogEntry.query.order_by(LogEntry.id).all()
+        assert (first.status_code, first.bytes_sent, first.bytes_received) == (403, 74, 37)
+        assert (first.action, first.method, first.src_ip, first.dest_ip) == ('Blocked', 'GET', '192.168.1.91', '2001:db8::1')
+        assert (second.status_code, second.bytes_sent, second.bytes_received) == (None, 5, 6)
+        assert (second.action, second.method, second.src_ip, second.dest_ip) == (None, None, None, None)
+
+def test_dimension_backfill_round_trips(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'dimensions.db'}"})
+    directory = os.path.join(os.path.dirname(__file__), 'migrations')
+    with app.app_context():
+        seed_legacy_entries(app, directory, '0006')
+        upgrade(directory=directory, revision='0007')
+        # Only the columns that exist at this revision
+        first, second = db.session.query(LogEntry.parsed_data, LogEntry.domain_id, LogEntry.user_agent_id,
+                                         LogEntry.src_ip_id).order_by(LogEntry.id).all()
+        assert first.domain_id == second.domain_id is not None
+        assert 'domain' not in first.parsed_data
+        # Too long for the dimension table, so it stays inline
+        assert second.user_agent_id is None
+        assert second.parsed_data['user_agent'] == 'x' * 600
+        values = load_dimension_values(db.session, 1)
+        assert [hydrate(e.parsed_data, (e.domain_id, e.user_agent_id, e.src_ip_id), values) for e in (first, second)] == LEGACY_ROWS
+        db.session.rollback()
+
+        downgrade(directory=directory, revision='0006')
+        with db.engine.connect() as conn:
+            stored = [json.loads(row[0]) for row in conn.execute(text("SELECT parsed_data FROM log_entry ORDER BY id"))]
+        assert stored == LEGACY_ROWS
+
+def test_anomaly_documents_move_into_rows(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'anomalies.db'}"})
+    directory = os.path.join(os.path.dirname(__file__), 'migrations')
+    documents = [
+        {'id': 1, 'src_ip': '192.168.1.91', 'domain': 'github.com', 'iso_forest': 0, 'lof': 1, 'confidence_score': 0.7,
+         'severity': 'medium', 'threat_category': 'Unusual Pattern', 'security_anomalies': [],
+         'reasoning': {'lof': {'reasons': ['Rare user agent']}}, 'anomaly_summary': {'detection_methods': ['ml']}},
+        {'id': 2, 'src_ip': 'gateway', 'domain': 'github.com', 'iso_forest': 0, 'lof': 0, 'confidence_score': 0.9,
+         'severity': 'high', 'threat_category': 'Brute Force',
+         'security_anomalies': [{'type': 'brute_force_403', 'explanation': 'Many 403s'}],
+         'anomaly_summary': {'detection_methods': ['brute_force_403']}},
+    ]
+    legacy = {'file_id': 1, 'num_entries': 2, 'num_anomalies': 2, 'anomalies': documents}
+    with app.app_context():
+        seed_legacy_entries(app, directory, '0008')
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO analysis_result (id, file_id, results) VALUES (1, 1, :results)"),
+                         {'results': json.dumps(legacy)})
+        upgrade(directory=directory, revision='0009')
+        rows = db.session.query(Anomaly.logentry_id, Anomaly.type, Anomaly.reason, Anomaly.severity, Anomaly.category,
+                                Anomaly.src_ip, Anomaly.explanation, Anomaly.details).order_by(Anomaly.id).all()
+        assert [(a.logentry_id, a.type, a.reason, a.severity, a.category, a.src_ip) for a in rows] == [
+            (1, 'ml', 'ml', 'medium', 'Unusual Pattern', '192.168.1.91'),
+            (2, 'brute_force_403', 'brute_force_403', 'high', 'Brute Force', 'gateway'),
+        ]
+        assert [a.explanation for a in rows] == ['Rare user agent', 'Many 403s']
+        assert [a.details for a in rows] == documents
+        assert 'anomalies' not in db.session.get(AnalysisResult, 1).results
+        db.session.rollback()
+
+        downgrade(directory=directory, revision='0008')
+        with db.engine.connect() as conn:
+            assert json.loads(conn.execute(text("SELECT results FROM analysis_result")).scalar()) == legacy
+            assert conn.execute(text("SELECT count(*) FROM anomaly")).scalar() == 0
+
+def test_periods_are_backfilled_from_upload_month(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'periods.db'}"})
+    directory = os.path.join(os.path.dirname(__file__), 'migrations')
+    with app.app_context():
+        seed_legacy_entries(app, directory, '0009')
+        with db.engine.begin() as conn:
+            conn.execute(text("UPDATE log_file SET upload_time = '2025-03-04 10:00:00'"))
+        upgrade(directory=directory)
+        assert [e.period for e in LogEntry.query.order_by(LogEntry.id)] == [202503, 202503]
+        db.session.rollback()
+
+        # The anomaly -> log_entry foreign key is restored on the way down
+        downgrade(directory=directory, revision='0009')
+        with db.engine.connect() as conn:
+            columns = [row[1] for row in conn.execute(text("PRAGMA table_info(log_entry)"))]
+            foreign_keys = [row[2] for row in conn.execute(text("PRAGMA foreign_key_list(anomaly)"))]
+        assert 'period' not in columns
+        assert sorted(foreign_keys) == ['analysis_result', 'log_entry']
+
+def test_result_documents_are_compressed(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'documents.db'}"})
+    directory = os.path.join(os.path.dirname(__file__), 'migrations')
+    summary = {'file_id': 1, 'num_entries': 2, 'summary_report': 'Nothing unusual'}
+    document = {'id': 1, 'explanation': 'Rare user agent', 'feature_importance': [0.5, 0.25]}
+    with app.app_context():
+        upgrade(directory=directory, revision='0011')
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO user (id, username, password_hash) VALUES (1, 'admin', 'x')"))
+            conn.execute(text("INSERT INTO log_file (id, filename, user_id) VALUES (1, 'old.log', 1)"))
+            conn.execute(text("INSERT INTO analysis_result (id, file_id, results) VALUES (1, 1, :results)"),
+                         {'results': json.dumps(summary)})
+            conn.execute(text("INSERT INTO anomaly (id, analysis_id, logentry_id, period, type, reason, severity, category, "
+                              "confidence, iso_forest, lof, details) "
+                              "VALUES (1, 1, 1, 202507, 'ml', 'ml', 'low', 'Other', 0.7, 0, 1, :details)"),
+                         {'details': json.dumps(document)})
+        upgrade(directory=directory)
+        with db.engine.connect() as conn:
+            stored = conn.execute(text("SELECT details FROM anomaly")).scalar()
+        assert stored[:4] == b'\x28\xb5\x2f\xfd'
+        assert db.session.get(AnalysisResult, 1).results == summary
+        assert db.session.get(Anomaly, 1).details == document
+        db.session.rollback()
+
+        downgrade(directory=directory, revision='0011')
+        with db.engine.connect() as conn:
+            assert json.loads(conn.execute(text("SELECT results FROM analysis_result")).scalar()) == summary
+            assert json.loads(conn.execute(text("SELECT details FROM anomaly")).scalar()) == document
+
+def test_existing_entries_are_indexed_for_search(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'search.db'}"})
+    directory = os.path.join(os.path.dirname(__file__), 'migrations')
+    with app.app_context():
+        upgrade(directory=directory, revision='0012')
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO user (id, username, password_hash) VALUES (1, 'admin', 'x')"))
+            conn.execute(text("INSERT INTO log_file (id, filename, user_id) VALUES (1, 'old.log', 1)"))
+            conn.execute(text("INSERT INTO domain (id, name) VALUES (1, 'g00gle-login.xyz')"))
+            conn.execute(text("INSERT INTO log_entry (id, logfile_id, period, timestamp, parsed_data, occurrences, domain_id) "
+                              "VALUES (7, 1, 202507, '2025-07-09 16:04:50', :data, 1, 1)"),
+                         {'data': json.dumps({'src_ip': '10.0.0.66', 'method': 'POST'})})
+        upgrade(directory=directory)
+        with db.engine.connect() as conn:
+            assert conn.execute(text("SELECT rowid, logfile_id FROM entry_search WHERE entry_search MATCH '\"G00GLE\"'")).all() == [(7, 1)]
+            assert conn.execute(text("SELECT line FROM entry_search")).scalar() == '10.0.0.66 POST g00gle-login.xyz'
+
+        downgrade(directory=directory, revision='0012')
+        with db.engine.connect() as conn:
+            assert conn.execute(text("SELECT count(*) FROM sqlite_master WHERE name LIKE 'entry_search%'")).scalar() == 0
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the registered log format parsers
+"""
+
+import json
+from services.parsers import PARSERS, detect_format, parse_space, parse_combined, parse_jsonl, parse_csv
+
+EXPECTED = {
+    'timestamp': '2025-07-09 16:04:50',
+    'src_ip': '192.168.1.91',
+    'dest_ip': '84.97.32.145',
+    'domain': 'github.com',
+    'action': 'Blocked',
+    'method': 'GET',
+    'status_code': '403',
+    'user_agent': 'Chrome/91.0',
+    'bytes': '74 37',
+    'bytes_sent': 74,
+    'bytes_received': 37,
+}
+
+def test_space_format_matches_legacy_fields():
+    line = "2025-07-09 16:04:50 192.168.1.91 84.97.32.145 github.com Blocked GET 403 Chrome/91.0 74 37"
+    assert parse_space(line) == EXPECTED
+
+def test_space_format_user_agent_with_spaces():
+    line = ("2025-07-09 16:04:50 192.168.1.91 84.97.32.145 github.com Allowed GET 200 "
+            "Mozilla/5.0 (X11; Linux x86_64) Firefox/118.0 1200 5400")
+    entry = parse_space(line)
+    assert entry['user_agent'] == 'Mozilla/5.0 (X11; Linux x86_64) Firefox/118.0'
+    assert (entry['bytes_sent'], entry['bytes_received']) == (1200, 5400)
+
+def test_space_format_rejects_malformed():
+    assert parse_space("truncated line") is None
+    assert parse_space("2025-07-09 16:04:50 a b c d e f g x y") is None
+
+def test_jsonl_and_csv_round_trip():
+    assert parse_jsonl(json.dumps(EXPECTED)) == EXPECTED
+    legacy = {k: v for k, v in EXPECTED.items() if k not in ('bytes_sent', 'bytes_received')}
+    assert parse_jsonl(json.dumps(legacy)) == EXPECTED
+    line = '2025-07-09 16:04:50,192.168.1.91,84.97.32.145,github.com,Blocked,GET,403,Chrome/91.0,74,37'
+    assert parse_csv(line) == EXPECTED
+    assert parse_csv('timestamp,src_ip,dest_ip,domain,action,method,status_code,user_agent,bytes_sent,bytes_received') is None
+
+def test_combined_format():
+    line = ('203.0.113.9 - - [09/Jul/2025:18:04:50 +0200] "GET http://github.com/login HTTP/1.1" 403 512 '
+            '"-" "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"')
+    entry = parse_combined(line)
+    assert entry['timestamp'] == '2025-07-09 16:04:50'
+    assert entry['domain'] == 'github.com'
+    assert entry['action'] == 'Blocked'
+    assert entry['status_code'] == '403'
+    assert entry['user_agent'] == 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
+    assert (entry['bytes_sent'], entry['bytes_received']) == (0, 512)
+
+def test_detect_format():
+    assert detect_format("2025-07-09 16:04:50 192.168.1.91 84.97.32.145 github.com Blocked GET 403 Chrome/91.0 74 37") == 'space'
+    assert detect_format('10.0.0.1 - - [09/Jul/2025:16:04:50 +0000] "GET / HTTP/1.1" 200 -') == 'combined'
+    assert detect_format(json.dumps(EXPECTED)) == 'jsonl'
+    assert detect_format('2025-07-09 16:04:50,1,2,d,Allowed,GET,200,ua,1,2') == 'csv'
+    assert detect_format('not a log line') is None
+    assert set(PARSERS) == {'space', 'combined', 'jsonl', 'csv'}
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for upload-month periods and partition-drop retention
+"""
+
+import io
+import os
+from datetime import datetime
+from extensions import db
+from models import LogFile, LogEntry, Anomaly, AnalysisResult
+from services.partitions import prune_before, retention_cutoff
+
+LINES = [
+    f"2025-07-09 16:00:{second:02d} 192.168.1.{second % 4} 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 {second} 0"
+    for second in range(30)
+] + ["2025-07-09 16:01:00 10.0.0.66 93.184.216.34 g00gle-login.xyz Blocked POST 403 curl/7.68.0 90000 3"]
+
+def upload(client, name, lines):
+    data = {'file': (io.BytesIO('\n'.join(lines).encode()), name)}
+    file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+    client.post('/log-analyzer/api/analysis/run', json={'file_id': file_id, 'use_llm': False})
+    return file_id
+
+def test_retention_cutoff_counts_whole_months():
+    assert retention_cutoff(datetime(2026, 10, 17), 1) == 202610
+    assert retention_cutoff(datetime(2026, 10, 17), 3) == 202608
+    assert retention_cutoff(datetime(2026, 2, 1), 3) == 202512
+    assert retention_cutoff(datetime(2026, 1, 31), 13) == 202501
+
+def test_prune_removes_files_uploaded_before_cutoff(client):
+    old_id = upload(client, 'old.log', LINES)
+    # An extra line so the second upload is not a duplicate of the first
+    new_id = upload(client, 'new.log', LINES + LINES[:1])
+    old = db.session.get(LogFile, old_id)
+    old.upload_time = datetime(2025, 1, 15)
+    old_path = old.stored_path
+    db.session.commit()
+    # Move the already ingested rows of the old file into its upload month
+    LogEntry.query.filter_by(logfile_id=old_id).update({'period': 202501})
+    Anomaly.query.filter(Anomaly.analysis_id.in_(
+        db.session.query(AnalysisResult.id).filter_by(file_id=old_id))).update({'period': 202501}, synchronize_session=False)
+    db.session.commit()
+    # Entries carry the upload month of their file
+    assert {e.period for e in LogEntry.query.filter_by(logfile_id=new_id)} == {datetime.utcnow().year * 100 + datetime.utcnow().month}
+
+    summary = prune_before(db.session, 202502)
+    db.session.commit()
+    assert (summary['files'], summary['digests_expired']) == (1, 0)
+    assert summary['stored_paths'] == [old_path]
+    assert os.path.exists(old_path)  # Removed by the caller once the rows are committed away
+    assert db.session.get(LogFile, old_id) is None
+    assert LogEntry.query.filter_by(logfile_id=old_id).count() == 0
+    assert AnalysisResult.query.filter_by(file_id=old_id).count() == 0
+    assert Anomaly.query.filter_by(period=202501).count() == 0
+
+    assert LogEntry.query.filter_by(logfile_id=new_id).count() == len(LINES) + 1
+    assert Anomaly.query.count() > 0
+    assert client.get(f'/log-analyzer/api/analysis/dashboard/{new_id}').status_code == 200
+
+    # The pruned content is no longer a known upload
+    data = {'file': (io.BytesIO('\n'.join(LINES).encode()), 'old-again.log')}
+    again = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()
+    assert not again.get('duplicate')
+    assert again['logfile_id'] not in (old_id, new_id)
+    assert LogEntry.query.filter_by(logfile_id=again['logfile_id']).count() == len(LINES)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the indexed entry and anomaly queries, the time-ordered entries endpoint and anomaly filters
+"""
+
+import io
+from datetime import datetime
+from sqlalchemy import event
+from extensions import db
+from models import LogEntry, Anomaly, AnalysisResult
+from services.queries import entries_by_id, entries_by_time, explain, uses_full_scan
+
+LINES = [
+    f"2025-07-09 16:0{minute}:00 192.168.1.{minute} 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 {minute} 0"
+    for minute in (5, 1, 3, 2, 4, 1)
+]
+
+def test_entry_queries_use_file_indexes(app):
+    queries = [
+        entries_by_id(1, 20, after_id=10),
+        entries_by_time(1, 20),
+        entries_by_time(1, 20, start=datetime(2025, 7, 9), end=datetime(2025, 7, 10),
+                        after=(datetime(2025, 7, 9, 12), 10)),
+        LogEntry.query.filter_by(logfile_id=1).statement,
+    ]
+    for query in queries:
+        plan = explain(db.session, query)
+        assert not uses_full_scan(plan), plan
+        assert any('ix_log_entry_logfile' in line for line in plan), plan
+
+def test_anomaly_filters_use_analysis_indexes(app):
+    scoped = Anomaly.query.filter(Anomaly.analysis_id == 1)
+    for column in (Anomaly.severity, Anomaly.category, Anomaly.type, Anomaly.src_ip):
+        plan = explain(db.session, scoped.filter(column == 'x').statement)
+        assert any('ix_anomaly_analysis' in line for line in plan), plan
+
+def test_entries_endpoint_pages_in_time_order(client):
+    data = {'file': (io.BytesIO('\n'.join(LINES).encode()), 'timed.log')}
+    file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+    url = f'/log-analyzer/api/upload/{file_id}/entries'
+
+    seen = []
+    params = {'limit': 2, 'start': '2025-07-09T16:01:00', 'end': '2025-07-09 16:05:00'}
+    while True:
+        page = client.get(url, query_string=params).get_json()
+        seen += [(e['timestamp'], e['src_ip']) for e in page['entries']]
+        if not page['next']:
+            break
+        params.update(page['next'])
+    # Both 16:01 entries are kept, ordered by id, and 16:05 is excluded by end
+    assert seen == [
+        ('2025-07-09 16:01:00', '192.168.1.1'), ('2025-07-09 16:01:00', '192.168.1.1'),
+        ('2025-07-09 16:02:00', '192.168.1.2'), ('2025-07-09 16:03:00', '192.168.1.3'),
+        ('2025-07-09 16:04:00', '192.168.1.4'),
+    ]
+    # Out-of-range limits are clamped to a page of 1..MAX_PREVIEW_LIMIT
+    for limit in (0, -1):
+        page = client.get(url, query_string={'limit': limit})
+        assert page.status_code == 200
+        assert len(page.get_json()['entries']) == 1
+    assert client.get(url, query_string={'start': 'yesterday'}).status_code == 400
+    assert client.get(url, query_string={'after_timestamp': '2025-07-09 16:01:00'}).status_code == 400
+
+def test_anomalies_are_stored_as_filterable_rows(client):
+    lines = [
+        f"2025-07-09 16:{i // 60:02d}:{i % 60:02d} 192.168.1.{i % 9} 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 {100 + i % 7} 40"
+        for i in range(60)
+    ] + [
+        f"2025-07-10 09:00:0{i} 10.0.0.66 93.184.216.34 g00gle-login.xyz Blocked POST 403 curl/7.68.0 90000 3" for i in range(3)
+    ]
+    data = {'file': (io.BytesIO('\n'.join(lines).encode()), 'mixed.log')}
+    file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+    run = client.post('/log-analyzer/api/analysis/run', json={'file_id': file_id, 'use_llm': False}).get_json()
+    assert run['num_anomalies'] == len(run['anomalies']) == Anomaly.query.count()
+    assert 'anomalies' not in db.session.get(AnalysisResult, 1).results
+
+    url = f'/log-analyzer/api/analysis/result/{file_id}'
+    assert client.get(url).get_json() == dict(run, next_after_id=None)
+    high = client.get(url, query_string={'severity': 'high', 'src_ip': '10.0.0.66'}).get_json()['anomalies']
+    assert high and all(a['severity'] == 'high' and a['src_ip'] == '10.0.0.66' for a in high)
+    assert len(high) == Anomaly.query.filter_by(severity='high', src_ip='10.0.0.66').count()
+
+    pages, params = [], {'limit': 2}
+    while True:
+        page = client.get(url, query_string=params).get_json()
+        pages += page['anomalies']
+        if not page['next_after_id']:
+            break
+        params['after_id'] = page['next_after_id']
+    assert pages == run['anomalies']
+    for limit in (0, -1):
+        page = client.get(url, query_string={'limit': limit}).get_json()
+        assert page['anomalies'] == run['anomalies'][:1]
+
+    dashboard = client.get(f'/log-analyzer/api/analysis/dashboard/{file_id}', query_string={'category': 'Brute Force'}).get_json()
+    assert dashboard['total_anomalies'] == sum(dashboard['anomalies_by_severity'].values()) == run['num_anomalies']
+    assert sum(1 for point in dashboard['timeline_data'] if point['is_anomaly']) == run['num_anomalies']
+    assert dashboard['anomalies'] and all(a['threat_category'] == 'Brute Force' for a in dashboard['anomalies'])
+
+def test_analysis_streams_columns_without_loading_entries(client):
+    lines = [
+        f"2025-07-09 16:{i // 60:02d}:{i % 60:02d} 192.168.1.{i % 9} 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 {100 + i % 7} 40"
+        for i in range(40)
+    ] + ["2025-07-10 09:00:00 10.0.0.66 93.184.216.34 g00gle-login.xyz Blocked POST 403 curl/7.68.0 90000 3"]
+    data = {'file': (io.BytesIO('\n'.join(lines).encode()), 'streamed.log')}
+    file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+    loaded = []
+    def record(target, context):
+        loaded.append(target)
+    event.listen(LogEntry, 'load', record)
+    try:
+        run = client.post('/log-analyzer/api/analysis/run', json={'file_id': file_id, 'use_llm': False}).get_json()
+        dashboard = client.get(f'/log-analyzer/api/analysis/dashboard/{file_id}').get_json()
+    finally:
+        event.remove(LogEntry, 'load', record)
+    assert loaded == []
+    assert run['num_entries'] == len(dashboard['timeline_data']) == len(lines)
+    assert dashboard['blocked_vs_allowed'] == {'Blocked': 1, 'Allowed': 40, 'Other': 0}
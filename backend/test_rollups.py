@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for compacting aged log entries into hourly rollups
+"""
+
+import io
+from datetime import datetime
+from extensions import db
+from models import LogFile, LogEntry, EntryRollup, Anomaly
+from services.rollups import compact_file, compaction_cutoff, files_to_compact, file_rollups
+
+LINES = [
+    "2025-07-09 16:05:00 192.168.1.7 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 100 10",
+    "2025-07-09 16:20:00 192.168.1.7 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 300 30",
+    "2025-07-09 16:40:00 192.168.1.7 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 300 30",
+    "2025-07-09 16:50:00 192.168.1.8 93.184.216.34 bad.xyz Blocked POST 403 curl/7.68.0 5 0",
+    "2025-07-09 17:10:00 192.168.1.7 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 50 5",
+] + [
+    # Enough raw entries after the cutoff for the models to fit
+    f"2025-07-09 17:30:{i:02d} 192.168.1.9 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 {i} 0" for i in range(30)
+]
+
+def test_compaction_cutoff_is_on_the_hour():
+    assert compaction_cutoff(datetime(2026, 10, 17, 9, 41, 5), 30) == datetime(2026, 9, 17, 9, 0)
+
+def test_aged_entries_roll_up_by_hour(client):
+    data = {'file': (io.BytesIO('\n'.join(LINES).encode()), 'rollup.log'), 'collapse_seconds': '3600'}
+    file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+    # The two identical 300-byte lines are one collapsed entry
+    assert LogEntry.query.count() == 34
+    client.post('/log-analyzer/api/analysis/run', json={'file_id': file_id, 'use_llm': False})
+    url = f'/log-analyzer/api/analysis/dashboard/{file_id}'
+    before = client.get(url).get_json()
+
+    cutoff = datetime(2025, 7, 9, 17)
+    # Files are only compacted once their upload is older than the cutoff too
+    assert files_to_compact(db.session, cutoff) == []
+    logfile = db.session.get(LogFile, file_id)
+    logfile.upload_time = datetime(2025, 7, 1)
+    # Rows live in the partition of their file's upload month
+    LogEntry.query.filter_by(logfile_id=file_id).update({'period': logfile.period})
+    Anomaly.query.update({'period': logfile.period})
+    db.session.commit()
+    assert files_to_compact(db.session, cutoff) == [file_id]
+    flagged = Anomaly.query.join(LogEntry, LogEntry.id == Anomaly.logentry_id).filter(LogEntry.timestamp < cutoff).count()
+    assert flagged
+    assert compact_file(db.session, logfile, cutoff) == 3
+    db.session.commit()
+
+    assert LogEntry.query.count() == 31
+    # Anomalies of the compacted entries stay, no longer pointing at a deleted row
+    assert Anomaly.query.filter(Anomaly.logentry_id.is_(None)).count() == flagged
+    assert Anomaly.query.outerjoin(LogEntry, LogEntry.id == Anomaly.logentry_id) \
+        .filter(Anomaly.logentry_id.isnot(None), LogEntry.id.is_(None)).count() == 0
+    assert LogEntry.query.filter(LogEntry.timestamp < cutoff).count() == 0
+    rollups = {r['src_ip']: r for r in file_rollups(db.session, file_id)}
+    assert rollups['192.168.1.7']['hour'] == datetime(2025, 7, 9, 16)
+    assert (rollups['192.168.1.7']['count'], rollups['192.168.1.7']['bytes_sent'], rollups['192.168.1.7']['bytes_sent_max']) == (3, 700, 300)
+    assert (rollups['192.168.1.7']['domain'], rollups['192.168.1.7']['action'], rollups['192.168.1.7']['status_code']) == ('example.com', 'Allowed', 200)
+    assert (rollups['192.168.1.8']['count'], rollups['192.168.1.8']['bytes_received'], rollups['192.168.1.8']['action']) == (1, 0, 'Blocked')
+
+    # A later compaction of the same hour is merged on read
+    db.session.add(EntryRollup(logfile_id=file_id, hour=datetime(2025, 7, 9, 16), src_ip_id=rollups['192.168.1.7']['src_ip_id'],
+                               domain_id=rollups['192.168.1.7']['domain_id'], status_code=200, action='Allowed',
+                               count=2, bytes_sent=20, bytes_sent_max=10))
+    db.session.commit()
+    merged = {r['src_ip']: r for r in file_rollups(db.session, file_id)}['192.168.1.7']
+    assert (merged['count'], merged['bytes_sent'], merged['bytes_sent_max']) == (5, 720, 300)
+
+    after = client.get(url).get_json()
+    assert before['blocked_vs_allowed'] == {'Blocked': 1, 'Allowed': 34, 'Other': 0}
+    assert after['blocked_vs_allowed'] == {'Blocked': 1, 'Allowed': 36, 'Other': 0}
+    points = [(p['timestamp'], p['occurrences'], p.get('rollup', False)) for p in after['timeline_data']]
+    assert sorted(points[:2]) == [('2025-07-09 16:00:00', 1, True), ('2025-07-09 16:00:00', 5, True)]
+    assert points[2] == ('2025-07-09 17:10:00', 1, False)
+    assert len(points) == 33
+    assert after['total_anomalies'] == before['total_anomalies']
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled user-agent and domain rules and the stored domain verdicts
+"""
+
+import io
+import random
+from extensions import db
+from models import DomainVerdict
+from services import verdicts as verdicts_module
+from services.rules import (AUTOMATION_INDICATORS, RULES_VERSION, SUSPICIOUS_PATTERNS, SUSPICIOUS_TLDS,
+                            SubstringMatcher, automation_indicator, is_suspicious_domain)
+from services.typosquat import HOMOGLYPHS, WORD_SEPARATORS, TyposquatIndex, brand_distance, brand_index
+from services.verdicts import lookup_domain_verdicts, save_domain_verdicts
+
+def naive_automation_indicator(user_agent):
+    user_agent = user_agent.lower()
+    return next((indicator for indicator in AUTOMATION_INDICATORS if indicator in user_agent), None)
+
+def naive_brand_match(index, word):
+    """The index lookup done by comparing the word with every brand"""
+    if word in index.brands:
+        return None
+    normalized = word.translate(HOMOGLYPHS)
+    matches = [(brand_distance(normalized, brand), rank, brand) for rank, brand in enumerate(index.brands)]
+    matches = [match for match in matches if match[0] is not None]
+    return min(matches)[2] if matches else None
+
+def naive_is_suspicious_domain(domain):
+    domain_lower = domain.lower()
+    for tld in SUSPICIOUS_TLDS:
+        if domain_lower.endswith(tld):
+            return True, f"Suspicious TLD: {tld}"
+    for legitimate, variations in SUSPICIOUS_PATTERNS:
+        if legitimate in domain_lower:
+            for variation in variations:
+                if variation in domain_lower:
+                    return True, f"Typosquatting: {legitimate} → {variation}"
+    for word in WORD_SEPARATORS.split(domain_lower):
+        brand = naive_brand_match(brand_index, word)
+        if brand:
+            return True, f"Typosquatting: {brand} → {word}"
+    if domain_lower.count('.') > 2:
+        return True, "Excessive subdomains"
+    if len(domain) > 20 and sum(c.isdigit() for c in domain) > len(domain) * 0.3:
+        return True, "Random-looking domain with many numbers"
+    return False, ""
+
+def test_matcher_reports_needles_hidden_inside_longer_ones():
+    matcher = SubstringMatcher(['paypal', 'paypall', 'ayp', 'bot'])
+    assert matcher.found('my-paypall-robot') == {'paypal', 'paypall', 'ayp', 'bot'}
+    assert matcher.found('nothing here') == set()
+
+def test_rules_match_the_substring_loops():
+    # Indicator order wins over position in the string
+    assert automation_indicator('RoBot/1.0 curl') == 'curl'
+    assert is_suspicious_domain('paypall-login.com') == (True, "Typosquatting: paypal → paypall")
+    assert is_suspicious_domain('google.g00gle.com') == (True, "Typosquatting: google → g00gle")
+    assert is_suspicious_domain('secure.xyz') == (True, "Suspicious TLD: .xyz")
+    rng = random.Random(7)
+    fragments = AUTOMATION_INDICATORS + SUSPICIOUS_TLDS + ['google', 'g00gle', 'paypal', 'paypall', 'PayPa1', 'app1e',
+                                                            'apple', '.', '-', '7', '12345', 'Mozilla/5.0', 'x', 'com']
+    for _ in range(1500):
+        text = ''.join(rng.choice(fragments) for _ in range(rng.randint(0, 6)))
+        assert automation_indicator(text) == naive_automation_indicator(text), text
+        assert is_suspicious_domain(text) == naive_is_suspicious_domain(text), text
+    assert is_suspicious_domain.cache_info().hits
+
+def test_domain_verdicts_are_stored_per_rule_set(app, monkeypatch):
+    verdicts, rows = lookup_domain_verdicts(db.session, ['g00gle.com', 'example.com', 'example.com'])
+    assert verdicts == {'g00gle.com': is_suspicious_domain('g00gle.com'), 'example.com': (False, '')}
+    save_domain_verdicts(db.session, rows)
+    db.session.commit()
+    classified = []
+    monkeypatch.setattr(verdicts_module, 'is_suspicious_domain', lambda domain: classified.append(domain) or (True, 'x'))
+    # Known domains are read back; only new ones are classified
+    verdicts, rows = lookup_domain_verdicts(db.session, ['g00gle.com', 'example.com', 'new.top'])
+    assert classified == ['new.top'] and verdicts['example.com'] == (False, '')
+    # A new rule set classifies every domain again and replaces the stored verdicts
+    monkeypatch.setattr(verdicts_module, 'RULES_VERSION', 'next')
+    verdicts, rows = lookup_domain_verdicts(db.session, ['example.com'])
+    save_domain_verdicts(db.session, rows)
+    db.session.commit()
+    assert verdicts == {'example.com': (True, 'x')}
+    assert [(v.domain, v.rules_version) for v in DomainVerdict.query.order_by(DomainVerdict.domain)] == [
+        ('example.com', 'next'), ('g00gle.com', RULES_VERSION)]
+
+def test_analysis_stores_the_verdicts_of_its_domains(client):
+    lines = [
+        f"2025-07-09 16:00:{i:02d} 192.168.1.{i % 5} 93.184.216.34 {'g00gle-login.xyz' if i % 7 == 0 else 'example.com'} "
+        f"Allowed GET 200 Mozilla/5.0 {100 + i} 40"
+        for i in range(30)
+    ]
+    data = {'file': (io.BytesIO('\n'.join(lines).encode()), 'verdicts.log')}
+    file_id = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+    client.post('/log-analyzer/api/analysis/run', json={'file_id': file_id, 'use_llm': False})
+    stored = {v.domain: (v.suspicious, v.reason) for v in DomainVerdict.query}
+    assert stored == {'example.com': (False, ''), 'g00gle-login.xyz': (True, 'Suspicious TLD: .xyz')}
+
+def test_brand_index_finds_near_misses_of_brands():
+    assert brand_index.find('g00gle-login.com') == ('google', 'g00gle')
+    assert brand_index.find('secure.paypa1.net') == ('paypal', 'paypa1')
+    assert brand_index.find('linkedln.com') == ('linkedin', 'linkedln')
+    assert brand_index.find('gihtub.io') == ('github', 'gihtub')
+    assert brand_index.find('netfl1x.com') == ('netflix', 'netfl1x')
+    assert brand_index.find('login-stackoverfl0w.com') == ('stackoverflow', 'stackoverfl0w')
+    assert brand_index.find('rnicrosoft.com') == ('microsoft', 'rnicrosoft')
+    # The brands themselves, short words and unrelated names are left alone
+    for domain in ('google.com', 'mail.google.com', 'example.com', 'apples.com', 'github.io', 'my-blog.net',
+                   'finance.yahoo.com', 'm.mobile.de', 'trade.gov', 'modern.example.com', 'dockers.com',
+                   'toyotas.example.org', 'domino.io', 'githbu.io'):
+        assert brand_index.find(domain) is None, domain
+    # Nor do the rules built on it flag ordinary words that sit one edge edit from a brand
+    assert is_suspicious_domain('finance.yahoo.com') == (False, '')
+
+def test_brand_index_matches_comparing_with_every_brand():
+    rng = random.Random(11)
+    index = TyposquatIndex(brand_index.brands + ['ab', 'abcd'])
+    assert 'abcd' not in index.brands
+    alphabet = 'abcdefghijklmnopqrstuvwxyz0134'
+    for _ in range(800):
+        word = list(rng.choice(index.brands))
+        for _ in range(rng.randint(0, 3)):
+            i = rng.randrange(len(word) + 1)
+            edit = rng.choice(('insert', 'delete', 'replace', 'swap'))
+            if edit == 'insert':
+                word.insert(i, rng.choice(alphabet))
+            elif edit == 'delete' and i < len(word):
+                del word[i]
+            elif edit == 'replace' and i < len(word):
+                word[i] = rng.choice(alphabet)
+            elif i + 1 < len(word):
+                word[i], word[i + 1] = word[i + 1], word[i]
+        word = ''.join(word)
+        assert index.match(word) == naive_brand_match(index, word), word
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for full-text search over ingested log entries
+"""
+
+import io
+from datetime import datetime
+from sqlalchemy import text
+from extensions import db
+from models import LogFile
+from services.partitions import prune_before
+from services.queries import explain
+from services.search import search_entries
+
+LINES = [
+    "2025-07-09 16:00:00 192.168.1.7 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 100 10",
+    "2025-07-09 16:05:00 10.0.0.66 93.184.216.34 g00gle-login.xyz Blocked POST 403 curl/7.68.0 90000 3",
+    "2025-07-09 16:10:00 10.0.0.66 93.184.216.34 G00GLE-login.xyz Blocked POST 403 curl/7.68.0 5 3",
+    "2025-07-09 17:00:00 192.168.1.8 93.184.216.34 example.com Allowed GET 200 Chrome/91.0 50 5",
+]
+SEARCH_URL = '/log-analyzer/api/upload/search'
+
+def upload(client, name, lines):
+    data = {'file': (io.BytesIO('\n'.join(lines).encode()), name)}
+    return client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()['logfile_id']
+
+def found(client, **args):
+    return [(e['logfile_id'], e['domain']) for e in client.get(SEARCH_URL, query_string=args).get_json()['entries']]
+
+def test_search_finds_substrings_of_any_field(client):
+    file_id = upload(client, 'search.log', LINES)
+    # Domains, IPs and user agents, matched anywhere in the value and regardless of case
+    assert found(client, q='google-LOG') == []
+    assert found(client, q='g00gle-LOG') == [(file_id, 'g00gle-login.xyz'), (file_id, 'G00GLE-login.xyz')]
+    assert len(found(client, q='10.0.0.66')) == 2
+    assert found(client, q='rome/91') == [(file_id, 'example.com')]
+    entry = client.get(SEARCH_URL, query_string={'q': 'curl/7.68', 'limit': 1}).get_json()['entries'][0]
+    assert entry['raw_line'] == LINES[1]
+    assert client.get(SEARCH_URL, query_string={'q': 'ab'}).status_code == 400
+
+def test_search_filters_by_file_and_time_and_pages(client):
+    first = upload(client, 'first.log', LINES)
+    second = upload(client, 'second.log', LINES[1:])
+    assert [f for f, _ in found(client, q='g00gle')] == [first, first, second, second]
+    assert [f for f, _ in found(client, q='g00gle', file_id=second)] == [second, second]
+    assert found(client, q='g00gle', file_id=first, start='2025-07-09T16:06:00', end='2025-07-09T17:00:00') == [
+        (first, 'G00GLE-login.xyz')]
+    page = client.get(SEARCH_URL, query_string={'q': 'g00gle', 'limit': 3}).get_json()
+    rest = client.get(SEARCH_URL, query_string={'q': 'g00gle', 'limit': 3, 'after_id': page['next_after_id']}).get_json()
+    assert [len(page['entries']), len(rest['entries']), rest['next_after_id']] == [3, 1, None]
+    for limit in (0, -1):
+        page = client.get(SEARCH_URL, query_string={'q': 'g00gle', 'limit': limit})
+        assert page.status_code == 200
+        assert len(page.get_json()['entries']) == 1
+    assert client.get(SEARCH_URL, query_string={'q': 'g00gle', 'file_id': 999}).status_code == 404
+
+def test_search_reads_the_index_then_entries_by_key(app):
+    plan = explain(db.session, search_entries('sqlite', 'g00gle', 50, 0, 1, (1, 100), datetime(2025, 7, 9), None, 202507))
+    assert plan[0].startswith('SCAN entry_search VIRTUAL TABLE INDEX')
+    assert plan[1].startswith('SEARCH log_entry USING INTEGER PRIMARY KEY')
+
+def test_pruned_files_leave_the_index(client):
+    file_id = upload(client, 'old.log', LINES)
+    db.session.get(LogFile, file_id).upload_time = datetime(2025, 1, 15)
+    db.session.commit()
+    prune_before(db.session, 202502)
+    db.session.commit()
+    assert db.session.execute(text('SELECT count(*) FROM entry_search')).scalar() == 0
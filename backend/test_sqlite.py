@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite connection pragmas and the grouped-transaction writer
+"""
+
+import fcntl
+import io
+import os
+import pytest
+from sqlalchemy import text
+from app import create_app
+from extensions import db
+from models import User, LogFile, LogEntry, AnalysisResult, Anomaly
+from services.ingest import POOL_CONTEXT, ingest_file, ingest_byte_range
+from services.sqlite import current_writer
+
+LINES = [
+    f"2025-07-09 16:{i // 60:02d}:{i % 60:02d} 192.168.1.{i % 5 + 1} 93.184.216.34 example.com Allowed GET 200 Mozilla/5.0 {i} 0"
+    for i in range(40)
+] + ["2025-07-09 17:00:00 10.0.0.66 93.184.216.34 g00gle-login.xyz Blocked POST 403 curl/7.68.0 900000 0"]
+
+@pytest.fixture
+def file_app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'INGEST_BATCH_SIZE': 10,
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def add_user(name):
+    def job(session):
+        user = User(username=name)
+        user.set_password('secret')
+        session.add(user)
+        session.flush()
+        return user.id
+    return job
+
+def test_pragmas_are_set_on_connect(file_app):
+    pragma = lambda name: db.session.execute(text(f'PRAGMA {name}')).scalar()
+    assert pragma('journal_mode') == 'wal'
+    # NORMAL
+    assert pragma('synchronous') == 1
+    assert pragma('busy_timeout') == file_app.config['SQLITE_PRAGMAS']['busy_timeout']
+
+def test_in_memory_databases_have_no_writer(app):
+    assert current_writer() is None
+
+def test_jobs_queued_behind_the_lock_commit_together(file_app):
+    writer = current_writer()
+    with open(writer.lock_path, 'a') as lock:
+        # Another process holding the write lock
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        futures = [writer.submit(add_user(f'user{i}')) for i in range(5)]
+        fcntl.flock(lock, fcntl.LOCK_UN)
+    ids = [future.result(timeout=10) for future in futures]
+    assert len(set(ids)) == 5
+    assert (writer.stats['transactions'], writer.stats['jobs']) == (1, 5)
+    assert User.query.count() == 5
+
+def test_a_failing_job_does_not_fail_its_group(file_app):
+    writer = current_writer()
+    with open(writer.lock_path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        futures = [writer.submit(add_user('first')), writer.submit(add_user('first')), writer.submit(add_user('second'))]
+        fcntl.flock(lock, fcntl.LOCK_UN)
+    assert futures[0].result(timeout=10)
+    with pytest.raises(Exception, match='UNIQUE'):
+        futures[1].result(timeout=10)
+    assert futures[2].result(timeout=10)
+    assert sorted(u.username for u in User.query) == ['first', 'second']
+    assert writer.stats['failed_jobs'] == 1
+
+def test_upload_and_analysis_commit_through_the_writer(file_app):
+    client = file_app.test_client()
+    data = {'file': (io.BytesIO('\n'.join(LINES).encode()), 'writer.log')}
+    upload = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()
+    assert upload['num_logs'] == 41
+    assert LogEntry.query.count() == 41
+    analysis = client.post('/log-analyzer/api/analysis/run', json={'file_id': upload['logfile_id'], 'use_llm': False}).get_json()
+    assert AnalysisResult.query.count() == 1
+    assert Anomaly.query.count() == analysis['num_anomalies'] > 0
+    # Five entry batches and the analysis result
+    assert current_writer().stats['jobs'] == 6
+
+def test_parallel_upload_does_not_fork_the_writer(file_app):
+    # The writer thread is already running when the parse pool starts
+    current_writer().run(lambda session: None)
+    file_app.config.update(INGEST_WORKERS=3, INGEST_CHUNK_BYTES=1000)
+    assert POOL_CONTEXT.get_start_method() == 'forkserver'
+    client = file_app.test_client()
+    data = {'file': (io.BytesIO('\n'.join(LINES).encode()), 'parallel.log')}
+    upload = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data').get_json()
+    assert upload['num_logs'] == LogEntry.query.count() == 41
+    assert [e.line_offset for e in LogEntry.query.order_by(LogEntry.id)] == sorted(e.line_offset for e in LogEntry.query)
+
+def test_failed_upload_leaves_no_committed_batches(file_app, monkeypatch):
+    def failing_ingest(filepath, logfile_id, **kwargs):
+        ingest_file(filepath, logfile_id, **kwargs)
+        raise OSError('disk full')
+    monkeypatch.setattr('routes.upload.ingest_file', failing_ingest)
+    client = file_app.test_client()
+    data = {'file': (io.BytesIO('\n'.join(LINES).encode()), 'writer.log')}
+    res = client.post('/log-analyzer/api/upload', data=data, content_type='multipart/form-data')
+    assert res.status_code == 500
+    assert current_writer().stats['jobs'] == 6
+    assert (LogFile.query.count(), LogEntry.query.count()) == (0, 0)
+    assert db.session.execute(text('SELECT count(*) FROM entry_search')).scalar() == 0
+    assert not os.listdir(file_app.config['UPLOAD_FOLDER'])
+
+def test_chunked_upload_commits_through_the_writer(file_app, monkeypatch):
+    client = file_app.test_client()
+    payload = '\n'.join(LINES).encode()
+    half = len(payload) // 2
+    url = '/log-analyzer/api/upload/chunked/' + client.post(
+        '/log-analyzer/api/upload/chunked', json={'filename': 'chunked.log'}).get_json()['upload_id']
+    first = client.put(f'{url}?offset=0', data=payload[:half]).get_json()
+    assert LogEntry.query.count() == first['num_logs'] == 20
+    assert current_writer().stats['jobs'] == 2
+
+    # A chunk whose ingest fails takes its committed batches with it
+    def failing_ingest(*args, **kwargs):
+        ingest_byte_range(*args, **kwargs)
+        raise OSError('disk full')
+    with monkeypatch.context() as patch:
+        patch.setattr('routes.upload.ingest_byte_range', failing_ingest)
+        assert client.put(f'{url}?offset={half}', data=payload[half:]).status_code == 500
+    assert LogEntry.query.count() == 20
+    # The bytes were stored, so the parse is picked up again on finalize
+    assert client.get(url).get_json()['offset'] == len(payload)
+    done = client.post(f'{url}/finalize').get_json()
+    assert done['num_logs'] == LogEntry.query.count() == 41
+    assert db.session.execute(text('SELECT count(*) FROM entry_search')).scalar() == 41
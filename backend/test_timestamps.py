@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests that the cached and vectorized timestamp decoders agree with strptime
+"""
+
+from datetime import datetime
+import numpy as np
+import pytest
+from services.timestamps import LOG_TIMESTAMP_FORMAT, TimestampDecoder, decode_timestamps
+
+CASES = [
+    '2025-07-09 16:04:55',
+    '2025-07-09 16:04:56',
+    '2025-07-09 16:05:00',
+    '2024-02-29 23:59:59',
+    '2025-02-29 00:00:00',
+    '2025-01-01 00:00:60',
+    '2025-13-01 00:00:00',
+    '0000-01-01 00:00:00',
+    '2025-1-1 0:0:0',
+    '2025-07-09 16:04:5',
+    ' 2025-07-09 16:04:55',
+    '2025-07-09 16:04:55 ',
+    '2025-07-09T16:04:55',
+    '２０２５-07-09 16:04:55',
+    'not a timestamp',
+    '',
+]
+
+def strptime_or_none(text):
+    try:
+        return datetime.strptime(text, LOG_TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+def test_decoder_matches_strptime():
+    decode = TimestampDecoder()
+    for text in CASES:
+        expected = strptime_or_none(text)
+        if expected is None:
+            with pytest.raises(ValueError):
+                decode(text)
+        else:
+            assert decode(text) == expected, text
+
+def test_clf_decoder_matches_strptime():
+    fmt = '%d/%b/%Y:%H:%M:%S %z'
+    decode = TimestampDecoder(fmt, length=26, seconds_at=18)
+    for text in ['09/Jul/2025:18:04:50 +0200', '09/Jul/2025:18:04:51 +0200', '09/Jul/2025:18:04:51 -0700']:
+        assert decode(text) == datetime.strptime(text, fmt)
+
+def test_vectorized_decode_matches_strptime():
+    decoded = decode_timestamps(CASES)
+    for text, value in zip(CASES, decoded):
+        expected = strptime_or_none(text)
+        if expected is None:
+            assert np.isnat(value), text
+        else:
+            assert value == np.datetime64(expected, 's'), text
@@ -7,13 +7,17 @@ import api from "../../lib/api";
 
 console.log("Component mounted"); // top level inside component
 
+const MAX_CHUNK_RETRIES = 3;
+
 
 export default function UploadPage() {
   const router = useRouter();
   const [file, setFile] = useState<File | null>(null);
   const [message, setMessage] = useState("");
   const [uploading, setUploading] = useState(false);
+  const [progress, setProgress] = useState(0);
   const [error, setError] = useState("");
+  const [preview, setPreview] = useState<Record<string, string | number>[]>([]);
 
   useEffect(() => {
     console.log("test")
@@ -34,23 +38,40 @@ export default function UploadPage() {
     e.preventDefault();
     setError("");
     setMessage("");
+    setPreview([]);
+    setProgress(0);
     if (!file) return;
     setUploading(true);
     try {
       const token = window.localStorage.getItem("token");
-      const formData = new FormData();
-      formData.append("file", file);
-      // Upload file
-      const uploadRes = await api.post(
-        "/api/upload",
-        formData,
-        {
-          headers: {
-            Authorization: `Bearer ${token}`,
-            "Content-Type": "multipart/form-data",
-          },
+      const authHeaders = { Authorization: `Bearer ${token}` };
+      // Start a resumable upload, then send the file in chunks that the backend parses as they arrive
+      const initRes = await api.post("/api/upload/chunked", { filename: file.name }, { headers: authHeaders });
+      const uploadId = initRes.data.upload_id;
+      const chunkSize = initRes.data.chunk_size;
+      let offset = 0;
+      let retries = 0;
+      while (offset < file.size) {
+        try {
+          const chunkRes = await api.put(
+            `/api/upload/chunked/${uploadId}`,
+            file.slice(offset, offset + chunkSize),
+            {
+              params: { offset },
+              headers: { ...authHeaders, "Content-Type": "application/octet-stream" },
+            }
+          );
+          offset = chunkRes.data.offset;
+          retries = 0;
+          setProgress(Math.round((offset / file.size) * 100));
+        } catch (chunkErr) {
+          if (++retries > MAX_CHUNK_RETRIES) throw chunkErr;
+          // Resume from the last offset the backend acknowledged
+          const statusRes = await api.get(`/api/upload/chunked/${uploadId}`, { headers: authHeaders });
+          offset = statusRes.data.offset;
         }
-      );
+      }
+      const uploadRes = await api.post(`/api/upload/chunked/${uploadId}/finalize`, {}, { headers: authHeaders });
       const fileId = uploadRes.data.logfile_id;
       // Store file info in localStorage
       const fileInfo = { id: fileId, name: file.name, uploaded: new Date().toISOString() };
@@ -60,7 +81,18 @@ export default function UploadPage() {
       } catch {}
       files.push(fileInfo);
       window.localStorage.setItem("log_files", JSON.stringify(files));
-      setMessage("File uploaded. Running analysis...");
+      if (uploadRes.data.duplicate && uploadRes.data.analysis_id) {
+        // Same content was analyzed before; reuse that result
+        router.push(`/dashboard?file_id=${fileId}`);
+        return;
+      }
+      setMessage(`File uploaded (${uploadRes.data.num_logs} entries). Running analysis...`);
+      // Show the first few parsed entries while analysis runs
+      const previewRes = await api.get(`/api/upload/${fileId}/preview`, {
+        params: { limit: 5 },
+        headers: authHeaders,
+      });
+      setPreview(previewRes.data.entries);
       // Trigger analysis
       // eslint-disable-next-line @typescript-eslint/no-unused-vars
       const analysisRes = await api.post(
@@ -99,16 +131,16 @@ export default function UploadPage() {
             startIcon={<CloudUploadIcon sx={{ color: '#555' }} />}
             sx={{ mb: 2, color: '#555', borderColor: 'primary.light', borderRadius: 9999, py: 1.2, fontWeight: 600, bgcolor: 'primary.light', '&:hover': { bgcolor: 'primary.main', color: '#222' } }}
           >
-            {file ? file.name : "Select .log or .txt file"}
+            {file ? file.name : "Select .log or .txt file (optionally .gz, .bz2, .zst)"}
             <input
               type="file"
-              accept=".log,.txt"
+              accept=".log,.txt,.gz,.bz2,.zst"
               hidden
               onChange={handleFileChange}
               required
             />
           </Button>
-          {uploading && <LinearProgress sx={{ mb: 2 }} />}
+          {uploading && <LinearProgress variant={progress < 100 ? "determinate" : "indeterminate"} value={progress} sx={{ mb: 2 }} />}
           <Button
             type="submit"
             variant="contained"
@@ -120,6 +152,16 @@ export default function UploadPage() {
             {uploading ? "Uploading..." : "Upload & Analyze"}
           </Button>
           {message && <Alert severity="success" sx={{ mt: 2 }}>{message}</Alert>}
+          {preview.length > 0 && (
+            <Box sx={{ mt: 2, p: 1.5, bgcolor: 'grey.100', borderRadius: 2, overflowX: 'auto' }}>
+              <Typography variant="caption" color="text.secondary">Preview</Typography>
+              {preview.map((entry) => (
+                <Typography key={entry.id} variant="body2" sx={{ fontFamily: 'monospace', whiteSpace: 'nowrap' }}>
+                  {entry.timestamp} {entry.src_ip} {entry.domain} {entry.action} {entry.status_code}
+                </Typography>
+              ))}
+            </Box>
+          )}
           {error && <Alert severity="error" sx={{ mt: 2 }}>{error}</Alert>}
         </form>
       </Paper>